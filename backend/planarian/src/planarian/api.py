@@ -1,23 +1,61 @@
+from warmup import WARMUP, STARTED, preload
 from fastapi import FastAPI, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
-from main import build_agent
-import uvicorn
+from typing import List, Optional
+from batch import run_batch
+from validation import validate_configs
+import validation
+from tools.code_templates import BUNDLES, iter_bundle, template_index
+from archives import FORMATS, iter_archive
+from jobs import JobQueue, QueueFullError
+from cache import ResultCache, request_key, EXECUTION_MODES
+from similar import REUSE_MODES, SUGGEST, reuse_mode
+import metrics
+import llm_scheduler
+import tokens
+import logs
+import prefork
+from state import server_workers
+import asyncio
+import json
+import logging
 import os
+import re
+import time
+from contextlib import asynccontextmanager
 from dotenv import load_dotenv
 
 load_dotenv()
 
-# Check API key
-if not os.getenv('GOOGLE_API_KEY'):
-    print("❌ ERROR: GOOGLE_API_KEY not found!")
-    print("Visit: https://makersuite.google.com/app/apikey")
-    exit(1)
+logs.configure()
+logger = logging.getLogger('planaria.api')
+
+def require_api_key():
+    """Refuse to start serving without a Gemini API key"""
+    if not os.getenv('GOOGLE_API_KEY'):
+        print("❌ ERROR: GOOGLE_API_KEY not found!")
+        print("Visit: https://makersuite.google.com/app/apikey")
+        raise SystemExit(1)
+
+# The crew machinery is imported by the warm-up (warmup.py), not here
+WARMUP.record('import', time.perf_counter() - STARTED)
+
+@asynccontextmanager
+async def lifespan(app):
+    require_api_key()
+    WARMUP.start()
+    yield
+    build_jobs.shutdown()
+    validation.shutdown()
 
 app = FastAPI(
     title="Planaria AI API (Gemini)", 
     version="1.0.0",
-    description="AI Agent Builder powered by Google Gemini"
+    description="AI Agent Builder powered by Google Gemini",
+    lifespan=lifespan
 )
 
 # Enable CORS
@@ -36,13 +74,130 @@ class AgentRequest(BaseModel):
     personality: str
     target_framework: str
     additional_requirements: str = ""
+    execution_mode: str = "sequential"
+    use_cache: bool = True
+    fast: bool = False
+    include_timing: bool = False
+    # Use of similar earlier builds: off, suggest or seed (default: PLANARIA_SIMILAR_REUSE)
+    similar: Optional[str] = None
+
+class BatchRequest(BaseModel):
+    requests: List[AgentRequest]
+    max_parallel: int = 4
+
+class ConfigBatchRequest(BaseModel):
+    configs: List[dict]
 
 class AgentResponse(BaseModel):
     success: bool
     message: str
+    job_id: str = None
     result: dict = None
+    cached: bool = False
+    timing: Optional[dict] = None
+    suggestions: Optional[List[dict]] = None
     error: str = None
 
+class JobResponse(BaseModel):
+    job_id: str
+    status: str
+    result: Optional[dict] = None
+    error: Optional[str] = None
+    created_at: float
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+
+result_cache = ResultCache.from_env()
+
+# Earlier builds offered to a request with similar=suggest
+MAX_SUGGESTIONS = 3
+
+def pipeline():
+    """The build pipeline (main.py), imported on first use unless warm-up already did"""
+    import main
+    return main
+
+
+def cached_result(user_input):
+    """Stored payload for an identical earlier build, unless the request opts out"""
+    if not user_input.get('use_cache', True):
+        return None
+    payload = result_cache.get(request_key(user_input))
+    return dict(payload, cached=True) if payload is not None else None
+
+def similar_suggestions(user_input):
+    """Results of earlier builds similar to the request, best first, once the pipeline is loaded"""
+    index = pipeline().similar_builds if WARMUP.ready else None
+    if index is None:
+        return []
+    suggestions = []
+    # Results may have left the cache since their builds were indexed
+    for match in index.search(user_input, limit=3 * MAX_SUGGESTIONS):
+        payload = result_cache.get(match['key'])
+        if payload is not None:
+            suggestions.append({'similarity': match['similarity'], 'request': match['request'], 'result': payload})
+    return suggestions[:MAX_SUGGESTIONS]
+
+def run_build(user_input, on_event=None):
+    """Job worker: run the crew and return the response payload"""
+    try:
+        # An identical build may have finished while this one was queued
+        payload = cached_result(user_input)
+        if payload is None:
+            timing = {} if user_input.get('include_timing') else None
+            result = pipeline().build_agent(user_input, on_event=on_event, timing=timing)
+            if not result:
+                raise RuntimeError("CrewAI execution failed")
+            payload = pipeline().result_payload(result, user_input)
+            result_cache.set(request_key(user_input), payload)
+            payload = dict(payload, cached=False)
+            if timing is not None:
+                payload['timing'] = timing
+    except Exception as e:
+        if on_event:
+            on_event({'event': 'build_failed', 'error': str(e)})
+        raise
+    if on_event:
+        on_event({'event': 'build_completed', 'result': payload})
+    return payload
+
+# Builds run here so a crew never blocks the event loop
+build_jobs = JobQueue.from_env(run_build)
+
+def component_metrics():
+    """Startup, job queue, cache and crew pool gauges for /metrics"""
+    startup = WARMUP.report()
+    yield ('planaria_startup_seconds', 'gauge', 'Import and warm-up time by phase',
+           [({'phase': phase}, seconds) for phase, seconds in startup['seconds'].items()])
+    jobs = build_jobs.stats()
+    yield ('planaria_jobs', 'gauge', 'Retained build jobs by status',
+           [({'status': status}, jobs[status]) for status in ('queued', 'running', 'succeeded', 'failed')])
+    caches = [('result', result_cache.stats())]
+    # The crew pool and task memo only exist once the pipeline is loaded
+    main = pipeline() if WARMUP.ready else None
+    if main:
+        caches.append(('task_memo', main.task_memo.stats()))
+    lookups = []
+    for cache, stats in caches:
+        lookups.append(({'cache': cache, 'result': 'hit'}, stats['hits']))
+        lookups.append(({'cache': cache, 'result': 'miss'}, stats['misses']))
+    yield ('planaria_cache_requests_total', 'counter', 'Cache lookups by outcome', lookups)
+    if main:
+        crews = main.get_crew_factory().stats()
+        yield ('planaria_crews', 'gauge', 'Crews in the pool',
+               [({'state': 'built'}, crews['crews_built']), ({'state': 'idle'}, crews['crews_idle'])])
+    llm = llm_scheduler.get_scheduler().stats()
+    yield ('planaria_llm_scheduler_calls_total', 'counter', 'LLM calls by how the scheduler served them',
+           [({'outcome': 'called'}, llm['calls'] - llm['coalesced']), ({'outcome': 'coalesced'}, llm['coalesced'])])
+    yield ('planaria_llm_scheduler_retries_total', 'counter', 'Rate-limited or overloaded LLM calls retried',
+           [({}, llm['retries'])])
+    yield ('planaria_llm_scheduler_wait_seconds_total', 'counter', 'Time LLM calls waited for rate limits',
+           [({}, llm['wait_seconds'])])
+    yield ('planaria_llm_scheduler_waiting', 'gauge', 'LLM calls waiting for rate limits',
+           [({}, llm['waiting'])])
+
+metrics.register_collector(component_metrics)
+
 @app.get("/")
 def read_root():
     return {
@@ -52,19 +207,65 @@ def read_root():
         "cost": "FREE",
         "endpoints": {
             "build": "/build-agent",
+            "build_stream": "/build-agent/stream",
+            "build_batch": "/build-agents/batch",
+            "validate_configs": "/validate-configs",
+            "jobs": "/jobs/{job_id}",
+            "bundle": "/jobs/{job_id}/bundle",
             "health": "/health",
-            "models": "/models"
+            "ready": "/ready",
+            "metrics": "/metrics",
+            "routing": "/routing",
+            "models": "/models",
+            "templates": "/templates"
         }
     }
 
 @app.get("/health")
 def health_check():
     has_api_key = bool(os.getenv('GOOGLE_API_KEY'))
+    startup = WARMUP.report()
+    if not has_api_key:
+        status = "missing_api_key"
+    elif startup['state'] == 'failed':
+        status = "failed"
+    else:
+        status = "healthy" if WARMUP.ready else "starting"
     return {
-        "status": "healthy" if has_api_key else "missing_api_key",
-        "gemini_configured": has_api_key
+        "status": status,
+        "gemini_configured": has_api_key,
+        "startup": startup,
+        "jobs": build_jobs.stats(),
+        "cache": result_cache.stats(),
+        "crews": pipeline().get_crew_factory().stats() if WARMUP.ready else None,
+        "similar": pipeline().similar_builds.stats() if WARMUP.ready and pipeline().similar_builds else None,
+        "llm": llm_scheduler.get_scheduler().stats(),
+        "tokens": tokens.get_counter().stats()
     }
 
+@app.get("/ready")
+def readiness():
+    """200 once the crew machinery is loaded and warmed up, 503 until then or if warm-up failed"""
+    startup = WARMUP.report()
+    if not WARMUP.ready:
+        return JSONResponse(startup, status_code=503)
+    return startup
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def prometheus_metrics():
+    """Task, tool, LLM call and build timings in the Prometheus text format"""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/routing")
+def routing_stats():
+    """Model of each crew task, and the latency and quality observed per tier"""
+    if not WARMUP.ready:
+        raise HTTPException(503, "Server is starting")
+    router = pipeline().get_crew_factory().router
+    if router is None:
+        raise HTTPException(404, "Model routing is disabled")
+    return router.stats()
+
 @app.get("/models")
 def list_models():
     """List available Gemini models"""
@@ -101,54 +302,200 @@ def list_models():
         ]
     }
 
-@app.post("/build-agent", response_model=AgentResponse)
+def check_request(user_input, prefix=""):
+    """Reject incomplete or unsupported build requests with HTTP 400"""
+    for field in ('agent_type', 'use_case', 'target_framework'):
+        if not user_input.get(field):
+            raise HTTPException(400, f"{prefix}{field} is required")
+    
+    if user_input['execution_mode'] not in EXECUTION_MODES:
+        raise HTTPException(400, f"{prefix}execution_mode must be one of {', '.join(EXECUTION_MODES)}")
+    
+    if user_input['fast'] and user_input['target_framework'].lower() not in BUNDLES:
+        raise HTTPException(400, f"{prefix}fast mode supports target_framework {', '.join(BUNDLES)}")
+    
+    if user_input.get('similar') and user_input['similar'].lower() not in REUSE_MODES:
+        raise HTTPException(400, f"{prefix}similar must be one of {', '.join(REUSE_MODES)}")
+
+@app.get("/templates")
+def list_templates():
+    """Code templates behind each framework, with versions and checksums"""
+    return {"frameworks": template_index()}
+
+@app.post("/build-agent", response_model=AgentResponse, status_code=202)
 async def create_agent(request: AgentRequest):
     """
-    Build an AI agent using Gemini based on user requirements
+    Queue an AI agent build using Gemini based on user requirements.
+    Poll /jobs/{job_id} for the result.
     """
+    user_input = request.dict()
+    check_request(user_input)
+    
     try:
-        user_input = request.dict()
-        
-        # Validate input
-        if not user_input.get('agent_type'):
-            raise HTTPException(400, "agent_type is required")
-        
-        if not user_input.get('use_case'):
-            raise HTTPException(400, "use_case is required")
-        
-        if not user_input.get('target_framework'):
-            raise HTTPException(400, "target_framework is required")
-        
-        # Build agent
-        print(f"\n📥 Received request to build {user_input['agent_type']} agent")
-        result = build_agent(user_input)
-        
-        if result:
+        # Answer repeated requests without queueing a build
+        start = time.perf_counter()
+        payload = cached_result(user_input)
+        if payload is not None:
             return AgentResponse(
                 success=True,
-                message="Agent built successfully with Gemini",
-                result={"output": str(result)}
-            )
-        else:
-            return AgentResponse(
-                success=False,
-                message="Failed to build agent",
-                error="CrewAI execution failed"
+                message="Agent served from cache",
+                result=payload,
+                cached=True,
+                timing={'cache_lookup_seconds': round(time.perf_counter() - start, 6)}
+                if user_input['include_timing'] else None
             )
         
+        # Offer similar earlier builds instead of building, if the request asks for that
+        if reuse_mode(user_input) == SUGGEST:
+            suggestions = similar_suggestions(user_input)
+            if suggestions:
+                return AgentResponse(
+                    success=True,
+                    message="Similar agents were built before; send similar=off to build this one",
+                    suggestions=suggestions,
+                    timing={'cache_lookup_seconds': round(time.perf_counter() - start, 6)}
+                    if user_input['include_timing'] else None
+                )
+        
+        # Queue the build
+        # Job status may be written to SQLite, so keep it off the event loop
+        job = await run_in_threadpool(build_jobs.submit, user_input)
+        logger.debug("Queued job %s to build a %s agent", job.id, user_input['agent_type'])
+        
+        return AgentResponse(
+            success=True,
+            message="Agent build queued",
+            job_id=job.id
+        )
+        
+    except QueueFullError as e:
+        raise HTTPException(503, str(e))
     except Exception as e:
-        print(f"\n❌ Error: {e}")
+        logger.exception("Failed to queue agent build")
         return AgentResponse(
             success=False,
             message="Failed to build agent",
             error=str(e)
         )
 
+@app.post("/build-agent/stream")
+async def stream_agent(request: AgentRequest):
+    """
+    Build an AI agent and stream progress as Server-Sent Events.
+
+    Emits `queued`, then `task_started`/`task_completed` per crew task
+    (plus `token` events when PLANARIA_STREAM_TOKENS is enabled), and
+    finally `build_completed` or `build_failed`.
+    """
+    user_input = request.dict()
+    check_request(user_input)
+
+    loop = asyncio.get_running_loop()
+    progress = asyncio.Queue()
+
+    def on_event(event):
+        loop.call_soon_threadsafe(progress.put_nowait, event)
+
+    try:
+        job = await run_in_threadpool(build_jobs.submit, user_input, on_event=on_event)
+    except QueueFullError as e:
+        raise HTTPException(503, str(e))
+
+    async def event_stream():
+        event = {'event': 'queued', 'job_id': job.id}
+        while True:
+            yield f"event: {event['event']}\ndata: {json.dumps(event)}\n\n"
+            if event['event'] in ('build_completed', 'build_failed'):
+                break
+            event = await progress.get()
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.post("/build-agents/batch")
+def create_agents_batch(batch: BatchRequest):
+    """
+    Build many agents in one call, streaming one JSON line per item
+    (newline-delimited JSON) as each build completes.
+
+    Identical requests are built once, and tasks with identical inputs
+    (e.g. the same requirements analysis) are shared across items. Items
+    run as jobs on the build queue, bounded like every other build.
+    """
+    requests = [request.dict() for request in batch.requests]
+    for index, user_input in enumerate(requests):
+        check_request(user_input, prefix=f"requests[{index}].")
+    if not 1 <= batch.max_parallel <= build_jobs.max_workers:
+        raise HTTPException(400, f"max_parallel must be between 1 and {build_jobs.max_workers}")
+
+    def item_stream():
+        for item in run_batch(requests, build_jobs, max_parallel=batch.max_parallel):
+            yield json.dumps(item) + "\n"
+
+    return StreamingResponse(item_stream(), media_type="application/x-ndjson")
+
+@app.post("/validate-configs")
+def validate_configs_batch(batch: ConfigBatchRequest):
+    """
+    Validate many agent configs, streaming one JSON line per config
+    (newline-delimited JSON) in input order. Large batches are checked in
+    parallel worker processes.
+    """
+    def result_stream():
+        for result in validate_configs(batch.configs):
+            yield json.dumps(result) + "\n"
+
+    return StreamingResponse(result_stream(), media_type="application/x-ndjson")
+
+@app.get("/jobs/{job_id}", response_model=JobResponse)
+def get_job(job_id: str):
+    """Status and, once finished, result of a queued build"""
+    job = build_jobs.get(job_id)
+    if not job:
+        raise HTTPException(404, f"Unknown job: {job_id}")
+    return JobResponse(**job.to_dict())
+
+@app.get("/jobs/{job_id}/bundle")
+def download_bundle(job_id: str, format: str = "zip"):
+    """
+    Download the generated project of a finished build as a zip or tar.gz
+    archive. Files are rendered and streamed one at a time.
+    """
+    if format not in FORMATS:
+        raise HTTPException(400, f"format must be one of {', '.join(FORMATS)}")
+    
+    job = build_jobs.get(job_id)
+    if not job:
+        raise HTTPException(404, f"Unknown job: {job_id}")
+    if not job.done:
+        raise HTTPException(409, f"Job {job_id} is still {job.status}")
+    spec = (job.result or {}).get('bundle')
+    if not spec:
+        raise HTTPException(409, f"Job {job_id} has no generated project to download")
+    
+    folder = re.sub(r"[^a-z0-9]+", "-", spec['config']['name'].lower()).strip("-") or "agent"
+    files = (
+        (f"{folder}/{filename}", content)
+        for _, filename, content in iter_bundle(spec['framework'], spec['config'], spec['system_prompt'])
+    )
+    media_type, extension = FORMATS[format]
+    return StreamingResponse(
+        iter_archive(format, files),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{folder}.{extension}"'}
+    )
+
 if __name__ == "__main__":
+    require_api_key()
     print("\n🚀 Starting Planaria AI API Server (Gemini)")
     print("="*60)
     print("Powered by: Google Gemini (FREE)")
     print("API Docs: http://localhost:8000/docs")
+    print(f"Workers: {server_workers()}")
     print("="*60 + "\n")
     
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    # PLANARIA_WORKERS > 1 forks workers that share jobs, caches and rate limits
+    prefork.serve(app, host="0.0.0.0", port=8000, preload=preload)
\ No newline at end of file
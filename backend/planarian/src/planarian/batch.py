@@ -0,0 +1,118 @@
+"""
+Bulk agent builds.
+
+A batch is many AgentRequests built with bounded parallelism. Each distinct
+request is built once, as a job on the server's build queue, so batch items
+count against the same PLANARIA_MAX_CONCURRENT_BUILDS bound as every other
+build. Every build runs in DAG mode against the shared task memo, so tasks
+whose inputs match across items execute only once.
+
+Items that differ only in personality or framework are variants of one use
+case: they share the fields in ANALYSIS_FIELDS. The first variant of each
+use case is built on its own, and the rest are queued once it finishes,
+carrying its requirements analysis under `shared_analysis`. Their builds
+answer analyze_requirements with it (see shared_analysis_overrides) instead
+of running the task again. If the first variant fails, the others run in
+full.
+"""
+import copy
+import json
+import time
+from concurrent.futures import FIRST_COMPLETED, wait
+
+from cache import request_key
+from jobs import QueueFullError
+
+# Request fields that define a use case; variants that match on all of them share one analysis
+ANALYSIS_FIELDS = ('agent_type', 'use_case', 'desired_model', 'additional_requirements')
+
+# Seconds the batch waits before retrying when the build queue is full of other builds
+QUEUE_RETRY_DELAY = 0.5
+QUEUE_RETRY_MAX_DELAY = 5.0
+
+
+def analysis_key(user_input):
+    """Fields of `user_input` that its requirements analysis is shared on"""
+    return tuple((user_input.get(field) or '').strip().lower() for field in ANALYSIS_FIELDS)
+
+
+def shared_analysis_overrides(user_input):
+    """
+    DAG overrides (see scheduler.run_dag) answering analyze_requirements with
+    the analysis a batch shared with this request, keeping the request's own
+    personality. Empty when nothing was shared.
+    """
+    shared = user_input.get('shared_analysis')
+    if not shared:
+        return {}
+    analysis = copy.deepcopy(shared['analysis'])
+    if 'config' in analysis:
+        analysis['config']['personality'] = user_input.get('personality') or ''
+
+    def override(inputs, upstream):
+        return json.dumps(analysis), {'analysis_shared_from': shared['job_id']}
+    return {'analyze_requirements': override}
+
+
+def run_batch(requests, jobs, max_parallel=4):
+    """
+    Build every request, yielding results in completion order.
+
+    Args:
+        requests: List of user_input dicts
+        jobs: jobs.JobQueue whose worker builds one user_input
+        max_parallel: Number of distinct builds the batch has queued at a time
+
+    Yields:
+        Dicts with the item `index`, `success` and either `result` or `error`,
+        plus the `job_id` of its build. Duplicate requests are reported
+        together with `deduplicated: true`.
+    """
+    groups = {}
+    for index, user_input in enumerate(requests):
+        groups.setdefault(request_key(user_input), []).append(index)
+    variants = {}
+    for indexes in groups.values():
+        variants.setdefault(analysis_key(requests[indexes[0]]), []).append(indexes)
+
+    # (indexes, variants waiting on its analysis, analysis shared with it), in submission order
+    pending = [(family[0], family[1:], None) for family in variants.values()][::-1]
+    running = {}
+    delay = QUEUE_RETRY_DELAY
+
+    def report(indexes, item):
+        for position, index in enumerate(indexes):
+            yield dict(item, index=index, deduplicated=position > 0)
+
+    while pending or running:
+        while pending and len(running) < max_parallel:
+            indexes, followers, shared = pending[-1]
+            # Interactive builds get ahead of batch items when LLM calls are rate limited
+            user_input = dict(requests[indexes[0]], execution_mode='dag', priority='batch')
+            if shared:
+                user_input['shared_analysis'] = shared
+            try:
+                job = jobs.submit(user_input)
+            except QueueFullError:
+                # Retry once a slot is free: after one of ours finishes, or after a delay
+                break
+            pending.pop()
+            running[job.future] = (job, indexes, followers)
+            delay = QUEUE_RETRY_DELAY
+
+        if not running:
+            time.sleep(delay)
+            delay = min(delay * 2, QUEUE_RETRY_MAX_DELAY)
+            continue
+        finished, _ = wait(running, return_when=FIRST_COMPLETED)
+        for future in finished:
+            job, indexes, followers = running.pop(future)
+            if job.error is None:
+                item = {'success': True, 'result': job.result}
+                analysis = job.result.get('outputs', {}).get('analyze_requirements')
+                shared = {'job_id': job.id, 'analysis': analysis} if analysis else None
+            else:
+                item = {'success': False, 'error': job.error}
+                shared = None
+            pending.extend((follower, [], shared) for follower in reversed(followers))
+            yield from report(indexes, dict(item, job_id=job.id))
@@ -0,0 +1,334 @@
+#!/usr/bin/env python
+"""
+Offline benchmark for Planaria's own orchestration overhead.
+
+Every crew runs against StubLLM, a deterministic local LLM with a configurable
+latency and completion size, so no API key or network is needed and the
+numbers reflect crew construction, scheduling, caching and the API layer
+rather than Gemini. Builds are driven through build_agent() directly and/or
+through the FastAPI app, and the report is written as JSON so runs can be
+compared between commits.
+
+Usage: python benchmark.py --requests 40 --concurrency 4 --output bench.json
+"""
+import argparse
+import contextlib
+import hashlib
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# main.py and api.py refuse to import without a key; the stub never uses it
+os.environ.setdefault('GOOGLE_API_KEY', 'offline-benchmark')
+os.environ.setdefault('CREWAI_DISABLE_TELEMETRY', 'true')
+os.environ.setdefault('OTEL_SDK_DISABLED', 'true')
+
+from crewai.events import (
+    crewai_event_bus,
+    LLMCallCompletedEvent,
+    LLMCallStartedEvent,
+    TaskCompletedEvent,
+    TaskStartedEvent,
+)
+from crewai.events.types.llm_events import LLMCallType
+from crewai.llms.base_llm import BaseLLM
+
+from task_outputs import example, schema_of
+
+TARGETS = ('build_agent', 'api')
+
+SAMPLE_REQUEST = {
+    'agent_type': 'chatbot',
+    'use_case': 'Customer support assistant for a SaaS product',
+    'desired_model': 'gemini-1.5-flash',
+    'personality': 'helpful and professional',
+    'target_framework': 'react',
+    'additional_requirements': 'Handle billing, features, and troubleshooting questions'
+}
+
+
+class StubLLM(BaseLLM):
+    """
+    Deterministic stand-in for the Gemini client.
+
+    Args:
+        latency: Seconds each call sleeps before answering
+        completion_tokens: Words in each answer, or in each text field of a
+            task's typed answer (roughly one token each)
+    """
+
+    def __init__(self, latency=0.05, completion_tokens=200):
+        super().__init__(model="stub")
+        self.latency = latency
+        self.completion_tokens = completion_tokens
+        self.calls = 0
+        self.prompt_chars = 0
+        self._lock = threading.Lock()
+
+    def call(self, messages, tools=None, callbacks=None, available_functions=None,
+             from_task=None, from_agent=None):
+        if isinstance(messages, str):
+            prompt = messages
+        else:
+            prompt = ''.join(str(message.get('content', '')) for message in messages)
+        with self._lock:
+            self.calls += 1
+            self.prompt_chars += len(prompt)
+
+        # Emit the same events as crewai.LLM so instrumentation overhead is measured
+        crewai_event_bus.emit(self, event=LLMCallStartedEvent(
+            messages=messages, tools=tools, callbacks=callbacks,
+            available_functions=available_functions,
+            from_task=from_task, from_agent=from_agent, model=self.model
+        ))
+        time.sleep(self.latency)
+        # Answers depend on the prompt, like a real model's would
+        tag = hashlib.sha256(prompt.encode()).hexdigest()[:8]
+        name = getattr(from_task, 'name', None) or 'task'
+        words = ' '.join(f"{name}-{tag}-{i}" for i in range(self.completion_tokens))
+        schema = schema_of(from_task)
+        answer = example(schema, words).model_dump_json() if schema else f"```\n{words}\n```"
+        response = f"Thought: I now know the final answer\nFinal Answer: {answer}"
+        crewai_event_bus.emit(self, event=LLMCallCompletedEvent(
+            messages=messages, response=response, call_type=LLMCallType.LLM_CALL,
+            from_task=from_task, from_agent=from_agent, model=self.model
+        ))
+        return response
+
+    def supports_function_calling(self):
+        return False
+
+    def supports_stop_words(self):
+        return False
+
+    def get_context_window_size(self):
+        return 1_000_000
+
+    def stats(self):
+        with self._lock:
+            return {
+                'calls': self.calls,
+                # ~4 characters per token
+                'prompt_tokens': self.prompt_chars // 4,
+                'completion_tokens': self.calls * self.completion_tokens
+            }
+
+
+def percentile(values, q):
+    """q-th percentile (0-100) of `values` with linear interpolation"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * q / 100
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def summarize(values):
+    """Latency summary in seconds"""
+    return {
+        'count': len(values),
+        'mean': round(sum(values) / len(values), 4) if values else None,
+        'p50': round(percentile(values, 50), 4) if values else None,
+        'p95': round(percentile(values, 95), 4) if values else None,
+        'p99': round(percentile(values, 99), 4) if values else None,
+        'max': round(max(values), 4) if values else None
+    }
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process so far"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class TaskTimer:
+    """Per-task durations of every build in the process, taken from the crewAI event bus"""
+
+    def __init__(self):
+        self.durations = {}
+        self._started = {}
+        self._lock = threading.Lock()
+        crewai_event_bus.on(TaskStartedEvent)(self._on_started)
+        crewai_event_bus.on(TaskCompletedEvent)(self._on_completed)
+
+    def _on_started(self, source, event):
+        if event.task is not None:
+            with self._lock:
+                self._started[str(event.task.id)] = time.perf_counter()
+
+    def _on_completed(self, source, event):
+        if event.task is None:
+            return
+        with self._lock:
+            start = self._started.pop(str(event.task.id), None)
+            if start is not None:
+                self.durations.setdefault(event.task.name, []).append(time.perf_counter() - start)
+
+    def reset(self):
+        with self._lock:
+            self.durations = {}
+
+    def report(self):
+        with self._lock:
+            return {name: summarize(values) for name, values in self.durations.items()}
+
+
+def run_load(requests, concurrency, build):
+    """
+    Run `build(user_input)` for every request with `concurrency` in flight.
+
+    Returns:
+        Tuple of (latencies of successful builds, error messages, wall time)
+    """
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+
+    def timed(user_input):
+        start = time.perf_counter()
+        try:
+            build(user_input)
+        except Exception as e:
+            with lock:
+                errors.append(str(e))
+            return
+        with lock:
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="planaria-bench") as pool:
+        list(pool.map(timed, requests))
+    return latencies, errors, time.perf_counter() - start
+
+
+def bench_build_agent(requests, concurrency):
+    """Drive main.build_agent() directly"""
+    import main
+
+    def build(user_input):
+        if not main.build_agent(user_input):
+            raise RuntimeError("CrewAI execution failed")
+
+    return run_load(requests, concurrency, build)
+
+
+def bench_api(requests, concurrency):
+    """Drive POST /build-agent/stream on the FastAPI app in-process"""
+    from fastapi.testclient import TestClient
+    import api
+
+    client = TestClient(api.app)
+
+    def build(user_input):
+        with client.stream('POST', '/build-agent/stream', json=user_input) as response:
+            if response.status_code != 200:
+                raise RuntimeError(f"HTTP {response.status_code}")
+            for line in response.iter_lines():
+                if not line.startswith('data: '):
+                    continue
+                event = json.loads(line[len('data: '):])
+                if event['event'] == 'build_failed':
+                    raise RuntimeError(event['error'])
+
+    return run_load(requests, concurrency, build)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline Planaria benchmark with a stub LLM")
+    parser.add_argument('--target', choices=TARGETS + ('all',), default='all')
+    parser.add_argument('--requests', type=int, default=20, help="builds per target")
+    parser.add_argument('--concurrency', type=int, default=4, help="builds in flight")
+    parser.add_argument('--warmup', type=int, default=2, help="untimed builds per target")
+    parser.add_argument('--latency', type=float, default=0.05, help="seconds per LLM call")
+    parser.add_argument('--completion-tokens', type=int, default=200, help="tokens per LLM answer")
+    parser.add_argument('--execution-mode', choices=('sequential', 'dag'), default='sequential')
+    parser.add_argument('--fast', action='store_true', help="render code from templates")
+    parser.add_argument('--output', default='benchmark.json', help="JSON report path")
+    args = parser.parse_args(argv)
+
+    # Size the job queue and crew pool to the load before they are created
+    os.environ.setdefault('PLANARIA_MAX_CONCURRENT_BUILDS', str(args.concurrency))
+
+    import main as planaria
+    from factory import CrewFactory
+
+    llm = StubLLM(latency=args.latency, completion_tokens=args.completion_tokens)
+    planaria._crew_factory = CrewFactory(pool_size=args.concurrency, llm=llm)
+
+    timer = TaskTimer()
+    targets = TARGETS if args.target == 'all' else (args.target,)
+    benches = {'build_agent': bench_build_agent, 'api': bench_api}
+    def requests(count):
+        # Every build must reach the LLM: skip the result cache and make each
+        # request distinct so concurrent builds don't share task executions
+        return [
+            dict(
+                SAMPLE_REQUEST,
+                additional_requirements=f"{SAMPLE_REQUEST['additional_requirements']} (run {time.time_ns()}-{i})",
+                execution_mode=args.execution_mode,
+                fast=args.fast,
+                use_cache=False
+            )
+            for i in range(count)
+        ]
+
+    report = {
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'config': vars(args),
+        'results': {}
+    }
+    for target in targets:
+        # Crew and agent traces go to stdout; keep them out of the report
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            benches[target](requests(args.warmup), args.concurrency)
+            calls_before = llm.stats()
+            timer.reset()
+            latencies, errors, wall_time = benches[target](
+                requests(args.requests), args.concurrency
+            )
+        calls_after = llm.stats()
+
+        report['results'][target] = {
+            'latency': summarize(latencies),
+            'errors': len(errors),
+            'first_error': errors[0] if errors else None,
+            'wall_time': round(wall_time, 3),
+            'requests_per_second': round(len(latencies) / wall_time, 3) if wall_time else None,
+            'tasks': timer.report(),
+            'llm': {key: calls_after[key] - calls_before[key] for key in calls_after},
+            'peak_rss_mb': peak_rss_mb()
+        }
+        result = report['results'][target]
+        print(f"{target}: p50={result['latency']['p50']}s p95={result['latency']['p95']}s "
+              f"p99={result['latency']['p99']}s rps={result['requests_per_second']} "
+              f"errors={result['errors']} peak_rss={result['peak_rss_mb']}MB")
+
+    report['crews'] = planaria.get_crew_factory().stats()
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Report written to {args.output}")
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,282 @@
+"""
+Content-addressed cache for build results.
+
+Identical requests produce the same crew run, so results are stored under a
+hash of the normalized request plus the agent/task config and tool sources
+that shaped the run. Editing any of those files changes every key, which
+invalidates old entries without an explicit flush, also while the server runs.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+from state import SharedDatabase, state_path
+
+PACKAGE_DIR = Path(__file__).parent
+
+# Request fields that change what the crew produces
+KEY_FIELDS = (
+    'agent_type',
+    'use_case',
+    'desired_model',
+    'personality',
+    'target_framework',
+    'additional_requirements',
+    'fast'
+)
+# Fields matched case-insensitively
+CASE_INSENSITIVE_FIELDS = ('agent_type', 'desired_model', 'target_framework')
+# Values of a request's `execution_mode` (see main.build_agent)
+EXECUTION_MODES = ('sequential', 'dag')
+
+# Seconds between checks of the fingerprinted files for changes; the same
+# interval as the hot-reloaded code templates (tools/code_templates.py)
+FINGERPRINT_CHECK_INTERVAL = float(os.getenv('PLANARIA_TEMPLATE_RELOAD_INTERVAL', '1.0'))
+
+# (file signature, hash) of the last fingerprint, and when the files were last checked
+_fingerprint = None
+_fingerprint_checked = 0.0
+_fingerprint_lock = threading.Lock()
+
+
+def _fingerprint_sources():
+    """Path, mtime and size of every file the fingerprint covers"""
+    sources = [PACKAGE_DIR / 'config' / name for name in ('agents.yaml', 'tasks.yaml', 'validation_rules.yaml')]
+    sources.append(PACKAGE_DIR / 'task_outputs.py')
+    sources += sorted((PACKAGE_DIR / 'tools').glob('*.py'))
+    sources += sorted(path for path in (PACKAGE_DIR.parents[1] / 'knowledge').rglob('*') if path.is_file())
+    signature = []
+    for path in sources:
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            # Removed since the listing, e.g. mid-way through an editor's atomic save
+            continue
+        signature.append((path, stat.st_mtime_ns, stat.st_size))
+    return tuple(signature)
+
+
+def config_fingerprint():
+    """
+    Hash of the crew config, output schemas, tool sources and knowledge base.
+
+    The files are checked for changes at most once per
+    FINGERPRINT_CHECK_INTERVAL seconds and hashed again only when one changed,
+    so edited templates change cache and memo keys while the server runs.
+    """
+    global _fingerprint, _fingerprint_checked
+    current = _fingerprint
+    if current is not None and time.monotonic() - _fingerprint_checked < FINGERPRINT_CHECK_INTERVAL:
+        return current[1]
+    with _fingerprint_lock:
+        signature = _fingerprint_sources()
+        if _fingerprint is None or _fingerprint[0] != signature:
+            digest = hashlib.sha256()
+            for path, _, _ in signature:
+                try:
+                    data = path.read_bytes()
+                except FileNotFoundError:
+                    continue
+                digest.update(path.name.encode())
+                digest.update(data)
+            _fingerprint = (signature, digest.hexdigest())
+        _fingerprint_checked = time.monotonic()
+        return _fingerprint[1]
+
+
+def normalize_request(user_input):
+    """Canonical form of the fields in KEY_FIELDS"""
+    normalized = {}
+    for field in KEY_FIELDS:
+        value = ' '.join(str(user_input.get(field) or '').split())
+        if field in CASE_INSENSITIVE_FIELDS:
+            value = value.lower()
+        normalized[field] = value
+    return normalized
+
+
+def request_key(user_input):
+    """Cache key for a build request"""
+    canonical = json.dumps(normalize_request(user_input), sort_keys=True)
+    return hashlib.sha256(f"{config_fingerprint()}:{canonical}".encode()).hexdigest()
+
+
+class LRUCache:
+    """
+    In-memory cache with least-recently-used eviction and a TTL.
+
+    Args:
+        max_entries: Entries kept before the least recently used is dropped
+        ttl: Seconds an entry stays valid (None keeps entries forever)
+    """
+
+    def __init__(self, max_entries=256, ttl=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, stored_at = entry
+            if self.ttl is not None and time.time() - stored_at > self.ttl:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (value, time.time())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SQLiteCache:
+    """
+    On-disk cache in a single SQLite file with a TTL and a size budget.
+
+    Args:
+        path: Database file, created if missing
+        ttl: Seconds an entry stays valid (None keeps entries forever)
+        max_bytes: Total size of stored values before least recently used
+            entries are evicted
+    """
+
+    def __init__(self, path, ttl=None, max_bytes=100 * 1024 * 1024):
+        self.path = str(path)
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+        # Several worker processes may share the file (see state.py)
+        self._db = SharedDatabase(self.path, (
+            "CREATE TABLE IF NOT EXISTS entries ("
+            " key TEXT PRIMARY KEY,"
+            " value TEXT NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " stored_at REAL NOT NULL,"
+            " accessed_at REAL NOT NULL)",
+            "CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed_at)"
+        ))
+        self._db.connection
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            row = self._db.execute(
+                "SELECT value, stored_at FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            value, stored_at = row
+            if self.ttl is not None and now - stored_at > self.ttl:
+                self._db.execute("DELETE FROM entries WHERE key = ?", (key,))
+                return None
+            self._db.execute("UPDATE entries SET accessed_at = ? WHERE key = ?", (now, key))
+        return json.loads(value)
+
+    def set(self, key, value):
+        data = json.dumps(value)
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO entries (key, value, size, stored_at, accessed_at)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (key, data, len(data), now, now)
+            )
+            self._evict(now)
+
+    def _evict(self, now):
+        if self.ttl is not None:
+            self._db.execute("DELETE FROM entries WHERE stored_at < ?", (now - self.ttl,))
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in self._db.execute(
+            "SELECT key, size FROM entries ORDER BY accessed_at"
+        ).fetchall():
+            self._db.execute("DELETE FROM entries WHERE key = ?", (key,))
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+
+class ResultCache:
+    """
+    Two-tier build result cache: an in-memory LRU in front of an optional
+    on-disk store. Disk hits are promoted into memory.
+    """
+
+    def __init__(self, memory, disk=None):
+        self.memory = memory
+        self.disk = disk
+        self.hits = 0
+        self.misses = 0
+        # Requests and build workers look up entries from many threads
+        self._stats_lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, prefix='PLANARIA_CACHE'):
+        """
+        Configure from environment variables (shown with the default prefix):
+            PLANARIA_CACHE_MAX_ENTRIES: in-memory entries (default 256)
+            PLANARIA_CACHE_TTL: seconds entries stay valid (default 86400)
+            PLANARIA_CACHE_PATH: SQLite file for the disk tier (disabled if
+                unset, unless workers share state under PLANARIA_STATE_DIR)
+            PLANARIA_CACHE_MAX_BYTES: disk tier size budget (default 100 MB)
+        """
+        ttl = float(os.getenv(f'{prefix}_TTL', '86400'))
+        memory = LRUCache(int(os.getenv(f'{prefix}_MAX_ENTRIES', '256')), ttl)
+        disk = None
+        path = os.getenv(f'{prefix}_PATH') or state_path(f'{prefix.lower()}.sqlite')
+        if path:
+            disk = SQLiteCache(
+                path,
+                ttl,
+                int(os.getenv(f'{prefix}_MAX_BYTES', str(100 * 1024 * 1024)))
+            )
+        return cls(memory, disk)
+
+    def get(self, key):
+        value = self.memory.get(key)
+        if value is None and self.disk is not None:
+            value = self.disk.get(key)
+            if value is not None:
+                self.memory.set(key, value)
+        with self._stats_lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def set(self, key, value):
+        self.memory.set(key, value)
+        if self.disk is not None:
+            self.disk.set(key, value)
+
+    def stats(self):
+        with self._stats_lock:
+            hits, misses = self.hits, self.misses
+        return {
+            'hits': hits,
+            'misses': misses,
+            'memory_entries': len(self.memory),
+            'disk_entries': len(self.disk) if self.disk is not None else None
+        }
@@ -0,0 +1,225 @@
+"""
+Token budgets for the context passed between crew tasks.
+
+Each task receives the raw outputs of the tasks in its `context:` list, so
+prompts grow with every stage. Budgets cap that context per agent
+(`context_budget:` in agents.yaml) and `context_sections:` in tasks.yaml
+chooses what a task needs from each upstream output:
+
+    context_sections:
+      analyze_requirements: [config, model]   # only matching fields or sections
+      generate_code: outline                  # file names and notes, no code
+
+Typed outputs (task_outputs.py) are passed as compact JSON of the chosen
+fields, with multi-line values such as file contents reduced to a line count
+in an outline. Outputs that stayed untyped are markdown: keywords pick the
+sections whose heading matches and an outline drops fenced code.
+
+An upstream without a rule is passed in full. When the context is still over
+the agent's budget, outputs are cut down to their leading lines: small ones
+stay whole and the largest share what is left of the budget.
+"""
+import json
+import os
+import re
+
+import yaml
+from crewai.utilities.formatter import DIVIDERS
+
+from cache import PACKAGE_DIR
+from tokens import count_tokens, count_tokens_batch, get_counter
+
+# Markdown headings ("## Setup") and bold-only lines ("**Setup:**")
+SECTION_HEADING = re.compile(r"^[ \t]{0,3}(?:#{1,6}[ \t]+(.+?)[ \t#]*|\*\*(.+?)\*\*:?[ \t]*)$", re.MULTILINE)
+FENCED_BLOCK = re.compile(r"^([ \t]*)(`{3,}|~{3,})[^\n]*\n.*?^[ \t]*\2[ \t]*$", re.MULTILINE | re.DOTALL)
+
+FULL = 'full'
+OUTLINE = 'outline'
+
+
+def split_sections(text):
+    """
+    Split markdown into sections at each heading.
+
+    Returns:
+        List of (heading, text) pairs; text before the first heading has heading ''
+    """
+    headings = list(SECTION_HEADING.finditer(text))
+    if not headings:
+        return [('', text)]
+    sections = [('', text[:headings[0].start()])] if headings[0].start() else []
+    for i, match in enumerate(headings):
+        end = headings[i + 1].start() if i + 1 < len(headings) else len(text)
+        sections.append(((match.group(1) or match.group(2)).strip(), text[match.start():end]))
+    return sections
+
+
+def keyword_pattern(keywords):
+    return re.compile('|'.join(re.escape(keyword) for keyword in keywords), re.IGNORECASE)
+
+
+def extract_sections(text, keywords):
+    """Sections whose heading mentions any of `keywords`; the whole text if none do"""
+    pattern = keyword_pattern(keywords)
+    selected = [body for heading, body in split_sections(text) if heading and pattern.search(heading)]
+    return ''.join(selected).strip() if selected else text
+
+
+def outline(text):
+    """`text` with the body of every fenced code block replaced by a one-line note"""
+    def omit(match):
+        lines = match.group(0).count('\n') - 1
+        return f"{match.group(1)}[{lines} lines of code omitted]"
+    return FENCED_BLOCK.sub(omit, text)
+
+
+def outline_value(value):
+    """JSON-able `value` with every multi-line string replaced by a one-line note"""
+    if isinstance(value, dict):
+        return {key: outline_value(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [outline_value(item) for item in value]
+    if isinstance(value, str) and '\n' in value.strip():
+        lines = value.strip().count('\n') + 1
+        return f"[{lines} lines omitted]"
+    return value
+
+
+def typed_context(model, rule=FULL):
+    """
+    Compact JSON of a typed task output for a downstream prompt.
+
+    Args:
+        model: TaskOutput.pydantic of the upstream task
+        rule: List of field name keywords (all fields if none match), 'outline' or 'full'
+    """
+    data = model.model_dump()
+    if rule == OUTLINE:
+        data = outline_value(data)
+    elif isinstance(rule, list):
+        pattern = keyword_pattern(rule)
+        data = {name: value for name, value in data.items() if pattern.search(name)} or data
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':'))
+
+
+def truncate(text, max_tokens):
+    """Leading lines of `text` that fit in `max_tokens`, with a note of what was cut"""
+    if count_tokens(text) <= max_tokens:
+        return text
+    kept = []
+    used = 0
+    for line in text.splitlines(keepends=True):
+        cost = count_tokens(line)
+        if used + cost > max_tokens:
+            # Keep the head of an overlong line rather than dropping it
+            head = get_counter().head(line, max_tokens - used)
+            kept.append(head)
+            used += count_tokens(head)
+            break
+        kept.append(line)
+        used += cost
+    text_kept = ''.join(kept).rstrip()
+    # Close a code block the cut left open
+    if len(re.findall(r"^[ \t]*(?:`{3,}|~{3,})", text_kept, re.MULTILINE)) % 2:
+        text_kept += "\n```"
+    return text_kept + f"\n[... {count_tokens(text) - used} tokens truncated]"
+
+
+class ContextBudget:
+    """
+    Per-task context limits and extraction rules.
+
+    Args:
+        budgets: Mapping of task name to the token budget of its agent's context
+        sections: Mapping of task name to {upstream task name: rule}, where a
+            rule is a list of field or heading keywords, 'outline' or 'full'
+    """
+
+    def __init__(self, budgets, sections):
+        self.budgets = budgets
+        self.sections = sections
+
+    @classmethod
+    def from_config(cls, config_dir=None):
+        """Budgets and rules from agents.yaml and tasks.yaml"""
+        config_dir = config_dir or PACKAGE_DIR / 'config'
+        with open(config_dir / 'agents.yaml') as f:
+            agents = yaml.safe_load(f) or {}
+        with open(config_dir / 'tasks.yaml') as f:
+            tasks = yaml.safe_load(f) or {}
+
+        budgets = {}
+        sections = {}
+        for name, task in tasks.items():
+            budget = agents.get(task.get('agent'), {}).get('context_budget')
+            if budget:
+                budgets[name] = int(budget)
+            if task.get('context_sections'):
+                sections[name] = task['context_sections']
+        return cls(budgets, sections)
+
+    @classmethod
+    def from_env(cls):
+        """Budgets from the config when PLANARIA_CONTEXT_BUDGETS=true, otherwise None"""
+        if os.getenv('PLANARIA_CONTEXT_BUDGETS', 'false').lower() != 'true':
+            return None
+        return cls.from_config()
+
+    def key(self, task_name):
+        """Part of a task's memo key: its context depends on these rules"""
+        return f"{self.budgets.get(task_name)}:{sorted(self.sections.get(task_name, {}).items())}"
+
+    def apply(self, task_name, upstream):
+        """
+        Build a task's context from its upstream outputs within its budget.
+
+        Args:
+            task_name: Name of the task about to run
+            upstream: TaskOutputs of the tasks in its context, in order
+
+        Returns:
+            Tuple of (context string, report with tokens before/after/saved)
+        """
+        rules = self.sections.get(task_name, {})
+        raws = [output.raw for output in upstream]
+        before = count_tokens(DIVIDERS.join(raws))
+
+        parts = []
+        for output in upstream:
+            rule = rules.get(output.name, FULL)
+            if output.pydantic is not None:
+                parts.append(typed_context(output.pydantic, rule))
+            elif rule == OUTLINE:
+                parts.append(outline(output.raw))
+            elif isinstance(rule, list):
+                parts.append(extract_sections(output.raw, rule))
+            else:
+                parts.append(output.raw)
+
+        budget = self.budgets.get(task_name)
+        if budget:
+            parts = self._fit(parts, budget)
+
+        context = DIVIDERS.join(parts)
+        after = count_tokens(context)
+        return context, {
+            'budget': budget,
+            'tokens_before': before,
+            'tokens_after': after,
+            'tokens_saved': before - after
+        }
+
+    @staticmethod
+    def _fit(parts, budget):
+        """Truncate parts to fit `budget`: small ones stay whole, large ones share the rest"""
+        sizes = count_tokens_batch(parts)
+        if sum(sizes) <= budget:
+            return parts
+
+        limits = {}
+        remaining = budget
+        smallest_first = sorted(range(len(parts)), key=lambda i: sizes[i])
+        for position, index in enumerate(smallest_first):
+            limits[index] = min(sizes[index], remaining // (len(parts) - position))
+            remaining -= limits[index]
+        return [truncate(part, limits[index]) for index, part in enumerate(parts)]
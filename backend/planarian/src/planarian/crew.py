@@ -1,13 +1,79 @@
 from crewai import Agent, Crew, Process, Task
 from crewai.project import CrewBase, agent, crew, task
 from crewai import LLM
+import hashlib
+import json
 import os
+import threading
+
+from logs import crew_verbose
+from llm_scheduler import get_scheduler, priority_for
+from task_outputs import SCHEMAS, OutputGuardrail, format_instructions
+from tokens import count_tokens
+
+# Model of agents without a `model:` in agents.yaml (see router.py)
+DEFAULT_MODEL = os.getenv("PLANARIA_DEFAULT_MODEL", "gemini-2.5-flash-lite")
 
 # Import tools using the @tool decorator
 from tools.code_generator_tool import generate_code
 from tools.prompt_optimizer_tool import optimize_prompt
 from tools.config_validator_tool import validate_config
 
+
+class ScheduledLLM(LLM):
+    """crewAI LLM whose calls go through the shared LLMScheduler"""
+
+    # Set while a call runs, so crewAI's internal re-calls bypass the scheduler
+    _local = threading.local()
+
+    def __init__(self, model, **kwargs):
+        # The scheduler retries with shared backoff; the provider SDK should not also retry
+        kwargs.setdefault('max_retries', 0)
+        super().__init__(model, **kwargs)
+
+    def call(self, messages, tools=None, callbacks=None, available_functions=None,
+             from_task=None, from_agent=None):
+        def upstream():
+            self._local.active = True
+            try:
+                return super(ScheduledLLM, self).call(
+                    messages, tools=tools, callbacks=callbacks,
+                    available_functions=available_functions,
+                    from_task=from_task, from_agent=from_agent
+                )
+            finally:
+                self._local.active = False
+
+        if getattr(self._local, 'active', False):
+            return upstream()
+
+        # Tool-calling requests have side effects through available_functions
+        key = None
+        if not available_functions:
+            key = hashlib.sha256(json.dumps(
+                [self.model, self.temperature, self.stop, messages, tools],
+                sort_keys=True, default=str
+            ).encode()).hexdigest()
+        tokens = count_tokens(messages) + (self.max_tokens or 0)
+        return get_scheduler().call(
+            self.model, upstream, key=key, tokens=tokens, priority=priority_for(from_task)
+        )
+
+def typed_task(config, agent):
+    """Task from its tasks.yaml config; one naming an `output_schema` has its answer validated against it"""
+    if not config.get('output_schema'):
+        return Task(config=config, agent=agent)
+    guardrail = OutputGuardrail(SCHEMAS[config['output_schema']])
+    task = Task(
+        config=config,
+        agent=agent,
+        expected_output=f"{config['expected_output'].rstrip()}\n\n{format_instructions(guardrail.schema)}",
+        guardrail=guardrail.check,
+        guardrail_max_retries=guardrail.retries
+    )
+    guardrail.task = task
+    return task
+
 @CrewBase
 class PlanarianCrew():
     """Planaria AI Agent Builder Crew using Gemini"""
@@ -15,13 +81,33 @@ class PlanarianCrew():
     agents_config = 'config/agents.yaml'
     tasks_config = 'config/tasks.yaml'
     
-    def __init__(self):
+    def __init__(self, llm=None, verbose=None):
+        # Pass a shared `llm` to reuse one client (and its HTTP session) across crews
+        self.llm = llm or self.create_llm()
+        # crewAI's console traces are synchronous stdout writes; off unless PLANARIA_VERBOSE=true
+        self.verbose = crew_verbose() if verbose is None else verbose
+    
+    @staticmethod
+    def create_llm(model=DEFAULT_MODEL):
         # Initialize Gemini model using CrewAI's built-in LLM
         # FIX: Changed model identifier from "gemini/gemini-pro" to "gemini-pro" 
         # for compatibility with LiteLLM/CrewAI and the Google AI SDK.
-        self.llm = LLM(
-    model="gemini-2.5-flash-lite",
-    api_key=os.getenv("GEMINI_API_KEY")
+        # PLANARIA_STREAM_TOKENS=true streams tokens to progress listeners
+        # Calls go through the shared rate-limit-aware scheduler (llm_scheduler.py)
+        stream = os.getenv("PLANARIA_STREAM_TOKENS", "false").lower() == "true"
+        base_url = os.getenv("PLANARIA_LLM_BASE_URL")
+        if base_url:
+            # OpenAI-compatible endpoint, e.g. fake_llm_server.py for load tests
+            return ScheduledLLM(
+                model=f"openai/{model}",
+                base_url=base_url,
+                api_key=os.getenv("PLANARIA_LLM_API_KEY", "fake"),
+                stream=stream
+            )
+        return ScheduledLLM(
+    model=model,
+    api_key=os.getenv("GEMINI_API_KEY"),
+    stream=stream
 )
     
     @agent
@@ -30,7 +116,7 @@ class PlanarianCrew():
             config=self.agents_config['config_analyst'],
             tools=[validate_config],
             llm=self.llm,
-            verbose=True
+            verbose=self.verbose
         )
     
     @agent
@@ -39,7 +125,7 @@ class PlanarianCrew():
             config=self.agents_config['prompt_engineer'],
             tools=[optimize_prompt],
             llm=self.llm,
-            verbose=True
+            verbose=self.verbose
         )
     
     @agent
@@ -48,7 +134,7 @@ class PlanarianCrew():
             config=self.agents_config['code_generator'],
             tools=[generate_code],
             llm=self.llm,
-            verbose=True
+            verbose=self.verbose
         )
     
     @agent
@@ -57,7 +143,7 @@ class PlanarianCrew():
             config=self.agents_config['qa_specialist'],
             tools=[validate_config],
             llm=self.llm,
-            verbose=True
+            verbose=self.verbose
         )
     
     @agent
@@ -65,43 +151,28 @@ class PlanarianCrew():
         return Agent(
             config=self.agents_config['documentation_writer'],
             llm=self.llm,
-            verbose=True
+            verbose=self.verbose
         )
     
     @task
     def analyze_requirements(self) -> Task:
-        return Task(
-            config=self.tasks_config['analyze_requirements'],
-            agent=self.config_analyst()
-        )
+        return typed_task(self.tasks_config['analyze_requirements'], self.config_analyst())
     
     @task
     def create_system_prompt(self) -> Task:
-        return Task(
-            config=self.tasks_config['create_system_prompt'],
-            agent=self.prompt_engineer()
-        )
+        return typed_task(self.tasks_config['create_system_prompt'], self.prompt_engineer())
     
     @task
     def generate_code(self) -> Task:
-        return Task(
-            config=self.tasks_config['generate_code'],
-            agent=self.code_generator()
-        )
+        return typed_task(self.tasks_config['generate_code'], self.code_generator())
     
     @task
     def validate_configuration(self) -> Task:
-        return Task(
-            config=self.tasks_config['validate_configuration'],
-            agent=self.qa_specialist()
-        )
+        return typed_task(self.tasks_config['validate_configuration'], self.qa_specialist())
     
     @task
     def create_documentation(self) -> Task:
-        return Task(
-            config=self.tasks_config['create_documentation'],
-            agent=self.documentation_writer()
-        )
+        return typed_task(self.tasks_config['create_documentation'], self.documentation_writer())
     
     @crew
     def crew(self) -> Crew:
@@ -110,5 +181,5 @@ class PlanarianCrew():
             agents=self.agents,
             tasks=self.tasks,
             process=Process.sequential,
-            verbose=True
+            verbose=self.verbose
         )
\ No newline at end of file
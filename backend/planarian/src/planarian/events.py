@@ -0,0 +1,93 @@
+"""
+Per-build progress events.
+
+crewAI publishes task and LLM events on a single process-wide bus. This module
+subscribes to it once and forwards each event to whichever build owns the task,
+so concurrent builds only ever see their own progress.
+"""
+import threading
+from contextlib import contextmanager
+
+from crewai.events import (
+    crewai_event_bus,
+    LLMStreamChunkEvent,
+    TaskCompletedEvent,
+    TaskFailedEvent,
+    TaskStartedEvent,
+)
+
+_listeners = {}
+_lock = threading.Lock()
+
+
+def _emit(task_id, event):
+    with _lock:
+        listener = _listeners.get(str(task_id))
+    if listener:
+        listener(event)
+
+
+@crewai_event_bus.on(TaskStartedEvent)
+def _on_task_started(source, event):
+    if event.task is not None:
+        _emit(event.task.id, {
+            'event': 'task_started',
+            'task': event.task.name
+        })
+
+
+@crewai_event_bus.on(TaskCompletedEvent)
+def _on_task_completed(source, event):
+    if event.task is not None:
+        _emit(event.task.id, {
+            'event': 'task_completed',
+            'task': event.task.name,
+            'output': event.output.raw
+        })
+
+
+@crewai_event_bus.on(TaskFailedEvent)
+def _on_task_failed(source, event):
+    if event.task is not None:
+        _emit(event.task.id, {
+            'event': 'task_failed',
+            'task': event.task.name,
+            'error': event.error
+        })
+
+
+@crewai_event_bus.on(LLMStreamChunkEvent)
+def _on_stream_chunk(source, event):
+    # Only emitted when the LLM is created with stream=True
+    if event.task_id:
+        _emit(event.task_id, {
+            'event': 'token',
+            'task': event.task_name,
+            'chunk': event.chunk
+        })
+
+
+def publish(task, event):
+    """Send an event for `task` that did not come from the crewAI bus"""
+    _emit(task.id, event)
+
+
+@contextmanager
+def listen(crew, listener):
+    """
+    Forward progress events for the tasks of `crew` to `listener`.
+
+    Args:
+        crew: The Crew whose tasks should be observed
+        listener: Callable receiving one event dict per progress event
+    """
+    task_ids = [str(task.id) for task in crew.tasks]
+    with _lock:
+        for task_id in task_ids:
+            _listeners[task_id] = listener
+    try:
+        yield
+    finally:
+        with _lock:
+            for task_id in task_ids:
+                _listeners.pop(task_id, None)
@@ -0,0 +1,160 @@
+"""
+Process-level pool of ready-to-run Planarian crews.
+
+Building a crew parses agents.yaml/tasks.yaml, creates an LLM client and
+instantiates five agents and five tasks. The factory creates each LLM client
+once, keeps up to `pool_size` built crews and leases each one to a single
+build at a time, so concurrent builds never share agent or task state. A
+returned crew is cleared of what its build left behind (see reset_crew), so
+consecutive builds on one crew don't share it either. It also
+keeps the number of PlanarianCrew instances bounded: crewAI memoizes the
+@agent/@task methods per instance for the lifetime of the process.
+"""
+import logging
+import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
+
+from crew import DEFAULT_MODEL, PlanarianCrew
+from router import ModelRouter
+
+logger = logging.getLogger('planaria.build')
+
+
+def reset_crew(crew):
+    """Clear the task outputs, agent tool results and tool cache a build left on a crew"""
+    for task in crew.tasks:
+        task.output = None
+        task.prompt_context = None
+        task.processed_by_agents = set()
+        task.used_tools = task.tools_errors = task.delegations = task.retry_count = 0
+        task.start_time = task.end_time = None
+    for agent in crew.agents:
+        agent.tools_results = []
+        if agent.cache_handler is not None:
+            agent.cache_handler._cache.clear()
+    crew._cache_handler._cache.clear()
+    crew.usage_metrics = None
+
+
+class CrewFactory:
+    """
+    Hands out pooled crews that share one LLM client.
+
+    Args:
+        pool_size: Maximum number of crews built; leases beyond that wait
+        llm: LLM crews are built with (default: PlanarianCrew.create_llm())
+        router: Optional router.ModelRouter choosing each agent's model per build
+    """
+
+    def __init__(self, pool_size=4, llm=None, router=None):
+        start = time.perf_counter()
+        self.pool_size = pool_size
+        self.router = router
+        if llm is None:
+            llm = router.llm(DEFAULT_MODEL) if router else PlanarianCrew.create_llm()
+        self.llm = llm
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+        self.startup_seconds = time.perf_counter() - start
+        self.build_seconds = 0.0
+        self.leases = 0
+        self.lease_seconds = 0.0
+
+    @classmethod
+    def from_env(cls, llm=None):
+        """
+        Pool sized to PLANARIA_CREW_POOL_SIZE (default: PLANARIA_MAX_CONCURRENT_BUILDS).
+        Models are routed per agent unless a single `llm` is given.
+        """
+        pool_size = os.getenv('PLANARIA_CREW_POOL_SIZE') or os.getenv('PLANARIA_MAX_CONCURRENT_BUILDS', '4')
+        router = ModelRouter.from_env(PlanarianCrew.create_llm, DEFAULT_MODEL) if llm is None else None
+        return cls(pool_size=int(pool_size), llm=llm, router=router)
+
+    def warm(self, count=None):
+        """Build crews ahead of time so the first requests don't pay for it"""
+        count = min(count or self.pool_size, self.pool_size)
+        while True:
+            with self._lock:
+                if self._created >= count:
+                    return
+                self._created += 1
+            try:
+                self._idle.put(self._build())
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
+
+    @contextmanager
+    def lease(self):
+        """
+        Borrow a crew for one build.
+
+        Yields:
+            A Crew that no other build uses until the block exits, with no
+            outputs or tool results from earlier builds
+        """
+        start = time.perf_counter()
+        crew = self._acquire()
+        with self._lock:
+            self.leases += 1
+            self.lease_seconds += time.perf_counter() - start
+        try:
+            yield crew
+        finally:
+            self._release(crew)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'pool_size': self.pool_size,
+                'crews_built': self._created,
+                'crews_idle': self._idle.qsize(),
+                'startup_seconds': round(self.startup_seconds, 4),
+                'build_seconds': round(self.build_seconds, 4),
+                'leases': self.leases,
+                'avg_lease_seconds': round(self.lease_seconds / self.leases, 6) if self.leases else None
+            }
+
+    def _acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            can_build = self._created < self.pool_size
+            if can_build:
+                self._created += 1
+        if not can_build:
+            return self._idle.get()
+        try:
+            return self._build()
+        except Exception:
+            with self._lock:
+                self._created -= 1
+            raise
+
+    def _release(self, crew):
+        try:
+            reset_crew(crew)
+        except Exception:
+            # A crew that can't be cleared is dropped; the next lease builds a fresh one
+            logger.exception("Dropping a pooled crew that could not be reset")
+            with self._lock:
+                self._created -= 1
+            return
+        self._idle.put(crew)
+
+    def _build(self):
+        start = time.perf_counter()
+        crew = PlanarianCrew(llm=self.llm).crew()
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self.build_seconds += elapsed
+        return crew
@@ -0,0 +1,170 @@
+#!/usr/bin/env python
+"""
+Local OpenAI-compatible LLM server with a rate limit, for exercising the LLM
+scheduler (llm_scheduler.py) without a real API key.
+
+POST /v1/chat/completions answers deterministically in crewAI's
+"Final Answer:" format after `--latency` seconds, with a JSON object of the
+task's schema when the prompt asks for one (task_outputs.py). With `--rpm`, requests over
+the per-minute limit get 429 with a Retry-After header, like a real provider.
+GET /stats reports how many requests were served and rejected.
+
+Usage:
+    python fake_llm_server.py --port 8399 --rpm 30 --latency 0.2
+    PLANARIA_LLM_BASE_URL=http://127.0.0.1:8399/v1 python api.py
+"""
+import argparse
+import hashlib
+import json
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from task_outputs import SCHEMAS, example, format_instructions
+
+# Format instructions in a prompt -> schema of the answer it asks for
+INSTRUCTIONS = {format_instructions(schema): schema for schema in SCHEMAS.values()}
+
+
+class FakeLLMState:
+    """Request log and rate limit shared by the server's handler threads"""
+
+    def __init__(self, rpm=None, latency=0.0):
+        self.rpm = rpm
+        self.latency = latency
+        self.served = 0
+        self.rejected = 0
+        self._recent = deque()
+        self._lock = threading.Lock()
+
+    def admit(self):
+        """
+        Returns:
+            0 if the request may run, else the seconds until it could
+        """
+        with self._lock:
+            now = time.monotonic()
+            while self._recent and now - self._recent[0] >= 60:
+                self._recent.popleft()
+            if self.rpm and len(self._recent) >= self.rpm:
+                self.rejected += 1
+                return 60 - (now - self._recent[0])
+            self._recent.append(now)
+            self.served += 1
+            return 0
+
+    def stats(self):
+        with self._lock:
+            return {'served': self.served, 'rejected': self.rejected, 'rpm': self.rpm}
+
+
+def answer(messages, digest):
+    """Final answer for a prompt: typed when it asks for one of the task schemas"""
+    text = ''.join(str(message.get('content', '')) for message in messages)
+    for instructions, schema in INSTRUCTIONS.items():
+        if instructions in text:
+            return example(schema, f"Response {digest}").model_dump_json()
+    return f"Response {digest}"
+
+
+def completion(request):
+    """Chat completion response for an OpenAI-style request body"""
+    messages = request.get('messages') or []
+    prompt = json.dumps(messages, sort_keys=True)
+    digest = hashlib.sha256(prompt.encode()).hexdigest()[:12]
+    content = f"Thought: I now know the final answer\nFinal Answer: {answer(messages, digest)}"
+    prompt_tokens = max(1, len(prompt) // 4)
+    completion_tokens = max(1, len(content) // 4)
+    return {
+        'id': f'chatcmpl-{digest}',
+        'object': 'chat.completion',
+        'created': int(time.time()),
+        'model': request.get('model', 'fake'),
+        'choices': [{
+            'index': 0,
+            'message': {'role': 'assistant', 'content': content},
+            'finish_reason': 'stop'
+        }],
+        'usage': {
+            'prompt_tokens': prompt_tokens,
+            'completion_tokens': completion_tokens,
+            'total_tokens': prompt_tokens + completion_tokens
+        }
+    }
+
+
+def make_handler(state):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def _send(self, status, body, headers=None):
+            data = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            if self.path.rstrip('/') == '/stats':
+                self._send(200, state.stats())
+            else:
+                self._send(404, {'error': {'message': 'Not found'}})
+
+        def do_POST(self):
+            length = int(self.headers.get('Content-Length') or 0)
+            request = json.loads(self.rfile.read(length) or b'{}')
+            if not self.path.rstrip('/').endswith('/chat/completions'):
+                self._send(404, {'error': {'message': 'Not found'}})
+                return
+            wait = state.admit()
+            if wait:
+                self._send(429, {'error': {'message': 'Rate limit exceeded', 'type': 'rate_limit_error'}},
+                           {'Retry-After': f'{wait:.2f}'})
+                return
+            if state.latency:
+                time.sleep(state.latency)
+            self._send(200, completion(request))
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def start(port=0, rpm=None, latency=0.0):
+    """
+    Run the server in a background thread.
+
+    Returns:
+        Tuple of (server, FakeLLMState); the base URL is
+        f"http://127.0.0.1:{server.server_port}/v1"
+    """
+    state = FakeLLMState(rpm=rpm, latency=latency)
+    server = ThreadingHTTPServer(('127.0.0.1', port), make_handler(state))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True, name='fake-llm').start()
+    return server, state
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--port', type=int, default=8399)
+    parser.add_argument('--rpm', type=float, default=None, help='Requests per minute before answering 429')
+    parser.add_argument('--latency', type=float, default=0.0, help='Seconds per completion')
+    args = parser.parse_args()
+
+    state = FakeLLMState(rpm=args.rpm, latency=args.latency)
+    server = ThreadingHTTPServer(('127.0.0.1', args.port), make_handler(state))
+    print(f"Fake LLM serving http://127.0.0.1:{args.port}/v1 (rpm={args.rpm}, latency={args.latency}s)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
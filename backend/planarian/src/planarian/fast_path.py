@@ -0,0 +1,165 @@
+"""
+LLM-free replacements for crew tasks.
+
+In fast mode the DAG scheduler calls these instead of running the matching
+task through its agent. Each override receives the build inputs and the
+outputs of the task's upstream context, and returns the task's raw output
+together with any artifacts worth returning to the client, or None when the
+task should run through its agent after all. Outputs are instances of the
+task's schema (task_outputs.py), just like a validated answer of its agent.
+"""
+import re
+
+from similar import words
+from task_outputs import CodePackage, SystemPrompt
+from tools.code_templates import iter_bundle
+from tools.config_rules import DEFAULT_RULES
+from tools.prompt_library import LIBRARY
+
+FENCED_BLOCK = re.compile(r"```[\w-]*\n(.*?)```", re.DOTALL)
+NUMBER_SETTING = r"{name}[^0-9\n]{{0,40}}([0-9]+(?:\.[0-9]+)?)"
+
+
+def extract_system_prompt(text):
+    """The system prompt from a prompt engineer's output: its first fenced block, if any"""
+    match = FENCED_BLOCK.search(text)
+    return (match.group(1) if match else text).strip()
+
+
+def system_prompt_of(output):
+    """The system prompt from the prompt engineer's TaskOutput, typed or not"""
+    if output.pydantic is not None:
+        return output.pydantic.system_prompt
+    return extract_system_prompt(output.raw)
+
+
+def extract_setting(text, name, cast, default):
+    """A numeric setting such as `temperature: 0.7` mentioned in an analysis"""
+    match = re.search(NUMBER_SETTING.format(name=name), text, re.IGNORECASE)
+    if not match:
+        return default
+    try:
+        return cast(match.group(1))
+    except ValueError:
+        return default
+
+
+def agent_config(inputs, analysis=None):
+    """
+    Agent configuration for the code templates.
+
+    Args:
+        inputs: Build inputs, which name the agent and its model
+        analysis: TaskOutput of analyze_requirements, whose model settings
+            are used when given
+    """
+    agent_type = inputs.get('agent_type') or 'agent'
+    settings = getattr(getattr(analysis, 'pydantic', None), 'config', None)
+    if settings is not None:
+        temperature, max_tokens = settings.temperature, settings.max_tokens
+    else:
+        text = analysis.raw if analysis is not None else ""
+        temperature = extract_setting(text, 'temperature', float, 0.7)
+        max_tokens = extract_setting(text, 'max(?:imum)?[ _]?(?:output[ _])?tokens', int, 1024)
+    return {
+        'name': ' '.join(part.capitalize() for part in re.split(r"[\s_-]+", agent_type) if part),
+        'model': inputs.get('desired_model') or 'gemini-1.5-flash',
+        'temperature': temperature,
+        'max_tokens': max_tokens
+    }
+
+
+def bundle_spec(inputs, analysis, prompt_output):
+    """
+    Everything the code templates need to render a project for a build.
+
+    Args:
+        inputs: Build inputs
+        analysis: TaskOutput of analyze_requirements, or None
+        prompt_output: TaskOutput of create_system_prompt
+    """
+    return {
+        'framework': (inputs.get('target_framework') or '').lower(),
+        'config': agent_config(inputs, analysis),
+        'system_prompt': system_prompt_of(prompt_output)
+    }
+
+
+def prompt_request(inputs):
+    """(use case, personality, model, agent type, requirements) a system prompt is written for"""
+    requirements = (inputs.get('additional_requirements') or '').strip()
+    return (inputs.get('use_case') or '', inputs.get('personality') or '',
+            inputs.get('desired_model') or '', inputs.get('agent_type') or '',
+            (requirements,) if requirements else ())
+
+
+def analysis_requirements(analysis):
+    """Technical requirements and considerations of an analyze_requirements TaskOutput"""
+    typed = getattr(analysis, 'pydantic', None)
+    if typed is None:
+        return []
+    return list(typed.technical_requirements) + list(typed.considerations)
+
+
+def uncovered_words(inputs, prompt):
+    """Content words of the request's use case, personality and requirements missing from `prompt`"""
+    request = ' '.join(inputs.get(field) or '' for field in ('use_case', 'personality', 'additional_requirements'))
+    return sorted(set(words(request)) - set(words(prompt)))
+
+
+def prompt_problems(inputs, prompt):
+    """Issues and warnings the validator's system prompt rules raise for `prompt`"""
+    config = dict(agent_config(inputs), system_prompt=prompt,
+                  personality=inputs.get('personality'), type=inputs.get('agent_type'))
+    rule_ids = [rule.id for rule in DEFAULT_RULES.rules if 'system_prompt' in rule.inputs]
+    findings = DEFAULT_RULES.evaluate(config, rule_ids)
+    return [message for rule_findings in findings.values()
+            for severity, message in rule_findings if severity != 'recommendation']
+
+
+def create_system_prompt(inputs, upstream):
+    """
+    Reuse the prompt written for an identical earlier request, or assemble one
+    from the skeleton library with the request's additional requirements and
+    the requirements analysis; decline (run the prompt engineer) when the
+    prompt leaves out words of the request or the validator has issues or
+    warnings about it.
+    """
+    use_case, personality, model, agent_type, requirements = prompt_request(inputs)
+    prompt = LIBRARY.recall(use_case, personality, model, agent_type, requirements)
+    source = 'cache'
+    techniques = []
+    if prompt is None:
+        requirements += tuple(analysis_requirements(upstream.get('analyze_requirements')))
+        assembled = LIBRARY.assemble(use_case, personality, model, agent_type, requirements)
+        prompt = assembled['optimized_prompt']
+        source = f"skeleton:{assembled['skeleton']}"
+        techniques = assembled['model_features']
+    if uncovered_words(inputs, prompt) or prompt_problems(inputs, prompt):
+        return None
+    return SystemPrompt(system_prompt=prompt, techniques=techniques), {'system_prompt_source': source}
+
+
+def remember_prompt(inputs, result):
+    """Keep the prompt engineer's prompt from a finished build for identical requests"""
+    timings = getattr(result, 'timings', None) or {}
+    if 'create_system_prompt' in timings.get('overridden', ()):
+        return
+    for output in getattr(result, 'tasks_output', []):
+        if output.name == 'create_system_prompt':
+            LIBRARY.remember(*prompt_request(inputs), system_prompt_of(output))
+
+
+def generate_code(inputs, upstream):
+    """Render the project bundle straight from the templates"""
+    spec = bundle_spec(inputs, upstream.get('analyze_requirements'), upstream['create_system_prompt'])
+    files = {filename: content for _, filename, content
+             in iter_bundle(spec['framework'], spec['config'], spec['system_prompt'])}
+    return CodePackage(files=files), {'bundle': spec}
+
+
+# Task name -> override used when a build runs in fast mode
+OVERRIDES = {
+    'create_system_prompt': create_system_prompt,
+    'generate_code': generate_code
+}
@@ -0,0 +1,328 @@
+"""
+Background job queue for agent builds.
+
+A build runs the full crew and can take minutes, so the API hands the work to
+a bounded thread pool and returns a job id that clients poll for the result.
+When several worker processes serve the API, each job's status is also kept
+in a SQLite file they share, so any worker can answer a poll for any job.
+"""
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from state import SharedDatabase, state_path
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+logger = logging.getLogger('planaria.jobs')
+
+
+class QueueFullError(Exception):
+    """Raised when a job is submitted while the queue is at capacity"""
+
+
+class Job:
+    """A single build submitted to the queue"""
+
+    def __init__(self, payload, on_event=None):
+        self.id = uuid.uuid4().hex
+        self.payload = payload
+        self.on_event = on_event
+        # Future of the queued run, done once the job has finished (None if not run here)
+        self.future = None
+        self.status = QUEUED
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+
+    @property
+    def done(self):
+        return self.status in (SUCCEEDED, FAILED)
+
+    def to_dict(self):
+        return {
+            'job_id': self.id,
+            'status': self.status,
+            'result': self.result,
+            'error': self.error,
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        """Job as seen by a process that is not running it (no payload or listener)"""
+        job = cls(None)
+        job.id = data['job_id']
+        for field in ('status', 'result', 'error', 'created_at', 'started_at', 'finished_at'):
+            setattr(job, field, data[field])
+        return job
+
+
+def _process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class SQLiteJobStore:
+    """
+    Status of the jobs of every worker process, in a shared SQLite file.
+
+    Args:
+        path: Database file, created if missing
+        max_retained: Finished jobs kept for polling
+    """
+
+    def __init__(self, path, max_retained=1000):
+        self.path = str(path)
+        self.max_retained = max_retained
+        self._lock = threading.Lock()
+        self._db = SharedDatabase(self.path, (
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " job_id TEXT PRIMARY KEY,"
+            " status TEXT NOT NULL,"
+            " result TEXT,"
+            " error TEXT,"
+            " created_at REAL NOT NULL,"
+            " started_at REAL,"
+            " finished_at REAL,"
+            " pid INTEGER NOT NULL)",
+            "CREATE INDEX IF NOT EXISTS jobs_finished ON jobs (finished_at)"
+        ))
+        self._db.connection
+
+    def save(self, job):
+        """Store the job's current status; finished jobs beyond max_retained are dropped"""
+        result = json.dumps(job.result) if job.result is not None else None
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO jobs"
+                " (job_id, status, result, error, created_at, started_at, finished_at, pid)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (job.id, job.status, result, job.error, job.created_at,
+                 job.started_at, job.finished_at, os.getpid())
+            )
+            if job.done:
+                self._db.execute(
+                    "DELETE FROM jobs WHERE job_id IN (SELECT job_id FROM jobs"
+                    " WHERE finished_at IS NOT NULL ORDER BY finished_at DESC LIMIT -1 OFFSET ?)",
+                    (self.max_retained,)
+                )
+
+    def load(self, job_id):
+        """
+        The stored job, or None if unknown or evicted. Unfinished jobs of a
+        worker that has exited are reported as failed.
+        """
+        with self._lock:
+            row = self._db.execute(
+                "SELECT job_id, status, result, error, created_at, started_at, finished_at, pid"
+                " FROM jobs WHERE job_id = ?", (job_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        job = Job.from_dict(dict(zip(
+            ('job_id', 'status', 'result', 'error', 'created_at', 'started_at', 'finished_at'), row
+        )))
+        if job.result is not None:
+            job.result = json.loads(job.result)
+        if not job.done and not _process_alive(row[7]):
+            job.status = FAILED
+            job.error = "The worker running this job exited"
+        return job
+
+    def counts(self):
+        """Stored jobs by status, counting unfinished jobs of exited workers as failed"""
+        with self._lock:
+            rows = self._db.execute("SELECT status, pid, COUNT(*) FROM jobs GROUP BY status, pid").fetchall()
+        counts = {}
+        for status, pid, count in rows:
+            if status in (QUEUED, RUNNING) and not _process_alive(pid):
+                status = FAILED
+            counts[status] = counts.get(status, 0) + count
+        return counts
+
+
+class JobQueue:
+    """
+    Runs jobs on a fixed number of worker threads with a bounded backlog.
+
+    Args:
+        worker: Callable taking a job payload and an `on_event` listener
+            (may be None) and returning a JSON-able result
+        max_workers: Number of jobs that may run at the same time
+        max_queued: Number of jobs that may wait for a free worker
+        max_retained: Number of finished jobs kept around for polling
+        store: Optional SQLiteJobStore shared with other worker processes
+    """
+
+    def __init__(self, worker, max_workers=4, max_queued=256, max_retained=1000, store=None):
+        self.worker = worker
+        self.max_workers = max_workers
+        self.max_queued = max_queued
+        self.max_retained = max_retained
+        self.store = store
+
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers,
+            thread_name_prefix="planaria-build"
+        )
+        self._slots = threading.BoundedSemaphore(max_workers + max_queued)
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, worker):
+        """
+        Create a queue sized from PLANARIA_* environment variables. Job status
+        is shared with the other workers when they keep state under
+        PLANARIA_STATE_DIR (see state.py).
+        """
+        max_retained = int(os.getenv('PLANARIA_MAX_RETAINED_JOBS', '1000'))
+        path = state_path('jobs.sqlite')
+        return cls(
+            worker,
+            max_workers=int(os.getenv('PLANARIA_MAX_CONCURRENT_BUILDS', '4')),
+            max_queued=int(os.getenv('PLANARIA_MAX_QUEUED_BUILDS', '256')),
+            max_retained=max_retained,
+            store=SQLiteJobStore(path, max_retained) if path else None
+        )
+
+    def submit(self, payload, on_event=None):
+        """
+        Queue a payload for the worker.
+
+        Args:
+            payload: Input passed to the worker
+            on_event: Optional progress listener passed to the worker
+
+        Returns:
+            The queued Job
+
+        Raises:
+            QueueFullError: If every worker is busy and the backlog is full
+        """
+        if not self._slots.acquire(blocking=False):
+            raise QueueFullError(
+                f"Build queue is full ({self.max_workers} running, {self.max_queued} queued)"
+            )
+
+        job = Job(payload, on_event)
+        with self._lock:
+            self._jobs[job.id] = job
+            self._evict_finished()
+        if self.store:
+            self.store.save(job)
+
+        try:
+            job.future = self._executor.submit(self._run, job)
+        except RuntimeError:
+            # Executor is shutting down
+            self._slots.release()
+            with self._lock:
+                self._jobs.pop(job.id, None)
+            if self.store:
+                job.status = FAILED
+                job.error = "Build queue is shutting down"
+                job.finished_at = time.time()
+                self.store.save(job)
+            raise QueueFullError("Build queue is shutting down")
+
+        return job
+
+    def get(self, job_id):
+        """
+        Return the job with the given id, or None if unknown or evicted. With
+        a store, jobs of other worker processes are found too.
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None and self.store:
+            job = self.store.load(job_id)
+        return job
+
+    def stats(self):
+        """Counts of jobs by status (of every worker process when they share a store)"""
+        counts = {QUEUED: 0, RUNNING: 0, SUCCEEDED: 0, FAILED: 0}
+        if self.store:
+            counts.update(self.store.counts())
+        else:
+            with self._lock:
+                for job in self._jobs.values():
+                    counts[job.status] += 1
+        counts['max_workers'] = self.max_workers
+        counts['max_queued'] = self.max_queued
+        return counts
+
+    def shutdown(self, wait=False):
+        """
+        Stop the worker threads. Jobs that had not started are marked failed
+        and their queue slots released.
+        """
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+        with self._lock:
+            cancelled = [job for job in self._jobs.values() if job.future is not None and job.future.cancelled()]
+        for job in cancelled:
+            job.status = FAILED
+            job.error = "Build queue shut down before the job started"
+            job.finished_at = time.time()
+            on_event, job.on_event = job.on_event, None
+            if on_event:
+                try:
+                    on_event({'event': 'build_failed', 'error': job.error})
+                except Exception:
+                    # The listener's event loop may already be closed
+                    pass
+            if self.store:
+                try:
+                    self.store.save(job)
+                except Exception:
+                    logger.exception("Could not store the status of job %s", job.id)
+            self._slots.release()
+
+    def _run(self, job):
+        job.status = RUNNING
+        job.started_at = time.time()
+        if self.store:
+            self.store.save(job)
+        try:
+            job.result = self.worker(job.payload, on_event=job.on_event)
+            job.status = SUCCEEDED
+        except Exception as e:
+            logger.warning("Job %s failed: %s", job.id, e)
+            job.error = str(e)
+            job.status = FAILED
+        finally:
+            job.finished_at = time.time()
+            job.on_event = None
+            if self.store:
+                try:
+                    self.store.save(job)
+                except Exception:
+                    logger.exception("Could not store the status of job %s", job.id)
+            self._slots.release()
+
+    def _evict_finished(self):
+        """Drop the oldest finished jobs once more than max_retained are held"""
+        if len(self._jobs) <= self.max_retained:
+            return
+        for job_id in [j.id for j in self._jobs.values() if j.done]:
+            if len(self._jobs) <= self.max_retained:
+                break
+            del self._jobs[job_id]
@@ -0,0 +1,414 @@
+"""
+Shared, rate-limit-aware scheduler for LLM calls.
+
+Every crew in the process calls the same API key, so all LLM calls pass
+through one LLMScheduler that:
+
+- admits calls through per-model token buckets for requests/min and tokens/min,
+- serves interactive builds before batch builds when calls have to wait,
+- retries rate-limited and overloaded calls with jittered exponential
+  backoff, honouring Retry-After, and
+- coalesces identical in-flight prompts so they share one upstream call.
+
+With several worker processes (prefork.py), the buckets live in a SQLite file
+they share (state.py), so the limits hold for the server as a whole.
+
+crew.ScheduledLLM routes crewAI's LLM calls through it; this module itself
+does not import crewAI, so the API can report scheduler stats before the
+crew machinery is loaded.
+
+fake_llm_server.py provides a local OpenAI-compatible server with its own
+rate limit to exercise this without a real key.
+"""
+import heapq
+import itertools
+import logging
+import os
+import random
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import contextmanager
+
+from state import SharedDatabase, state_path
+
+logger = logging.getLogger('planaria.llm')
+
+INTERACTIVE = 'interactive'
+BATCH = 'batch'
+PRIORITIES = {INTERACTIVE: 0, BATCH: 1}
+
+# HTTP statuses worth retrying: rate limited, or the provider is overloaded
+RETRYABLE_STATUSES = (429, 500, 502, 503, 504)
+# Exception classes (LiteLLM, OpenAI and Google clients) for the same, matched
+# by name so this module needs none of those packages
+RETRYABLE_ERRORS = frozenset((
+    'RateLimitError', 'ServiceUnavailableError', 'InternalServerError', 'APIConnectionError',
+    'APITimeoutError', 'Timeout', 'ResourceExhausted', 'ServiceUnavailable', 'TooManyRequests'
+))
+
+
+def status_code(error):
+    """HTTP status of an LLM error, from the error or its response, if it has one"""
+    for source in (error, getattr(error, 'response', None)):
+        try:
+            return int(getattr(source, 'status_code', None))
+        except (TypeError, ValueError):
+            continue
+    return None
+
+
+def is_retryable(error):
+    """Whether an LLM error, or the error it was raised from, is transient (rate limit or overload)"""
+    seen = set()
+    while error is not None and id(error) not in seen:
+        seen.add(id(error))
+        status = status_code(error)
+        if status is not None:
+            return status in RETRYABLE_STATUSES
+        if any(cls.__name__ in RETRYABLE_ERRORS for cls in type(error).__mro__):
+            return True
+        error = error.__cause__
+    return False
+
+
+def retry_after(error):
+    """Seconds the provider asked us to wait, if it said"""
+    # LiteLLM keeps the provider's headers apart from the (rebuilt) response
+    for headers in (getattr(error, 'litellm_response_headers', None),
+                    getattr(getattr(error, 'response', None), 'headers', None)):
+        try:
+            return float((headers or {}).get('retry-after'))
+        except (TypeError, ValueError):
+            continue
+    return None
+
+
+class TokenBucket:
+    """
+    Refills continuously at `per_minute` units per minute, holding at most
+    `capacity` (default: one minute's worth).
+    """
+
+    def __init__(self, per_minute, capacity=None, clock=time.monotonic):
+        self.rate = per_minute / 60.0
+        self.capacity = capacity or per_minute
+        self.clock = clock
+        self.tokens = self.capacity
+        self.updated = clock()
+
+    def _refill(self):
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount):
+        """Seconds until `amount` is available (0 if it is now)"""
+        self._refill()
+        amount = min(amount, self.capacity)
+        return 0.0 if self.tokens >= amount else (amount - self.tokens) / self.rate
+
+    def take(self, amount):
+        self.tokens -= min(amount, self.capacity)
+
+    def drain(self):
+        """Empty the bucket, e.g. after the provider said we are over the limit"""
+        self._refill()
+        self.tokens = min(self.tokens, 0.0)
+
+
+class TokenBuckets:
+    """The request and token buckets of each model, in this process"""
+
+    def __init__(self):
+        self._buckets = {}
+
+    def _bucket(self, model, kind, per_minute):
+        if (model, kind) not in self._buckets:
+            self._buckets[(model, kind)] = TokenBucket(per_minute)
+        return self._buckets[(model, kind)]
+
+    def take(self, model, needs):
+        """
+        Take every amount in `needs` at once, or nothing.
+
+        Args:
+            model: Model the call goes to
+            needs: (kind, per minute limit, amount) per limit the call is under
+
+        Returns:
+            0 when taken, else the seconds until all amounts are available
+        """
+        buckets = [(self._bucket(model, kind, per_minute), amount) for kind, per_minute, amount in needs]
+        wait = max(bucket.wait_time(amount) for bucket, amount in buckets)
+        if wait == 0:
+            for bucket, amount in buckets:
+                bucket.take(amount)
+        return wait
+
+    def drain(self, model):
+        for (bucket_model, _), bucket in self._buckets.items():
+            if bucket_model == model:
+                bucket.drain()
+
+
+class SQLiteTokenBuckets:
+    """
+    Token buckets kept in a SQLite file, so worker processes calling with the
+    same API key draw from the same budget. Same interface as TokenBuckets.
+
+    Args:
+        path: Database file, created if missing
+    """
+
+    def __init__(self, path):
+        self.path = str(path)
+        self._db = SharedDatabase(self.path, (
+            "CREATE TABLE IF NOT EXISTS buckets ("
+            " model TEXT NOT NULL,"
+            " kind TEXT NOT NULL,"
+            " tokens REAL NOT NULL,"
+            " updated REAL NOT NULL,"
+            " PRIMARY KEY (model, kind))",
+        ))
+
+    def _load(self, db, model, kind, per_minute):
+        # Wall clock time: monotonic clocks are not comparable between processes
+        bucket = TokenBucket(per_minute, clock=time.time)
+        row = db.execute(
+            "SELECT tokens, updated FROM buckets WHERE model = ? AND kind = ?", (model, kind)
+        ).fetchone()
+        if row is not None:
+            bucket.tokens, bucket.updated = row
+        return bucket
+
+    def _store(self, db, model, kind, bucket):
+        db.execute("INSERT OR REPLACE INTO buckets (model, kind, tokens, updated) VALUES (?, ?, ?, ?)",
+                   (model, kind, bucket.tokens, bucket.updated))
+
+    def take(self, model, needs):
+        with self._db.transaction() as db:
+            buckets = [(kind, self._load(db, model, kind, per_minute), amount)
+                       for kind, per_minute, amount in needs]
+            wait = max(bucket.wait_time(amount) for _, bucket, amount in buckets)
+            if wait == 0:
+                for kind, bucket, amount in buckets:
+                    bucket.take(amount)
+                    self._store(db, model, kind, bucket)
+        return wait
+
+    def drain(self, model):
+        with self._db.transaction() as db:
+            db.execute("UPDATE buckets SET tokens = MIN(tokens, 0), updated = ? WHERE model = ?",
+                       (time.time(), model))
+
+
+class LLMScheduler:
+    """
+    Admission, retry and coalescing for LLM calls.
+
+    Args:
+        rpm: Requests per minute per model (None: unlimited)
+        tpm: Tokens per minute per model (None: unlimited)
+        max_retries: Retries of a transient failure before giving up
+        backoff: Base delay in seconds; attempt n waits up to backoff * 2**n
+        max_backoff: Cap on a single backoff delay
+        buckets: TokenBuckets (default) or SQLiteTokenBuckets shared with
+            other worker processes
+    """
+
+    def __init__(self, rpm=None, tpm=None, max_retries=4, backoff=1.0, max_backoff=30.0, buckets=None):
+        self.rpm = rpm
+        self.tpm = tpm
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+
+        self._condition = threading.Condition()
+        self._buckets = buckets or TokenBuckets()
+        self._queues = {}
+        self._sequence = itertools.count()
+        self._inflight = {}
+        self._inflight_lock = threading.Lock()
+
+        self.calls = 0
+        self.coalesced = 0
+        self.retries = 0
+        self.failures = 0
+        self.wait_seconds = 0.0
+
+    @classmethod
+    def from_env(cls):
+        """
+        Scheduler configured from environment variables:
+            PLANARIA_LLM_RPM: requests per minute per model (default: unlimited)
+            PLANARIA_LLM_TPM: tokens per minute per model (default: unlimited)
+            PLANARIA_LLM_MAX_RETRIES: retries of rate-limited calls (default 4)
+            PLANARIA_LLM_BACKOFF: base backoff in seconds (default 1.0)
+            PLANARIA_LLM_MAX_BACKOFF: longest single backoff (default 30)
+        The limits are shared with the other workers when they keep state
+        under PLANARIA_STATE_DIR (see state.py).
+        """
+        rpm = os.getenv('PLANARIA_LLM_RPM')
+        tpm = os.getenv('PLANARIA_LLM_TPM')
+        path = state_path('rate_limits.sqlite')
+        return cls(
+            rpm=float(rpm) if rpm else None,
+            tpm=float(tpm) if tpm else None,
+            max_retries=int(os.getenv('PLANARIA_LLM_MAX_RETRIES', '4')),
+            backoff=float(os.getenv('PLANARIA_LLM_BACKOFF', '1.0')),
+            max_backoff=float(os.getenv('PLANARIA_LLM_MAX_BACKOFF', '30')),
+            buckets=SQLiteTokenBuckets(path) if path else None
+        )
+
+    def _needs(self, tokens):
+        """(kind, per minute limit, amount) of each limit a call is admitted under"""
+        needs = []
+        if self.rpm:
+            needs.append(('requests', self.rpm, 1))
+        if self.tpm:
+            needs.append(('tokens', self.tpm, tokens))
+        return needs
+
+    def _admit(self, model, tokens, priority):
+        """Block until the call may start; higher-priority waiters go first"""
+        if not self.rpm and not self.tpm:
+            return
+        start = time.monotonic()
+        ticket = (PRIORITIES.get(priority, PRIORITIES[INTERACTIVE]), next(self._sequence))
+        needs = self._needs(tokens)
+        with self._condition:
+            queue = self._queues.setdefault(model, [])
+            heapq.heappush(queue, ticket)
+            try:
+                while True:
+                    if queue[0] == ticket:
+                        wait = self._buckets.take(model, needs)
+                        if wait == 0:
+                            break
+                        self._condition.wait(wait)
+                    else:
+                        self._condition.wait()
+            finally:
+                queue.remove(ticket)
+                heapq.heapify(queue)
+                self._condition.notify_all()
+                self.wait_seconds += time.monotonic() - start
+
+    def _drain(self, model):
+        with self._condition:
+            self._buckets.drain(model)
+
+    def _call_with_retries(self, model, fn, tokens, priority):
+        for attempt in range(self.max_retries + 1):
+            self._admit(model, tokens, priority)
+            try:
+                return fn()
+            except Exception as e:
+                if attempt == self.max_retries or not is_retryable(e):
+                    with self._condition:
+                        self.failures += 1
+                    raise
+                # Everyone calling this model backs off, not just this call
+                self._drain(model)
+                delay = random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+                delay = max(delay, retry_after(e) or 0.0)
+                with self._condition:
+                    self.retries += 1
+                logger.warning("LLM call to %s failed (%s), retry %d in %.1fs",
+                               model, e, attempt + 1, delay)
+                time.sleep(delay)
+
+    def call(self, model, fn, key=None, tokens=0, priority=INTERACTIVE):
+        """
+        Run one LLM call under the rate limits.
+
+        Args:
+            model: Model name; limits apply per model
+            fn: Callable making the upstream call
+            key: Identical in-flight calls with the same key share one upstream call
+            tokens: Tokens the call consumes
+            priority: INTERACTIVE or BATCH
+
+        Returns:
+            Whatever `fn` returns
+        """
+        with self._inflight_lock:
+            self.calls += 1
+            shared = self._inflight.get(key) if key else None
+            if shared is None and key:
+                self._inflight[key] = Future()
+            elif shared is not None:
+                self.coalesced += 1
+        if shared is not None:
+            return shared.result()
+
+        try:
+            result = self._call_with_retries(model, fn, tokens, priority)
+        except Exception as e:
+            if key:
+                self._inflight[key].set_exception(e)
+            raise
+        else:
+            if key:
+                self._inflight[key].set_result(result)
+            return result
+        finally:
+            if key:
+                with self._inflight_lock:
+                    self._inflight.pop(key, None)
+
+    def stats(self):
+        with self._inflight_lock:
+            calls, coalesced = self.calls, self.coalesced
+        with self._condition:
+            return {
+                'rpm': self.rpm,
+                'tpm': self.tpm,
+                'calls': calls,
+                'coalesced': coalesced,
+                'retries': self.retries,
+                'failures': self.failures,
+                'waiting': sum(len(queue) for queue in self._queues.values()),
+                'wait_seconds': round(self.wait_seconds, 3)
+            }
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler():
+    """Process-wide scheduler, created from the environment on first use"""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = LLMScheduler.from_env()
+        return _scheduler
+
+
+# Task id -> priority of the build that owns the task
+_priorities = {}
+_priorities_lock = threading.Lock()
+
+
+@contextmanager
+def prioritize(crew, priority):
+    """Give the LLM calls of `crew`'s tasks `priority` while the block runs"""
+    task_ids = [str(task.id) for task in crew.tasks]
+    with _priorities_lock:
+        for task_id in task_ids:
+            _priorities[task_id] = priority
+    try:
+        yield
+    finally:
+        with _priorities_lock:
+            for task_id in task_ids:
+                _priorities.pop(task_id, None)
+
+
+def priority_for(task):
+    if task is None:
+        return INTERACTIVE
+    with _priorities_lock:
+        return _priorities.get(str(task.id), INTERACTIVE)
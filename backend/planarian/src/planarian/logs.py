@@ -0,0 +1,126 @@
+"""
+Logging setup for Planaria.
+
+Every subsystem logs under the `planaria` logger (`planaria.api`,
+`planaria.build`, `planaria.jobs`, `planaria.trace`, ...). Records are put on
+an in-memory queue by a QueueHandler and written by a single background
+thread, so request threads never block on console or file I/O.
+
+crewAI's own verbose console output stays off unless PLANARIA_VERBOSE=true.
+Instead, a sample of builds (PLANARIA_VERBOSE_SAMPLE_RATE) gets a trace of its
+task progress logged to `planaria.trace`.
+"""
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import threading
+
+LOG_FORMAT = '%(asctime)s %(levelname)s %(name)s [%(threadName)s] %(message)s'
+
+_listener = None
+_handler = None
+_lock = threading.Lock()
+
+
+def parse_levels(spec):
+    """
+    Per-logger levels from a spec like "planaria.trace=DEBUG,LiteLLM=WARNING".
+
+    Returns:
+        Dictionary of logger name -> level name
+    """
+    levels = {}
+    for item in (spec or '').split(','):
+        name, _, level = item.partition('=')
+        if name.strip() and level.strip():
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def configure():
+    """
+    Route Planaria's logs through a non-blocking queue. Safe to call repeatedly.
+
+    Environment variables:
+        PLANARIA_LOG_LEVEL: level of the `planaria` logger (default INFO)
+        PLANARIA_LOG_LEVELS: per-subsystem overrides, e.g. "planaria.jobs=DEBUG,LiteLLM=WARNING"
+        PLANARIA_LOG_FILE: file to write to (default: stderr)
+    """
+    global _listener, _handler
+    with _lock:
+        if _listener is not None:
+            return
+
+        if os.getenv('PLANARIA_LOG_FILE'):
+            handler = logging.FileHandler(os.getenv('PLANARIA_LOG_FILE'))
+        else:
+            handler = logging.StreamHandler(sys.stderr)
+        handler.setFormatter(logging.Formatter(LOG_FORMAT))
+
+        records = queue.SimpleQueue()
+        _handler = logging.handlers.QueueHandler(records)
+        logger = logging.getLogger('planaria')
+        logger.addHandler(_handler)
+        logger.setLevel(os.getenv('PLANARIA_LOG_LEVEL', 'INFO').upper())
+        logger.propagate = False
+        for name, level in parse_levels(os.getenv('PLANARIA_LOG_LEVELS')).items():
+            logging.getLogger(name).setLevel(level)
+
+        _listener = logging.handlers.QueueListener(records, handler, respect_handler_level=True)
+        _listener.start()
+        atexit.register(_listener.stop)
+        os.register_at_fork(after_in_child=_restart_listener)
+
+
+def _restart_listener():
+    """
+    A forked worker (prefork.py) starts without the parent's writer thread.
+    Give it its own queue and thread; records still queued are the parent's.
+    """
+    global _listener
+    _handler.queue = queue.SimpleQueue()
+    _listener = logging.handlers.QueueListener(_handler.queue, *_listener.handlers, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+
+
+def flush():
+    """Write out queued records and stop the writer thread, e.g. before os._exit()"""
+    with _lock:
+        if _listener is not None:
+            _listener.stop()
+
+
+def crew_verbose():
+    """Whether crews print crewAI's own verbose console output (PLANARIA_VERBOSE)"""
+    return os.getenv('PLANARIA_VERBOSE', 'false').lower() == 'true'
+
+
+def sample_trace():
+    """Whether this build is one of the PLANARIA_VERBOSE_SAMPLE_RATE sampled for tracing"""
+    rate = float(os.getenv('PLANARIA_VERBOSE_SAMPLE_RATE', '0'))
+    return rate > 0 and random.random() < rate
+
+
+def trace_listener(build_id, on_event=None):
+    """
+    Progress listener that logs a build's events to `planaria.trace`.
+
+    Args:
+        build_id: Label identifying the build in log lines
+        on_event: Optional listener that also receives every event
+    """
+    logger = logging.getLogger('planaria.trace')
+
+    def listener(event):
+        if event['event'] != 'token':
+            details = {key: value for key, value in event.items() if key not in ('event', 'task')}
+            logger.info("%s %s %s %s", build_id, event['event'], event.get('task', ''), details)
+        if on_event:
+            on_event(event)
+
+    return listener
@@ -1,6 +1,8 @@
 #!/usr/bin/env python
 import sys
 import os
+import threading
+import time
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -16,41 +18,193 @@ if not os.getenv('GOOGLE_API_KEY'):
     print("4. Add to .env file: GOOGLE_API_KEY=your_key_here")
     sys.exit(1)
 
-from crew import PlanarianCrew
+from factory import CrewFactory
+from scheduler import overlap_contexts, run_dag
+from cache import ResultCache, EXECUTION_MODES
+from context_budget import ContextBudget
+from retrieval import TaskKnowledge
+from similar import SEED, SimilarBuilds, reuse_mode, seed_overrides
+from router import validation_quality
+from batch import run_batch as run_batch_builds, shared_analysis_overrides
+from jobs import JobQueue
+import fast_path
+from tools.code_templates import BUNDLES
+import events
+import metrics
+import llm_scheduler
+import logs
+import logging
+import uuid
+import json
 
-def build_agent(user_input):
+logs.configure()
+logger = logging.getLogger('planaria.build')
+
+# Task, tool and LLM call metrics for every crew built from here on
+metrics.subscribe()
+
+# Per-task outputs reused by DAG builds whose task inputs did not change
+task_memo = ResultCache.from_env('PLANARIA_TASK_MEMO')
+
+# Token budgets for the upstream context each task receives (None unless enabled)
+context_budget = ContextBudget.from_env()
+
+# Shorter task contexts DAG builds use to overlap tasks (empty unless PLANARIA_DAG_OVERLAP=true)
+dag_contexts = overlap_contexts()
+
+# Knowledge base chunks retrieved for each task's agent (None unless enabled)
+knowledge = TaskKnowledge.from_env()
+
+# Earlier builds near-duplicate requests can be offered or seeded from (None when disabled)
+similar_builds = SimilarBuilds.from_env()
+
+_crew_factory = None
+_crew_factory_lock = threading.Lock()
+
+def get_crew_factory():
+    """Process-wide crew pool, created on first use"""
+    global _crew_factory
+    with _crew_factory_lock:
+        if _crew_factory is None:
+            _crew_factory = CrewFactory.from_env()
+        return _crew_factory
+
+def build_agent(user_input, on_event=None, timing=None):
     """
     Build an AI agent using Gemini
     
     Args:
         user_input (dict): User requirements
+        on_event (callable): Optional listener for per-task progress events
+        timing (dict): Optional dict filled with a per-task breakdown of wall
+            time, LLM calls, tokens, tool calls and retries
+    
+    The crew runs sequentially unless `execution_mode` (in user_input or the
+    PLANARIA_EXECUTION_MODE env var) is 'dag', which starts each task as soon
+    as the tasks in its `context` have finished. When context budgets
+    (PLANARIA_CONTEXT_BUDGETS) or knowledge retrieval (PLANARIA_KNOWLEDGE) are
+    enabled, sequential builds also go through the DAG scheduler, one task at
+    a time, so the context each task receives can be trimmed and given the
+    relevant knowledge chunks.
+    
+    A request with `similar` set to 'seed' (or PLANARIA_SIMILAR_REUSE=seed)
+    reuses the requirements analysis and system prompt of a similar earlier
+    build (see similar.py), if there is one; such builds also run through
+    the DAG scheduler. So do batch items given the requirements analysis of
+    another variant of their use case (`shared_analysis`, see batch.py).
     """
     
-    print("🚀 Starting Planaria AI Agent Builder (Gemini-Powered)...")
-    print(f"📋 Building {user_input.get('agent_type')} agent...")
-    print(f"🤖 Using Model: {user_input.get('desired_model', 'gemini-1.5-flash')}")
-    print()
+    build_id = uuid.uuid4().hex[:8]
+    logger.debug("Build %s: %s agent using %s", build_id, user_input.get('agent_type'),
+                 user_input.get('desired_model', 'gemini-1.5-flash'))
+    
+    mode = user_input.get('execution_mode') or os.getenv('PLANARIA_EXECUTION_MODE', 'sequential')
+    overrides = fast_path.OVERRIDES if user_input.get('fast') else None
+    if similar_builds is not None and reuse_mode(user_input) == SEED:
+        match = similar_builds.seed(user_input)
+        if match:
+            logger.debug("Build %s: seeded from a build for %r (similarity %s)", build_id,
+                         match['request']['use_case'], match['similarity'])
+            overrides = dict(overrides or {}, **seed_overrides(match))
+    if user_input.get('shared_analysis'):
+        overrides = dict(overrides or {}, **shared_analysis_overrides(user_input))
+    if mode == 'dag' or overrides:
+        refresh = not user_input.get('use_cache', True)
+        kickoff = lambda crew, inputs: run_dag(
+            crew, inputs, memo=task_memo, refresh=refresh, overrides=overrides,
+            context_budget=context_budget, knowledge=knowledge,
+            contexts=dag_contexts if mode == 'dag' else None
+        )
+    elif context_budget is not None or knowledge is not None:
+        # Budgets and knowledge are applied by the scheduler; one task at a time keeps the sequential order
+        kickoff = lambda crew, inputs: run_dag(crew, inputs, max_parallel=1, context_budget=context_budget,
+                                               knowledge=knowledge)
+    else:
+        kickoff = lambda crew, inputs: crew.kickoff(inputs=inputs)
     
-    # Initialize the crew
+    # A sample of builds logs its task progress to planaria.trace
+    if logs.sample_trace():
+        on_event = logs.trace_listener(build_id, on_event)
+    
+    # Borrow a ready crew from the pool
+    start = time.perf_counter()
+    status = 'failed'
     try:
-        crew = PlanarianCrew().crew()
+        factory = get_crew_factory()
+        with factory.lease() as crew, metrics.record(crew) as breakdown:
+            # Point each agent at the model routed for this request
+            routing = factory.router.route(crew, user_input) if factory.router else None
+            
+            # Execute with inputs; batch builds yield to interactive ones for LLM calls
+            with llm_scheduler.prioritize(crew, user_input.get('priority', llm_scheduler.INTERACTIVE)):
+                if on_event:
+                    with events.listen(crew, on_event):
+                        result = kickoff(crew, user_input)
+                else:
+                    result = kickoff(crew, user_input)
+        status = 'succeeded'
         
-        # Execute with inputs
-        result = crew.kickoff(inputs=user_input)
+        fast_path.remember_prompt(user_input, result)
+        if similar_builds is not None:
+            similar_builds.add(user_input, typed_outputs(result))
+        report = breakdown.report()
+        if routing:
+            factory.router.record(routing, report, validation_quality(result))
+        if timing is not None:
+            timing.update(report, wall_time=round(time.perf_counter() - start, 3), routing=routing)
         
-        print("\n" + "="*60)
-        print("✅ AGENT BUILT SUCCESSFULLY!")
-        print("="*60)
-        print(result)
-        print("\n" + "="*60)
+        timings = getattr(result, 'timings', None)
+        if timings:
+            logger.debug("Build %s finished in %ss: critical path %ss vs serial %ss", build_id,
+                         timings['wall_time'], timings['critical_path_latency'], timings['serial_latency'])
+        else:
+            logger.debug("Build %s finished in %.3fs", build_id, time.perf_counter() - start)
         
         return result
         
-    except Exception as e:
-        print(f"\n❌ Error building agent: {e}")
-        import traceback
-        traceback.print_exc()
+    except Exception:
+        logger.exception("Build %s failed", build_id)
         return None
+    finally:
+        metrics.BUILD_SECONDS.observe(time.perf_counter() - start, mode=mode, status=status)
+
+def typed_outputs(result):
+    """Fields of each task's typed output (task_outputs.py), by task name"""
+    return {
+        output.name: output.pydantic.model_dump()
+        for output in getattr(result, 'tasks_output', []) if output.pydantic is not None
+    }
+
+def result_payload(result, user_input=None):
+    """
+    JSON-able form of a crew result as returned by the API.
+    
+    `outputs` holds the fields of each task's typed output (task_outputs.py).
+    When the build's target framework has code templates, the payload also
+    carries a `bundle` spec from which the project files can be rendered.
+    """
+    outputs = {output.name: output for output in getattr(result, 'tasks_output', [])}
+    payload = {"output": str(result), "outputs": typed_outputs(result)}
+    if getattr(result, 'timings', None):
+        payload["timings"] = result.timings
+    if getattr(result, 'artifacts', None):
+        payload.update(result.artifacts)
+    
+    framework = (user_input or {}).get('target_framework', '').lower()
+    if 'bundle' not in payload and framework in BUNDLES and 'create_system_prompt' in outputs:
+        payload["bundle"] = fast_path.bundle_spec(
+            user_input,
+            outputs.get('analyze_requirements'),
+            outputs['create_system_prompt']
+        )
+    return payload
+
+def build_payload(user_input):
+    """Build an agent and return its payload, raising if the crew fails"""
+    result = build_agent(user_input)
+    if not result:
+        raise RuntimeError("CrewAI execution failed")
+    return result_payload(result, user_input)
 
 def run():
     """Run with example input"""
@@ -76,7 +230,42 @@ def run():
     
     result = build_agent(user_input)
     
+    print("="*60)
+    print("✅ AGENT BUILT SUCCESSFULLY!" if result else "❌ Agent build failed, see the log above")
+    print("="*60)
+    if result:
+        print(result)
+    
     return result
 
+def run_batch():
+    """
+    Build every request in a JSON file (a list of user_input objects),
+    printing one JSON line per item as it completes.
+    
+    Usage: python main.py batch requests.json [max_parallel]
+    """
+    
+    args = sys.argv[2:] if len(sys.argv) > 1 and sys.argv[1] == 'batch' else sys.argv[1:]
+    if not args:
+        print("Usage: python main.py batch requests.json [max_parallel]")
+        sys.exit(1)
+    
+    with open(args[0]) as f:
+        requests = json.load(f)
+    max_parallel = int(args[1]) if len(args) > 1 else 4
+    
+    jobs = JobQueue(lambda user_input, on_event=None: build_payload(user_input),
+                    max_workers=max_parallel, max_queued=len(requests))
+    results = []
+    for item in run_batch_builds(requests, jobs, max_parallel=max_parallel):
+        print(json.dumps(item), flush=True)
+        results.append(item)
+    
+    return results
+
 if __name__ == "__main__":
-    run()
\ No newline at end of file
+    if len(sys.argv) > 1 and sys.argv[1] == 'batch':
+        run_batch()
+    else:
+        run()
\ No newline at end of file
@@ -0,0 +1,329 @@
+"""
+Timing and usage metrics for crew builds.
+
+Once subscribe()d to crewAI's event bus, records every task, tool invocation
+and LLM call: wall time, prompt/completion tokens (tokens.py), failures (which
+crewAI retries) and tool cache hits. Totals are exposed in the Prometheus
+text format by render(), and record() collects the same measurements for a
+single build as a per-task breakdown.
+"""
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+from tokens import count_tokens
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+
+def _labels_text(labels):
+    if not labels:
+        return ''
+    escaped = (
+        (name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in labels
+    )
+    return '{' + ','.join(f'{name}="{value}"' for name, value in escaped) + '}'
+
+
+def _number(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonic counter with labels"""
+
+    type = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels.get(name, '')) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+        for key, value in sorted(values.items()):
+            yield self.name, tuple(zip(self.labelnames, key)), value
+
+
+class Histogram:
+    """Cumulative-bucket histogram with labels"""
+
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> [per-bucket counts (last is +Inf), sum]
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels.get(name, '')) for name in self.labelnames)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][bisect_left(self.buckets, value)] += 1
+            entry[1] += value
+
+    def samples(self):
+        with self._lock:
+            values = {key: (list(counts), total) for key, (counts, total) in self._values.items()}
+        for key, (counts, total) in sorted(values.items()):
+            labels = tuple(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                yield f'{self.name}_bucket', labels + (('le', _number(bound)),), cumulative
+            yield f'{self.name}_sum', labels, total
+            yield f'{self.name}_count', labels, cumulative
+
+
+TASK_SECONDS = Histogram('planaria_task_seconds', 'Wall time of crew tasks run by an agent', ['task'])
+TASK_FAILURES = Counter('planaria_task_failures_total', 'Crew tasks that raised', ['task'])
+TOOL_SECONDS = Histogram('planaria_tool_seconds', 'Wall time of tool invocations', ['tool'])
+TOOL_FAILURES = Counter('planaria_tool_failures_total', 'Failed tool invocations (retried by crewAI)', ['tool'])
+TOOL_CACHE_HITS = Counter('planaria_tool_cache_hits_total', 'Tool invocations answered from the crewAI tool cache', ['tool'])
+LLM_SECONDS = Histogram('planaria_llm_call_seconds', 'Wall time of LLM calls', ['model', 'task'])
+LLM_FAILURES = Counter('planaria_llm_call_failures_total', 'Failed LLM calls (retried by crewAI)', ['model'])
+LLM_TOKENS = Counter('planaria_llm_tokens_total', 'LLM tokens counted by the local tokenizer', ['model', 'kind'])
+CONTEXT_TOKENS_SAVED = Counter('planaria_context_tokens_saved_total', 'Tokens trimmed from task context by budgets', ['task'])
+BUILD_SECONDS = Histogram('planaria_build_seconds', 'Wall time of agent builds', ['mode', 'status'])
+
+METRICS = [
+    TASK_SECONDS, TASK_FAILURES,
+    TOOL_SECONDS, TOOL_FAILURES, TOOL_CACHE_HITS,
+    LLM_SECONDS, LLM_FAILURES, LLM_TOKENS,
+    CONTEXT_TOKENS_SAVED, BUILD_SECONDS
+]
+
+# Callables returning extra (name, type, documentation, [(labels, value)]) families
+_collectors = []
+
+
+def register_collector(collector):
+    """Add metrics computed at scrape time, e.g. from a component's stats()"""
+    _collectors.append(collector)
+
+
+def render():
+    """All metrics in the Prometheus text exposition format"""
+    lines = []
+    for metric in METRICS:
+        lines.append(f'# HELP {metric.name} {metric.documentation}')
+        lines.append(f'# TYPE {metric.name} {metric.type}')
+        for name, labels, value in metric.samples():
+            lines.append(f'{name}{_labels_text(labels)} {_number(value)}')
+    for collector in _collectors:
+        for name, metric_type, documentation, samples in collector():
+            lines.append(f'# HELP {name} {documentation}')
+            lines.append(f'# TYPE {name} {metric_type}')
+            for labels, value in samples:
+                lines.append(f'{name}{_labels_text(tuple(labels.items()))} {_number(value)}')
+    return '\n'.join(lines) + '\n'
+
+
+class Breakdown:
+    """Per-task measurements of one build"""
+
+    FIELDS = ('seconds', 'llm_calls', 'llm_seconds', 'prompt_tokens', 'completion_tokens',
+              'tool_calls', 'tool_seconds', 'tool_cache_hits', 'retries')
+
+    def __init__(self):
+        self.tasks = {}
+        self._lock = threading.Lock()
+
+    def add(self, task_name, **values):
+        with self._lock:
+            entry = self.tasks.setdefault(task_name, dict.fromkeys(self.FIELDS, 0))
+            for field, value in values.items():
+                entry[field] = entry.get(field, 0) + value
+
+    def report(self):
+        """
+        Returns:
+            Dictionary with per-task measurements (seconds rounded to ms) and totals
+        """
+        with self._lock:
+            tasks = {
+                name: {field: round(value, 3) if isinstance(value, float) else value
+                       for field, value in entry.items()}
+                for name, entry in self.tasks.items()
+            }
+        totals = {field: 0 for field in self.FIELDS}
+        for entry in tasks.values():
+            for field in self.FIELDS:
+                totals[field] += entry.get(field, 0)
+        totals = {field: round(value, 3) if isinstance(value, float) else value
+                  for field, value in totals.items()}
+        return {'tasks': tasks, 'totals': totals}
+
+
+# Task id -> Breakdown of the build that owns the task
+_breakdowns = {}
+_breakdowns_lock = threading.Lock()
+# Start times keyed by task id, or by (thread, kind) for LLM and tool calls,
+# whose events are emitted synchronously in the calling thread
+_started = {}
+
+
+def _breakdown(task_id):
+    if task_id is None:
+        return None
+    with _breakdowns_lock:
+        return _breakdowns.get(str(task_id))
+
+
+def _elapsed(key):
+    start = _started.pop(key, None)
+    return time.perf_counter() - start if start is not None else None
+
+
+def _on_task_started(source, event):
+    if event.task is not None:
+        _started[str(event.task.id)] = time.perf_counter()
+
+
+def _on_task_completed(source, event):
+    if event.task is None:
+        return
+    seconds = _elapsed(str(event.task.id))
+    if seconds is not None:
+        TASK_SECONDS.observe(seconds, task=event.task.name)
+        breakdown = _breakdown(event.task.id)
+        if breakdown:
+            breakdown.add(event.task.name, seconds=seconds)
+
+
+def _on_task_failed(source, event):
+    if event.task is not None:
+        _started.pop(str(event.task.id), None)
+        TASK_FAILURES.inc(task=event.task.name)
+
+
+def _on_llm_started(source, event):
+    _started[(threading.get_ident(), 'llm')] = time.perf_counter()
+
+
+def _on_llm_completed(source, event):
+    seconds = _elapsed((threading.get_ident(), 'llm'))
+    if seconds is None:
+        return
+    model = event.model or getattr(source, 'model', '')
+    prompt_tokens = count_tokens(event.messages)
+    completion_tokens = count_tokens(event.response)
+    LLM_SECONDS.observe(seconds, model=model, task=event.task_name or '')
+    LLM_TOKENS.inc(prompt_tokens, model=model, kind='prompt')
+    LLM_TOKENS.inc(completion_tokens, model=model, kind='completion')
+    breakdown = _breakdown(event.task_id)
+    if breakdown:
+        breakdown.add(event.task_name, llm_calls=1, llm_seconds=seconds,
+                      prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+
+
+def _on_llm_failed(source, event):
+    _started.pop((threading.get_ident(), 'llm'), None)
+    LLM_FAILURES.inc(model=getattr(source, 'model', ''))
+    breakdown = _breakdown(event.task_id)
+    if breakdown:
+        breakdown.add(event.task_name, retries=1)
+
+
+def _on_tool_started(source, event):
+    _started[(threading.get_ident(), 'tool')] = time.perf_counter()
+
+
+def _on_tool_finished(source, event):
+    seconds = _elapsed((threading.get_ident(), 'tool'))
+    if seconds is None:
+        seconds = (event.finished_at - event.started_at).total_seconds()
+    TOOL_SECONDS.observe(seconds, tool=event.tool_name)
+    if event.from_cache:
+        TOOL_CACHE_HITS.inc(tool=event.tool_name)
+    breakdown = _breakdown(event.task_id)
+    if breakdown:
+        breakdown.add(event.task_name, tool_calls=1, tool_seconds=seconds,
+                      tool_cache_hits=int(bool(event.from_cache)))
+
+
+def _on_tool_error(source, event):
+    _started.pop((threading.get_ident(), 'tool'), None)
+    TOOL_FAILURES.inc(tool=event.tool_name)
+    breakdown = _breakdown(event.task_id)
+    if breakdown:
+        breakdown.add(event.task_name, retries=1)
+
+
+_subscribed = False
+_subscribe_lock = threading.Lock()
+
+
+def subscribe():
+    """
+    Start recording crewAI's task, tool and LLM events. Called when the crew
+    machinery is imported, so importing this module alone stays cheap.
+    """
+    global _subscribed
+    with _subscribe_lock:
+        if _subscribed:
+            return
+        from crewai.events import (
+            crewai_event_bus,
+            LLMCallCompletedEvent,
+            LLMCallFailedEvent,
+            LLMCallStartedEvent,
+            TaskCompletedEvent,
+            TaskFailedEvent,
+            TaskStartedEvent,
+            ToolUsageErrorEvent,
+            ToolUsageFinishedEvent,
+            ToolUsageStartedEvent,
+        )
+        for event_type, handler in (
+            (TaskStartedEvent, _on_task_started),
+            (TaskCompletedEvent, _on_task_completed),
+            (TaskFailedEvent, _on_task_failed),
+            (LLMCallStartedEvent, _on_llm_started),
+            (LLMCallCompletedEvent, _on_llm_completed),
+            (LLMCallFailedEvent, _on_llm_failed),
+            (ToolUsageStartedEvent, _on_tool_started),
+            (ToolUsageFinishedEvent, _on_tool_finished),
+            (ToolUsageErrorEvent, _on_tool_error),
+        ):
+            crewai_event_bus.on(event_type)(handler)
+        _subscribed = True
+
+
+@contextmanager
+def record(crew):
+    """
+    Collect a per-task breakdown of everything the tasks of `crew` do.
+
+    Yields:
+        Breakdown filled in while the block runs
+    """
+    breakdown = Breakdown()
+    task_ids = [str(task.id) for task in crew.tasks]
+    with _breakdowns_lock:
+        for task_id in task_ids:
+            _breakdowns[task_id] = breakdown
+    try:
+        yield breakdown
+    finally:
+        with _breakdowns_lock:
+            for task_id in task_ids:
+                _breakdowns.pop(task_id, None)
@@ -0,0 +1,119 @@
+"""
+Pre-forking multi-process server for the API.
+
+uvicorn.run() serves from a single process, so every build, template render
+and validation shares one core. With PLANARIA_WORKERS above 1, serve():
+
+- binds the listening socket once and imports the crew machinery in the
+  parent (warmup.preload), so the workers share those pages copy-on-write,
+- forks the workers, which accept connections from the same socket, each
+  with its own event loop, job queue, crew pool and warm-up (api.py's lifespan),
+- replaces workers that exit, and stops them all on SIGTERM or SIGINT.
+
+Workers share job status, the disk tiers of the result cache and task memo,
+and the LLM rate limits through SQLite files (state.py).
+"""
+import logging
+import os
+import signal
+import socket
+import time
+
+import uvicorn
+
+import logs
+from state import server_workers, state_dir
+
+logger = logging.getLogger('planaria.server')
+
+# A worker that exits sooner than this is restarted after a pause, not in a tight loop
+MIN_WORKER_SECONDS = 1.0
+
+
+def bind(host, port, backlog=2048):
+    """Listening socket the workers inherit"""
+    sock = socket.socket(socket.AF_INET6 if ':' in host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def _run_worker(app, sock):
+    """Body of a forked worker; never returns"""
+    code = 0
+    try:
+        # uvicorn installs its own graceful-shutdown handlers once it runs
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        uvicorn.Server(uvicorn.Config(app, lifespan='on')).run(sockets=[sock])
+    except BaseException:
+        logger.exception("Worker %d crashed", os.getpid())
+        code = 1
+    finally:
+        logs.flush()
+        # Skip the parent's cleanup code, which the fork copied into this process
+        os._exit(code)
+
+
+def serve(app, host='0.0.0.0', port=8000, workers=None, preload=None):
+    """
+    Serve `app` until SIGTERM or SIGINT.
+
+    Args:
+        app: ASGI application
+        host: Interface to listen on
+        port: Port to listen on
+        workers: Worker processes (default: PLANARIA_WORKERS); 1 serves in
+            this process with uvicorn.run()
+        preload: Callable run in the parent before forking
+    """
+    workers = workers or server_workers()
+    if workers <= 1:
+        uvicorn.run(app, host=host, port=port)
+        return
+
+    sock = bind(host, port)
+    if preload:
+        preload()
+
+    children = {}
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def spawn():
+        pid = os.fork()
+        if pid == 0:
+            _run_worker(app, sock)
+        children[pid] = time.monotonic()
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    logger.info("Serving on %s:%d with %d workers sharing state in %s", host, port, workers, state_dir())
+    for _ in range(workers):
+        spawn()
+
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        started = children.pop(pid, None)
+        if started is None or stopping:
+            continue
+        logger.warning("Worker %d exited with status %d; starting a new one",
+                       pid, os.waitstatus_to_exitcode(status))
+        if time.monotonic() - started < MIN_WORKER_SECONDS:
+            time.sleep(MIN_WORKER_SECONDS)
+        if not stopping:
+            spawn()
+    sock.close()
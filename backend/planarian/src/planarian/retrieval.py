@@ -0,0 +1,446 @@
+"""
+Retrieval index over the knowledge/ directory.
+
+Files under knowledge/ (PLANARIA_KNOWLEDGE_DIR) are split at blank lines into
+chunks of up to PLANARIA_KNOWLEDGE_CHUNK_TOKENS tokens and ranked with BM25.
+The index is a term-major sparse matrix - postings of (chunk, term
+frequency, BM25 weight) per term - in NumPy arrays saved under
+PLANARIA_KNOWLEDGE_INDEX_DIR and memory-mapped when loaded, so opening it is
+instant however large the knowledge base grows, worker processes share its
+pages, and a query only touches the postings of its own terms. Chunk texts
+are read from the mapped file for the chunks returned.
+
+Indexing is incremental: files whose size and mtime are unchanged keep their
+postings, and only new or edited files are read and tokenized. The directory
+is checked at most every PLANARIA_KNOWLEDGE_RELOAD_INTERVAL seconds, and a
+rebuilt index replaces the old one atomically.
+
+With PLANARIA_KNOWLEDGE=true, an agent with `knowledge_chunks: k` in
+agents.yaml gets the k chunks most relevant to its task appended to the
+task's context (scheduler.py), instead of no knowledge at all or whole files
+pasted into its prompt.
+"""
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+
+import numpy as np
+import yaml
+
+from cache import PACKAGE_DIR
+from tokens import count_tokens_batch
+
+logger = logging.getLogger('planaria.knowledge')
+
+KNOWLEDGE_DIR = PACKAGE_DIR.parents[1] / 'knowledge'
+INDEX_VERSION = 1
+TERM = re.compile(r"[a-z0-9]{2,}")
+ARRAYS = ('term_offsets', 'postings_chunk', 'postings_tf', 'postings_weight',
+          'chunk_lengths', 'chunk_lines', 'chunk_sources', 'text_offsets', 'text')
+
+
+def terms(text):
+    """Lowercase word and number terms of `text`"""
+    return TERM.findall(text.lower())
+
+
+def paragraphs(text):
+    """(first line number, lines) of each run of non-blank lines"""
+    block, first = [], None
+    for number, line in enumerate(text.splitlines(), 1):
+        if line.strip():
+            if not block:
+                first = number
+            block.append(line)
+        elif block:
+            yield first, block
+            block = []
+    if block:
+        yield first, block
+
+
+def split_chunks(text, max_tokens):
+    """
+    Split text into chunks of at most about `max_tokens`, at blank lines
+    where possible and between lines otherwise.
+
+    Returns:
+        List of (first line number, chunk text)
+    """
+    chunks = []
+    current, first, size = [], None, 0
+
+    def flush():
+        nonlocal current, size
+        if current:
+            chunks.append((first, '\n'.join(current).strip('\n')))
+        current, size = [], 0
+
+    for start, block in paragraphs(text):
+        costs = [cost + 1 for cost in count_tokens_batch(block)]
+        if current and size + sum(costs) > max_tokens:
+            flush()
+        for number, (line, cost) in enumerate(zip(block, costs), start):
+            if current and size + cost > max_tokens:
+                flush()
+            if not current:
+                first = number
+            current.append(line)
+            size += cost
+        current.append('')
+        size += 1
+    flush()
+    return chunks
+
+
+def bm25_weights(postings_term, postings_chunk, postings_tf, chunk_lengths, term_count, k1, b):
+    """BM25 weight of each posting, from its term frequency and the collection statistics"""
+    if not len(postings_tf):
+        return np.zeros(0, dtype=np.float32)
+    documents = len(chunk_lengths)
+    df = np.bincount(postings_term, minlength=term_count)
+    idf = np.log1p((documents - df + 0.5) / (df + 0.5))
+    lengths = chunk_lengths[postings_chunk] / max(float(chunk_lengths.mean()), 1.0)
+    tf = postings_tf.astype(np.float64)
+    weights = idf[postings_term] * tf * (k1 + 1) / (tf + k1 * (1 - b + b * lengths))
+    return weights.astype(np.float32)
+
+
+class Snapshot:
+    """One generation of the index on disk, with its arrays memory-mapped"""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        with open(self.path / 'manifest.json') as f:
+            self.manifest = json.load(f)
+        self.terms = self.manifest['terms']
+        self.term_ids = {term: index for index, term in enumerate(self.terms)}
+        self.sources = self.manifest['sources']
+        self.files = self.manifest['files']
+        for name in ARRAYS:
+            setattr(self, name, np.load(self.path / f'{name}.npy', mmap_mode='r'))
+
+    @property
+    def chunk_count(self):
+        return len(self.chunk_lengths)
+
+    def chunk_text(self, chunk):
+        start, end = self.text_offsets[chunk], self.text_offsets[chunk + 1]
+        return bytes(self.text[start:end]).decode('utf-8')
+
+    def search(self, query, k):
+        """Top `k` (chunk, score) pairs for a query, best first"""
+        counts = Counter(term for term in terms(query) if term in self.term_ids)
+        if not counts or not self.chunk_count:
+            return []
+        chunks, weights = [], []
+        for term, repeats in counts.items():
+            index = self.term_ids[term]
+            start, end = self.term_offsets[index], self.term_offsets[index + 1]
+            chunks.append(self.postings_chunk[start:end])
+            weights.append(self.postings_weight[start:end] * repeats)
+        scores = np.bincount(np.concatenate(chunks), weights=np.concatenate(weights),
+                             minlength=self.chunk_count)
+        k = min(k, int(np.count_nonzero(scores)))
+        if k <= 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind='stable')]
+        return [(int(chunk), float(scores[chunk])) for chunk in top]
+
+
+class KnowledgeIndex:
+    """
+    Incrementally maintained BM25 index of the text files under a directory.
+
+    Args:
+        root: Directory of knowledge files
+        index_dir: Where index generations are saved
+        chunk_tokens: Target size of a chunk in tokens
+        reload_interval: Minimum seconds between checks for changed files
+        k1: BM25 term frequency saturation
+        b: BM25 length normalization
+    """
+
+    def __init__(self, root=KNOWLEDGE_DIR, index_dir=None, chunk_tokens=200, reload_interval=5.0,
+                 k1=1.5, b=0.75):
+        self.root = Path(root)
+        self.index_dir = Path(index_dir or Path(tempfile.gettempdir()) / 'planaria-knowledge-index')
+        self.chunk_tokens = chunk_tokens
+        self.reload_interval = reload_interval
+        self.k1 = k1
+        self.b = b
+        self.rebuilds = 0
+        self._snapshot = None
+        self._checked = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            root=os.getenv('PLANARIA_KNOWLEDGE_DIR') or KNOWLEDGE_DIR,
+            index_dir=os.getenv('PLANARIA_KNOWLEDGE_INDEX_DIR'),
+            chunk_tokens=int(os.getenv('PLANARIA_KNOWLEDGE_CHUNK_TOKENS', '200')),
+            reload_interval=float(os.getenv('PLANARIA_KNOWLEDGE_RELOAD_INTERVAL', '5.0'))
+        )
+
+    def settings(self):
+        """Everything besides the files that a saved index must match to be reused"""
+        return {'version': INDEX_VERSION, 'root': str(self.root.resolve()),
+                'chunk_tokens': self.chunk_tokens, 'k1': self.k1, 'b': self.b}
+
+    def scan(self):
+        """Mapping of relative path to [size, mtime_ns] of the knowledge files"""
+        files = {}
+        if not self.root.is_dir():
+            return files
+        for directory, subdirectories, names in os.walk(self.root):
+            subdirectories[:] = sorted(name for name in subdirectories if not name.startswith('.'))
+            for name in names:
+                if name.startswith('.'):
+                    continue
+                path = Path(directory) / name
+                stat = path.stat()
+                files[path.relative_to(self.root).as_posix()] = [stat.st_size, stat.st_mtime_ns]
+        return dict(sorted(files.items()))
+
+    def snapshot(self):
+        """Current index, rebuilt first if files changed since it was saved"""
+        now = time.monotonic()
+        if self._snapshot is not None and now - self._checked < self.reload_interval:
+            return self._snapshot
+        with self._lock:
+            if self._snapshot is None or now - self._checked >= self.reload_interval:
+                self._refresh()
+                self._checked = time.monotonic()
+            return self._snapshot
+
+    def search(self, query, k=3):
+        """
+        Chunks most relevant to `query`.
+
+        Returns:
+            Up to `k` dicts with the chunk's source file, first line, text and score
+        """
+        snapshot = self.snapshot()
+        return [{
+            'source': snapshot.sources[snapshot.chunk_sources[chunk]],
+            'line': int(snapshot.chunk_lines[chunk]),
+            'text': snapshot.chunk_text(chunk),
+            'score': round(score, 4)
+        } for chunk, score in snapshot.search(query, k)]
+
+    def stats(self):
+        snapshot = self._snapshot
+        return {
+            'files': len(snapshot.files) if snapshot else None,
+            'chunks': snapshot.chunk_count if snapshot else None,
+            'terms': len(snapshot.terms) if snapshot else None,
+            'rebuilds': self.rebuilds
+        }
+
+    @contextmanager
+    def _locked(self, mode):
+        """Lock shared by the processes using this index directory"""
+        self.index_dir.mkdir(parents=True, exist_ok=True)
+        with open(self.index_dir / '.lock', 'a') as f:
+            fcntl.flock(f, mode)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _load_current(self):
+        """Saved generation named by CURRENT, or None"""
+        try:
+            name = (self.index_dir / 'CURRENT').read_text().strip()
+            return Snapshot(self.index_dir / name)
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def _refresh(self):
+        files = self.scan()
+        settings = self.settings()
+
+        def fresh(snapshot):
+            return (snapshot is not None and snapshot.manifest.get('settings') == settings
+                    and {path: entry['stat'] for path, entry in snapshot.files.items()} == files)
+
+        if fresh(self._snapshot):
+            return
+        with self._locked(fcntl.LOCK_SH):
+            current = self._load_current()
+        if fresh(current):
+            self._snapshot = current
+            return
+        # Only one process rebuilds; the others find its generation once it is saved
+        with self._locked(fcntl.LOCK_EX):
+            current = self._load_current()
+            if not fresh(current):
+                start = time.perf_counter()
+                previous = current if current is not None and current.manifest.get('settings') == settings else None
+                current = self._build(files, previous)
+                self.rebuilds += 1
+                logger.info("Indexed %d knowledge files into %d chunks in %.3fs",
+                            len(files), current.chunk_count, time.perf_counter() - start)
+        self._snapshot = current
+
+    def _build(self, files, previous):
+        """Save a new generation, reusing the postings of unchanged files from `previous`"""
+        kept_chunks = []
+        kept_new_ids = []
+        new_entries = []
+        lengths, lines, sources, texts = [], [], [], []
+        manifest_files = {}
+
+        for source_id, (path, stat) in enumerate(files.items()):
+            start = len(lengths)
+            entry = previous.files.get(path) if previous is not None else None
+            if entry is not None and entry['stat'] == stat:
+                old = range(*entry['chunks'])
+                kept_chunks.extend(old)
+                kept_new_ids.extend(range(start, start + len(old)))
+                lengths.extend(int(previous.chunk_lengths[chunk]) for chunk in old)
+                lines.extend(int(previous.chunk_lines[chunk]) for chunk in old)
+                texts.extend(previous.chunk_text(chunk).encode('utf-8') for chunk in old)
+            else:
+                try:
+                    text = (self.root / path).read_text(encoding='utf-8')
+                except (OSError, UnicodeDecodeError):
+                    # Binary or unreadable files are listed but not indexed
+                    text = ''
+                for line, chunk_text in split_chunks(text, self.chunk_tokens):
+                    chunk = len(lengths)
+                    counts = Counter(terms(chunk_text))
+                    new_entries.extend((term, chunk, tf) for term, tf in counts.items())
+                    lengths.append(sum(counts.values()))
+                    lines.append(line)
+                    texts.append(chunk_text.encode('utf-8'))
+            sources.extend([source_id] * (len(lengths) - start))
+            manifest_files[path] = {'stat': stat, 'chunks': [start, len(lengths)]}
+
+        # Postings of kept chunks, with chunk ids renumbered and terms by name
+        kept_terms = np.zeros(0, dtype=np.int64)
+        kept_postings_chunk = np.zeros(0, dtype=np.int64)
+        kept_tf = np.zeros(0, dtype=np.float32)
+        vocabulary = set(term for term, _, _ in new_entries)
+        if kept_chunks:
+            renumber = np.full(previous.chunk_count, -1, dtype=np.int64)
+            renumber[kept_chunks] = kept_new_ids
+            old_terms = np.repeat(np.arange(len(previous.terms)), np.diff(previous.term_offsets))
+            chunk_ids = renumber[previous.postings_chunk]
+            keep = chunk_ids >= 0
+            kept_terms, kept_postings_chunk = old_terms[keep], chunk_ids[keep]
+            kept_tf = np.asarray(previous.postings_tf)[keep]
+            vocabulary.update(previous.terms[index] for index in np.unique(kept_terms))
+
+        vocabulary = sorted(vocabulary)
+        term_ids = {term: index for index, term in enumerate(vocabulary)}
+        if kept_chunks:
+            old_to_new = np.array([term_ids.get(term, -1) for term in previous.terms], dtype=np.int64)
+            kept_terms = old_to_new[kept_terms]
+        postings_term = np.concatenate([kept_terms, np.array([term_ids[term] for term, _, _ in new_entries], dtype=np.int64)])
+        postings_chunk = np.concatenate([kept_postings_chunk, np.array([chunk for _, chunk, _ in new_entries], dtype=np.int64)])
+        postings_tf = np.concatenate([kept_tf, np.array([tf for _, _, tf in new_entries], dtype=np.float32)])
+
+        order = np.lexsort((postings_chunk, postings_term))
+        postings_term, postings_chunk, postings_tf = postings_term[order], postings_chunk[order], postings_tf[order]
+        chunk_lengths = np.array(lengths, dtype=np.int32)
+        text_offsets = np.zeros(len(texts) + 1, dtype=np.int64)
+        np.cumsum([len(text) for text in texts], out=text_offsets[1:])
+
+        arrays = {
+            'term_offsets': np.concatenate([[0], np.cumsum(np.bincount(postings_term, minlength=len(vocabulary)))]).astype(np.int64),
+            'postings_chunk': postings_chunk.astype(np.int32),
+            'postings_tf': postings_tf,
+            'postings_weight': bm25_weights(postings_term, postings_chunk, postings_tf, chunk_lengths,
+                                            len(vocabulary), self.k1, self.b),
+            'chunk_lengths': chunk_lengths,
+            'chunk_lines': np.array(lines, dtype=np.int32),
+            'chunk_sources': np.array(sources, dtype=np.int32),
+            'text_offsets': text_offsets,
+            'text': np.frombuffer(b''.join(texts), dtype=np.uint8)
+        }
+        manifest = {'settings': self.settings(), 'terms': vocabulary,
+                    'sources': list(files), 'files': manifest_files}
+        return self._save(arrays, manifest)
+
+    def _save(self, arrays, manifest):
+        """Write a generation, point CURRENT at it and remove older ones (holding the exclusive lock)"""
+        digest = hashlib.sha256(json.dumps(manifest['files'], sort_keys=True).encode()).hexdigest()[:12]
+        name = f"index-{digest}-{uuid.uuid4().hex[:8]}"
+        staging = self.index_dir / f".{name}"
+        staging.mkdir(parents=True)
+        for array_name, array in arrays.items():
+            np.save(staging / f'{array_name}.npy', array)
+        with open(staging / 'manifest.json', 'w') as f:
+            json.dump(manifest, f)
+        staging.rename(self.index_dir / name)
+
+        pointer = self.index_dir / '.CURRENT.tmp'
+        pointer.write_text(name)
+        os.replace(pointer, self.index_dir / 'CURRENT')
+        # Processes still reading an older generation keep their mappings after it is removed
+        for path in self.index_dir.glob('index-*'):
+            if path.name != name:
+                shutil.rmtree(path, ignore_errors=True)
+        return Snapshot(self.index_dir / name)
+
+
+class TaskKnowledge:
+    """
+    Knowledge chunks for the tasks of agents with `knowledge_chunks:` in agents.yaml.
+
+    Args:
+        index: KnowledgeIndex searched
+        top_k: Mapping of task name to the number of chunks its agent gets
+    """
+
+    def __init__(self, index, top_k):
+        self.index = index
+        self.top_k = top_k
+
+    @classmethod
+    def from_config(cls, index, config_dir=None):
+        config_dir = config_dir or PACKAGE_DIR / 'config'
+        with open(config_dir / 'agents.yaml') as f:
+            agents = yaml.safe_load(f) or {}
+        with open(config_dir / 'tasks.yaml') as f:
+            tasks = yaml.safe_load(f) or {}
+        top_k = {}
+        for name, task in tasks.items():
+            k = agents.get(task.get('agent'), {}).get('knowledge_chunks')
+            if k:
+                top_k[name] = int(k)
+        return cls(index, top_k)
+
+    @classmethod
+    def from_env(cls):
+        """Knowledge for the configured agents when PLANARIA_KNOWLEDGE=true, otherwise None"""
+        if os.getenv('PLANARIA_KNOWLEDGE', 'false').lower() != 'true':
+            return None
+        return cls.from_config(KnowledgeIndex.from_env())
+
+    def retrieve(self, task):
+        """Chunks for a task, searched with its interpolated description"""
+        k = self.top_k.get(task.name)
+        return self.index.search(task.description, k) if k else []
+
+    @staticmethod
+    def format(chunks):
+        """Chunks as a context section, each headed by its source and line"""
+        if not chunks:
+            return ''
+        sections = [f"[{chunk['source']}:{chunk['line']}]\n{chunk['text']}" for chunk in chunks]
+        return "Relevant reference material from the knowledge base:\n\n" + "\n\n".join(sections)
@@ -0,0 +1,188 @@
+"""
+Per-agent model routing for the Planarian crew.
+
+Each agent in agents.yaml may name the model it runs on (`model:`) and a
+cheaper one for simple requests (`simple_model:`). Every model gets its own
+LLM client, shared by all crews, and a leased crew's agents are pointed at
+the routed clients before each build.
+
+With PLANARIA_ADAPTIVE_ROUTING=true, requests whose free-text fields are short
+are classified as simple and sent to the `simple_model`s. Per tier the router
+records build latency, per-task latency and a quality score taken from the QA
+agent's validation status, so the tradeoff can be checked at /routing.
+
+A request's `desired_model` is the model of the agent being built: it goes
+into the analysis, the system prompt and the generated code, and by default
+does not choose the crew's models. With PLANARIA_HONOUR_DESIRED_MODEL=true it
+overrides the routes instead, and every agent of the build runs on it (tier
+'requested').
+"""
+import os
+import re
+import threading
+
+import yaml
+
+from cache import PACKAGE_DIR
+from tokens import count_tokens
+
+SIMPLE = 'simple'
+STANDARD = 'standard'
+# Tier of builds whose agents all run on the request's desired_model
+REQUESTED = 'requested'
+
+# Free-text request fields that decide whether a request is simple
+REQUEST_TEXT_FIELDS = ('use_case', 'personality', 'additional_requirements')
+
+# Validation status reported by validate_configuration -> quality score
+QUALITY_SCORES = {'pass': 1.0, 'warning': 0.5, 'fail': 0.0}
+VALIDATION_STATUS = re.compile(r"status\W{0,12}(pass|warning|fail)", re.IGNORECASE)
+
+
+def validation_quality(result):
+    """Quality score of a build from its validation report, or None if it has none"""
+    for output in getattr(result, 'tasks_output', []):
+        if output.name == 'validate_configuration':
+            if output.pydantic is not None:
+                return QUALITY_SCORES[output.pydantic.status]
+            match = VALIDATION_STATUS.search(output.raw)
+            return QUALITY_SCORES[match.group(1).lower()] if match else None
+    return None
+
+
+class ModelRouter:
+    """
+    Chooses the model of each crew task.
+
+    Args:
+        routes: Mapping of task name to {'standard': model, 'simple': model}
+        llm_factory: Callable creating an LLM client for a model name
+        adaptive: Send simple requests to the simple models
+        simple_tokens: Requests with at most this many tokens of free text are simple
+        honour_desired_model: Run every agent on the request's `desired_model`,
+            when it names one, instead of the routed models
+    """
+
+    def __init__(self, routes, llm_factory, adaptive=False, simple_tokens=60, honour_desired_model=False):
+        self.routes = routes
+        self.llm_factory = llm_factory
+        self.adaptive = adaptive
+        self.simple_tokens = simple_tokens
+        self.honour_desired_model = honour_desired_model
+        self._llms = {}
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, llm_factory, default_model, config_dir=None, **kwargs):
+        """Routes from the `model:`/`simple_model:` keys of agents.yaml"""
+        config_dir = config_dir or PACKAGE_DIR / 'config'
+        with open(config_dir / 'agents.yaml') as f:
+            agents = yaml.safe_load(f) or {}
+        with open(config_dir / 'tasks.yaml') as f:
+            tasks = yaml.safe_load(f) or {}
+
+        routes = {}
+        for name, task in tasks.items():
+            agent = agents.get(task.get('agent'), {})
+            model = agent.get('model') or default_model
+            routes[name] = {STANDARD: model, SIMPLE: agent.get('simple_model') or model}
+        return cls(routes, llm_factory, **kwargs)
+
+    @classmethod
+    def from_env(cls, llm_factory, default_model):
+        """
+        Router configured from agents.yaml and environment variables:
+            PLANARIA_ADAPTIVE_ROUTING: route simple requests to simple models (default false)
+            PLANARIA_SIMPLE_REQUEST_TOKENS: free-text size of a simple request (default 60)
+            PLANARIA_HONOUR_DESIRED_MODEL: run the crew on the request's desired_model (default false)
+        """
+        return cls.from_config(
+            llm_factory,
+            default_model,
+            adaptive=os.getenv('PLANARIA_ADAPTIVE_ROUTING', 'false').lower() == 'true',
+            simple_tokens=int(os.getenv('PLANARIA_SIMPLE_REQUEST_TOKENS', '60')),
+            honour_desired_model=os.getenv('PLANARIA_HONOUR_DESIRED_MODEL', 'false').lower() == 'true'
+        )
+
+    def llm(self, model):
+        """The shared LLM client for `model`, created on first use"""
+        with self._lock:
+            if model not in self._llms:
+                self._llms[model] = self.llm_factory(model)
+            return self._llms[model]
+
+    def classify(self, user_input):
+        """'simple' or 'standard'; always 'standard' unless routing is adaptive"""
+        if not self.adaptive:
+            return STANDARD
+        text = ' '.join(str(user_input.get(field) or '') for field in REQUEST_TEXT_FIELDS)
+        return SIMPLE if count_tokens(text) <= self.simple_tokens else STANDARD
+
+    def route(self, crew, user_input):
+        """
+        Point each agent of a leased crew at the model routed for its task,
+        or at the request's desired_model when the router honours it.
+
+        Returns:
+            Dictionary with the request's `tier` and the `models` per task
+        """
+        requested = (user_input.get('desired_model') or '').strip() if self.honour_desired_model else ''
+        tier = REQUESTED if requested else self.classify(user_input)
+        models = {}
+        for task in crew.tasks:
+            route = self.routes.get(task.name)
+            if route:
+                models[task.name] = requested or route[tier]
+                task.agent.llm = self.llm(models[task.name])
+        return {'tier': tier, 'models': models}
+
+    def record(self, routing, breakdown, quality=None):
+        """
+        Record the latency and quality of a routed build.
+
+        Args:
+            routing: Return value of route()
+            breakdown: metrics.Breakdown report of the build
+            quality: Score from validation_quality(), if any
+        """
+        with self._lock:
+            stats = self._stats.setdefault(routing['tier'], {
+                'builds': 0, 'seconds': 0.0, 'rated': 0, 'quality': 0.0, 'tasks': {}
+            })
+            stats['builds'] += 1
+            stats['seconds'] += breakdown['totals']['seconds']
+            if quality is not None:
+                stats['rated'] += 1
+                stats['quality'] += quality
+            for name, task in breakdown['tasks'].items():
+                entry = stats['tasks'].setdefault(name, {'model': None, 'runs': 0, 'seconds': 0.0})
+                entry['model'] = routing['models'].get(name)
+                entry['runs'] += 1
+                entry['seconds'] += task['seconds']
+
+    def stats(self):
+        """Routes plus average latency and quality per tier"""
+        with self._lock:
+            tiers = {
+                tier: {
+                    'builds': stats['builds'],
+                    'avg_serial_latency': round(stats['seconds'] / stats['builds'], 3),
+                    'avg_quality': round(stats['quality'] / stats['rated'], 3) if stats['rated'] else None,
+                    'tasks': {
+                        name: {
+                            'model': entry['model'],
+                            'avg_seconds': round(entry['seconds'] / entry['runs'], 3)
+                        }
+                        for name, entry in stats['tasks'].items()
+                    }
+                }
+                for tier, stats in self._stats.items()
+            }
+        return {
+            'adaptive': self.adaptive,
+            'simple_tokens': self.simple_tokens,
+            'honour_desired_model': self.honour_desired_model,
+            'routes': self.routes,
+            'tiers': tiers
+        }
@@ -0,0 +1,372 @@
+"""
+Dependency-graph execution for the Planarian crew.
+
+`Process.sequential` runs every task after all earlier ones. The tasks in
+`config/tasks.yaml` already declare which upstream outputs they read through
+`context:`, so this module builds a DAG from those lists and starts each task
+as soon as the tasks it depends on have finished. A task may also declare a
+shorter `overlap_context:`, which DAG builds use instead with
+PLANARIA_DAG_OVERLAP=true (see overlap_contexts()).
+
+Task outputs can also be memoized: a task's key covers the model its agent
+runs on, exactly the template variables its description references and the
+outputs of its upstream tasks, so after an edit only the tasks whose inputs
+changed run again. Builds running at the same time share a task execution
+when their memo keys match.
+"""
+import hashlib
+import os
+import re
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+
+from crewai.tasks.task_output import TaskOutput
+from crewai.utilities.formatter import DIVIDERS, aggregate_raw_outputs_from_task_outputs
+from pydantic import BaseModel
+import yaml
+
+from cache import PACKAGE_DIR, config_fingerprint
+import events
+import metrics
+from task_outputs import typed
+
+# Same variable syntax crewAI interpolates into task descriptions
+TEMPLATE_VARIABLE = re.compile(r"\{([A-Za-z_][A-Za-z0-9_\-]*)\}")
+
+# Memo keys of tasks currently executing, shared by all builds in the process
+_inflight = {}
+_inflight_lock = threading.Lock()
+
+
+class TaskGraph:
+    """
+    Tasks of a crew and the upstream tasks each one reads from.
+
+    A task without an explicit `context` list depends on every task declared
+    before it, which matches how crewAI treats it in a sequential crew.
+    """
+
+    def __init__(self, tasks, dependencies):
+        self.tasks = tasks
+        self.dependencies = dependencies
+
+    @classmethod
+    def from_crew(cls, crew, contexts=None):
+        """
+        Args:
+            crew: A Crew built by PlanarianCrew
+            contexts: Optional mapping of task name to the upstream task names
+                it reads instead of its `context`, see overlap_contexts()
+        """
+        contexts = contexts or {}
+        tasks = {}
+        dependencies = {}
+        for task in crew.tasks:
+            if task.name in contexts:
+                deps = list(contexts[task.name])
+            elif isinstance(task.context, list):
+                deps = [upstream.name for upstream in task.context]
+            else:
+                deps = list(tasks)
+            tasks[task.name] = task
+            dependencies[task.name] = deps
+        return cls(tasks, dependencies)
+
+    def ready(self, done, started):
+        """Names of tasks whose dependencies are all in `done`"""
+        return [
+            name for name, deps in self.dependencies.items()
+            if name not in started and all(dep in done for dep in deps)
+        ]
+
+    def critical_path(self, durations):
+        """
+        Longest dependency chain weighted by task duration.
+
+        Args:
+            durations: Mapping of task name to seconds spent running it
+
+        Returns:
+            Tuple of (latency in seconds, list of task names on the path)
+        """
+        finish = {}
+        previous = {}
+        for name in self.tasks:
+            deps = self.dependencies[name]
+            slowest = max(deps, key=lambda dep: finish[dep], default=None)
+            finish[name] = durations.get(name, 0.0) + (finish[slowest] if slowest else 0.0)
+            previous[name] = slowest
+
+        if not finish:
+            return 0.0, []
+
+        name = max(finish, key=finish.get)
+        latency = finish[name]
+        path = []
+        while name:
+            path.append(name)
+            name = previous[name]
+        return latency, path[::-1]
+
+
+class DagResult:
+    """Outputs of a DAG run; str() gives the final task's output like CrewOutput"""
+
+    def __init__(self, tasks_output, timings, artifacts=None):
+        self.tasks_output = tasks_output
+        self.timings = timings
+        self.artifacts = artifacts or {}
+
+    @property
+    def raw(self):
+        return self.tasks_output[-1].raw if self.tasks_output else ""
+
+    def __str__(self):
+        return self.raw
+
+
+def overlap_contexts(config_dir=None):
+    """
+    `overlap_context:` of each task in tasks.yaml: a shorter context that lets
+    the task run alongside another one, used by DAG builds only when
+    PLANARIA_DAG_OVERLAP=true, since the task then sees less upstream work.
+    """
+    if os.getenv('PLANARIA_DAG_OVERLAP', 'false').lower() != 'true':
+        return {}
+    config_dir = config_dir or PACKAGE_DIR / 'config'
+    with open(config_dir / 'tasks.yaml') as f:
+        tasks = yaml.safe_load(f) or {}
+    return {name: task['overlap_context'] for name, task in tasks.items() if task.get('overlap_context')}
+
+
+def task_template(task):
+    """Un-interpolated description and expected output of a task"""
+    description = getattr(task, '_original_description', None) or task.description
+    expected_output = getattr(task, '_original_expected_output', None) or task.expected_output
+    return f"{description}\n{expected_output}"
+
+
+def task_memo_key(task, template, inputs, upstream_outputs, salt=''):
+    """
+    Memo key for one task execution.
+
+    Args:
+        task: The Task about to run
+        template: Its un-interpolated text, see task_template()
+        inputs: Build inputs
+        upstream_outputs: TaskOutputs of the tasks in its context
+        salt: Anything else that changes the task's prompt, e.g. its context budget
+    """
+    # Builds routed to different models (router.py) must not share outputs
+    llm = getattr(task.agent, 'llm', None)
+    model = getattr(llm, 'model', llm) or ''
+    digest = hashlib.sha256()
+    digest.update(f"{config_fingerprint()}:{task.name}:{model}:{salt}".encode())
+    for variable in sorted(set(TEMPLATE_VARIABLE.findall(template))):
+        value = ' '.join(str(inputs.get(variable, '')).split())
+        digest.update(f"\0{variable}={value}".encode())
+    for output in upstream_outputs:
+        digest.update(hashlib.sha256(output.raw.encode()).digest())
+    return digest.hexdigest()
+
+
+def run_dag(crew, inputs, max_parallel=None, memo=None, refresh=False, overrides=None,
+            context_budget=None, knowledge=None, contexts=None):
+    """
+    Run the tasks of `crew` in dependency order, overlapping independent ones.
+
+    Args:
+        crew: A Crew built by PlanarianCrew
+        inputs: Template inputs, as for crew.kickoff
+        max_parallel: Upper bound on tasks running at once (default: all ready)
+        memo: Optional cache (see cache.ResultCache) of earlier task outputs
+        refresh: Recompute every task even on a memo hit, storing the new outputs
+        overrides: Optional mapping of task name to a callable taking
+            (inputs, {upstream name: TaskOutput}) and returning
+            (output, artifacts dict), used instead of running the task,
+            or None to run the task as usual; the output is raw text or an
+            instance of the task's output schema
+        context_budget: Optional context_budget.ContextBudget trimming the
+            upstream outputs each task receives
+        knowledge: Optional retrieval.TaskKnowledge whose chunks are appended
+            to the context of the tasks it has chunks for
+        contexts: Optional mapping of task name to the upstream tasks it reads
+            instead of its `context` (see overlap_contexts())
+
+    Returns:
+        DagResult with per-task outputs, artifacts from overrides (plus a
+        `context_budget` report of tokens saved and the `knowledge` chunks
+        each task received) and a timing report comparing
+        the critical-path latency to the serial latency
+    """
+    graph = TaskGraph.from_crew(crew, contexts)
+    templates = {task.name: task_template(task) for task in crew.tasks}
+
+    for task in crew.tasks:
+        task.interpolate_inputs_and_add_conversation_history(inputs)
+    for crew_agent in crew.agents:
+        crew_agent.interpolate_inputs(inputs)
+        crew_agent.crew = crew
+
+    # An agent keeps per-execution state, so tasks sharing one must not overlap
+    agent_locks = {id(task.agent): threading.Lock() for task in crew.tasks}
+
+    outputs = {}
+    spans = {}
+    memoized = []
+    overridden = []
+    artifacts = {}
+    context_reports = {}
+    knowledge_reports = {}
+    overrides = overrides or {}
+    run_start = time.perf_counter()
+
+    def completed(task, raw, **flags):
+        """TaskOutput for a task that did not run through its agent, typed like a live run's"""
+        result = raw if isinstance(raw, BaseModel) else typed(task, raw)
+        if result is not None:
+            raw = result.model_dump_json()
+        output = TaskOutput(
+            name=task.name,
+            description=task.description,
+            expected_output=task.expected_output,
+            raw=raw,
+            pydantic=result,
+            json_dict=result.model_dump() if result is not None else None,
+            agent=task.agent.role
+        )
+        task.output = output
+        events.publish(task, dict({
+            'event': 'task_completed',
+            'task': task.name,
+            'output': raw
+        }, **flags))
+        return output
+
+    def reuse(task, raw):
+        memoized.append(task.name)
+        return completed(task, raw, memoized=True)
+
+    def override(task, upstream):
+        start = time.perf_counter()
+        replacement = overrides[task.name](inputs, upstream)
+        if replacement is None:
+            return None
+        raw, task_artifacts = replacement
+        end = time.perf_counter()
+        spans[task.name] = (start - run_start, end - run_start)
+        overridden.append(task.name)
+        artifacts.update(task_artifacts or {})
+        return completed(task, raw, fast=True)
+
+    def run(task, upstream, reference=''):
+        if context_budget is not None and upstream:
+            context, context_reports[task.name] = context_budget.apply(task.name, upstream)
+            metrics.CONTEXT_TOKENS_SAVED.inc(context_reports[task.name]['tokens_saved'], task=task.name)
+        else:
+            context = aggregate_raw_outputs_from_task_outputs(upstream)
+        if reference:
+            context = DIVIDERS.join([context, reference]) if context else reference
+        with agent_locks[id(task.agent)]:
+            start = time.perf_counter()
+            output = task.execute_sync(agent=task.agent, context=context, tools=task.tools)
+            end = time.perf_counter()
+        spans[task.name] = (start - run_start, end - run_start)
+        return output
+
+    def execute(name):
+        task = graph.tasks[name]
+        upstream = [outputs[dep] for dep in graph.dependencies[name]]
+        if name in overrides:
+            output = override(task, {dep: outputs[dep] for dep in graph.dependencies[name]})
+            if output is not None:
+                return output
+        reference = ''
+        if knowledge is not None:
+            chunks = knowledge.retrieve(task)
+            if chunks:
+                knowledge_reports[name] = [f"{chunk['source']}:{chunk['line']}" for chunk in chunks]
+                reference = knowledge.format(chunks)
+        if memo is None:
+            return run(task, upstream, reference)
+
+        salt = context_budget.key(name) if context_budget is not None else ''
+        if reference:
+            salt += ':' + hashlib.sha256(reference.encode()).hexdigest()
+        key = task_memo_key(task, templates[name], inputs, upstream, salt)
+        stored = None if refresh else memo.get(key)
+        if stored is not None:
+            return reuse(task, stored['raw'])
+
+        # Identical task already running in another build: wait for its output
+        with _inflight_lock:
+            shared = _inflight.get(key)
+            if shared is None:
+                _inflight[key] = Future()
+        if shared is not None:
+            try:
+                return reuse(task, shared.result())
+            except Exception:
+                return run(task, upstream, reference)
+
+        try:
+            output = run(task, upstream, reference)
+            memo.set(key, {'raw': output.raw})
+            _inflight[key].set_result(output.raw)
+            return output
+        except Exception as e:
+            _inflight[key].set_exception(e)
+            raise
+        finally:
+            with _inflight_lock:
+                _inflight.pop(key, None)
+
+    workers = max_parallel or len(graph.tasks) or 1
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="planaria-task") as pool:
+        running = {}
+        while len(outputs) < len(graph.tasks):
+            for name in graph.ready(outputs, set(outputs) | set(running.values())):
+                running[pool.submit(execute, name)] = name
+            if not running:
+                raise RuntimeError("Task graph has a dependency cycle")
+
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                name = running.pop(future)
+                try:
+                    outputs[name] = future.result()
+                except Exception:
+                    for pending in running:
+                        pending.cancel()
+                    raise
+
+    wall_time = time.perf_counter() - run_start
+    durations = {name: end - start for name, (start, end) in spans.items()}
+    serial_latency = sum(durations.values())
+    critical_latency, critical_path = graph.critical_path(durations)
+
+    timings = {
+        'tasks': {
+            name: {'start': round(start, 3), 'end': round(end, 3), 'duration': round(end - start, 3)}
+            for name, (start, end) in spans.items()
+        },
+        'serial_latency': round(serial_latency, 3),
+        'critical_path_latency': round(critical_latency, 3),
+        'critical_path': critical_path,
+        'wall_time': round(wall_time, 3),
+        'speedup': round(serial_latency / wall_time, 2) if wall_time else None,
+        'memoized': memoized,
+        'overridden': overridden
+    }
+
+    if context_budget is not None:
+        artifacts['context_budget'] = {
+            'tasks': context_reports,
+            'tokens_saved': sum(report['tokens_saved'] for report in context_reports.values())
+        }
+
+    if knowledge_reports:
+        artifacts['knowledge'] = knowledge_reports
+
+    return DagResult([outputs[task.name] for task in crew.tasks], timings, artifacts)
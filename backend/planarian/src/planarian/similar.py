@@ -0,0 +1,284 @@
+"""
+Near-duplicate reuse of earlier builds.
+
+The result cache only answers requests that match an earlier one exactly, but
+requests often differ only in wording: "Customer support assistant for a
+SaaS product" and "SaaS customer support bot" want the same agent. This
+index keeps TF-IDF vectors of the use case and the additional requirements
+of every finished build in a fixed-size NumPy array, and finds earlier
+builds for the same agent type, model, personality and framework whose use
+case and additional requirements both reach PLANARIA_SIMILAR_THRESHOLD in
+cosine similarity. Scoring each field on its own keeps a shared use case
+from hiding different requirements and the other way round ("Sales
+assistant for a SaaS product" is not a customer support assistant).
+
+Words are hashed into a fixed number of dimensions, so the array never
+grows: it holds at most PLANARIA_SIMILAR_MAX_ENTRIES builds, and the least
+recently matched one is evicted to make room. Queries are scored together
+as one matrix product per field (search_many).
+
+What a match is used for is chosen per request with `similar` (default
+PLANARIA_SIMILAR_REUSE, 'off'): 'suggest' answers with the matching earlier
+builds instead of building, and 'seed' runs the crew with the match's
+requirements analysis and system prompt instead of running those tasks
+again. Seeding only uses a match whose additional requirements are the same
+as the request's (seed()), since the seeded analysis was written for them.
+"""
+import json
+import os
+import re
+import threading
+import zlib
+
+import numpy as np
+
+from cache import normalize_request, request_key
+
+SEED = 'seed'
+SUGGEST = 'suggest'
+OFF = 'off'
+REUSE_MODES = (OFF, SUGGEST, SEED)
+
+# Request fields compared by wording, and fields that must match exactly
+TEXT_FIELDS = ('use_case', 'additional_requirements')
+EXACT_FIELDS = ('agent_type', 'desired_model', 'personality', 'target_framework')
+# Typed task outputs a match seeds a new build with
+SEEDED_TASKS = ('analyze_requirements', 'create_system_prompt')
+
+DIMENSIONS = 2048
+WORD = re.compile(r"[a-z0-9]+")
+# Function words, and words for "an agent" that any use case may use
+STOPWORDS = frozenset(
+    'a an and are as at be by for from has have in is it its of on or our that the their this '
+    'to we will with you your agent ai assistant bot chatbot helper'.split()
+)
+
+
+def words(text):
+    """Content words of `text`, lowercased, with a plural 's' dropped"""
+    found = []
+    for word in WORD.findall(text.lower()):
+        if word in STOPWORDS:
+            continue
+        if len(word) > 3 and word.endswith('s') and not word.endswith('ss'):
+            word = word[:-1]
+        found.append(word)
+    return found
+
+
+def vectorize(user_input):
+    """Term counts of each of a request's TEXT_FIELDS, hashed into DIMENSIONS buckets"""
+    normalized = normalize_request(user_input)
+    vectors = np.zeros((len(TEXT_FIELDS), DIMENSIONS), dtype=np.float32)
+    for row, field in enumerate(TEXT_FIELDS):
+        buckets = [zlib.crc32(word.encode()) % DIMENSIONS for word in words(normalized[field])]
+        vectors[row] = np.bincount(buckets, minlength=DIMENSIONS)
+    return vectors
+
+
+def group_of(user_input):
+    """Requests can only match within the same agent type, model, personality and framework"""
+    normalized = normalize_request(user_input)
+    return zlib.crc32('\0'.join(normalized[field].lower() for field in EXACT_FIELDS).encode())
+
+
+def reuse_mode(user_input):
+    """How a request uses near-duplicates: its `similar` field or PLANARIA_SIMILAR_REUSE"""
+    mode = (user_input.get('similar') or os.getenv('PLANARIA_SIMILAR_REUSE', OFF)).lower()
+    if mode not in REUSE_MODES:
+        raise ValueError(f"similar must be one of {', '.join(REUSE_MODES)}")
+    # Opting out of the cache opts out of reusing near-duplicates too
+    return mode if user_input.get('use_cache', True) else OFF
+
+
+def seed_overrides(match):
+    """
+    DAG overrides (see scheduler.run_dag) answering SEEDED_TASKS with the
+    typed outputs of a matching earlier build, instead of running them.
+    """
+    source = {'use_case': match['request']['use_case'], 'similarity': match['similarity']}
+
+    def seed(task):
+        def override(inputs, upstream):
+            return json.dumps(match['outputs'][task]), {'seeded_from': source}
+        return override
+    return {task: seed(task) for task in SEEDED_TASKS}
+
+
+class SimilarBuilds:
+    """
+    Bounded TF-IDF index of finished builds, searched by cosine similarity.
+
+    Args:
+        max_entries: Builds kept; the least recently matched is evicted first
+        threshold: Minimum cosine similarity of a match in each of
+            TEXT_FIELDS, from 0 to 1
+    """
+
+    def __init__(self, max_entries=1000, threshold=0.6):
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # Untouched rows of np.zeros are not backed by memory until a build is stored
+        self._vectors = np.zeros((max_entries, len(TEXT_FIELDS), DIMENSIONS), dtype=np.float32)
+        self._groups = np.zeros(max_entries, dtype=np.int64)
+        self._used = np.zeros(max_entries, dtype=bool)
+        # Slot -> last time it was added or matched, on a counter of operations
+        self._touched = np.zeros(max_entries, dtype=np.int64)
+        self._document_frequency = np.zeros((len(TEXT_FIELDS), DIMENSIONS), dtype=np.int64)
+        self._entries = [None] * max_entries
+        self._slots = {}
+        self._clock = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls):
+        """
+        Index sized by PLANARIA_SIMILAR_MAX_ENTRIES, or None when that is 0.
+        Builds are indexed even when PLANARIA_SIMILAR_REUSE is 'off', so
+        requests can still ask for similar=suggest or seed.
+        """
+        max_entries = int(os.getenv('PLANARIA_SIMILAR_MAX_ENTRIES', '1000'))
+        if max_entries <= 0:
+            return None
+        return cls(
+            max_entries=max_entries,
+            threshold=float(os.getenv('PLANARIA_SIMILAR_THRESHOLD', '0.6'))
+        )
+
+    def add(self, user_input, outputs):
+        """
+        Remember a finished build.
+
+        Args:
+            user_input: The build request
+            outputs: Mapping of task name to its typed output's fields; builds
+                without all of SEEDED_TASKS are not kept
+        """
+        if not all(outputs.get(task) for task in SEEDED_TASKS):
+            return
+        key = request_key(user_input)
+        vector = vectorize(user_input)
+        entry = {
+            'key': key,
+            'request': normalize_request(user_input),
+            'outputs': {task: outputs[task] for task in SEEDED_TASKS}
+        }
+        with self._lock:
+            slot = self._slots.get(key)
+            if slot is None:
+                slot = self._free_slot()
+                self._slots[key] = slot
+            else:
+                self._document_frequency -= self._vectors[slot] > 0
+            self._vectors[slot] = vector
+            self._document_frequency += vector > 0
+            self._groups[slot] = group_of(user_input)
+            self._used[slot] = True
+            self._entries[slot] = entry
+            self._touch(slot)
+
+    def search_many(self, requests, limit=3):
+        """
+        Earlier builds similar to each of `requests`, scored in one batch.
+
+        Returns:
+            One list per request of up to `limit` matches at or above the
+            threshold, best first; each has the earlier build's `key`,
+            normalized `request`, seed `outputs` and `similarity`
+        """
+        if not requests:
+            return []
+        queries = np.stack([vectorize(request) for request in requests])
+        groups = np.array([group_of(request) for request in requests], dtype=np.int64)
+        keys = [request_key(request) for request in requests]
+        with self._lock:
+            slots = np.flatnonzero(self._used)
+            if not len(slots):
+                self.misses += len(requests)
+                return [[] for _ in requests]
+            # Smoothed inverse document frequency over the builds indexed now
+            idf = np.log((1 + len(slots)) / (1 + self._document_frequency)).astype(np.float32) + 1
+            weighted = self._vectors[slots] * idf
+            weighted_queries = queries * idf
+            norms = np.linalg.norm(weighted, axis=2)
+            query_norms = np.linalg.norm(weighted_queries, axis=2)
+            similarity = np.ones((len(requests), len(slots)), dtype=np.float32)
+            for field in range(len(TEXT_FIELDS)):
+                products = weighted_queries[:, field] @ weighted[:, field].T
+                scale = np.outer(query_norms[:, field], norms[:, field])
+                field_similarity = products / np.maximum(scale, 1e-12)
+                # A field left empty in both requests agrees; empty in one of them does not
+                field_similarity[np.outer(query_norms[:, field] == 0, norms[:, field] == 0)] = 1
+                # A match must be similar in every field
+                similarity = np.minimum(similarity, field_similarity)
+            # Builds for another agent type, model, personality or framework never match
+            similarity[groups[:, None] != self._groups[slots][None, :]] = -1
+
+            results = []
+            for row, key in enumerate(keys):
+                scores = similarity[row]
+                candidates = np.flatnonzero(scores >= self.threshold)
+                candidates = candidates[np.argsort(-scores[candidates], kind='stable')]
+                matches = []
+                for index in candidates:
+                    entry = self._entries[slots[index]]
+                    # The identical request is the result cache's business
+                    if entry['key'] == key:
+                        continue
+                    self._touch(slots[index])
+                    matches.append(dict(entry, similarity=round(float(scores[index]), 4)))
+                    if len(matches) == limit:
+                        break
+                if matches:
+                    self.hits += 1
+                else:
+                    self.misses += 1
+                results.append(matches)
+            return results
+
+    def search(self, user_input, limit=3):
+        """Earlier builds similar to one request; see search_many()"""
+        return self.search_many([user_input], limit)[0]
+
+    def seed(self, user_input):
+        """
+        Best earlier build whose requirements analysis and system prompt a
+        build of `user_input` can reuse, or None. Besides matching, it must
+        have the same additional requirements, which the analysis is based on.
+        """
+        requirements = normalize_request(user_input)['additional_requirements'].lower()
+        for match in self.search(user_input, limit=3):
+            if match['request']['additional_requirements'].lower() == requirements:
+                return match
+        return None
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': int(self._used.sum()),
+                'max_entries': self.max_entries,
+                'threshold': self.threshold,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions
+            }
+
+    def _touch(self, slot):
+        self._clock += 1
+        self._touched[slot] = self._clock
+
+    def _free_slot(self):
+        """An unused slot, evicting the least recently matched entry when full"""
+        free = np.flatnonzero(~self._used)
+        if len(free):
+            return int(free[0])
+        slot = int(np.argmin(self._touched))
+        self._document_frequency -= self._vectors[slot] > 0
+        del self._slots[self._entries[slot]['key']]
+        self._entries[slot] = None
+        self._used[slot] = False
+        self.evictions += 1
+        return slot
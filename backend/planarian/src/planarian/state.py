@@ -0,0 +1,85 @@
+"""
+State shared by the worker processes of a multi-worker server.
+
+With PLANARIA_WORKERS above 1 (see prefork.py), job status, the disk tiers
+of the result cache and task memo, and the LLM rate limits live in SQLite
+files in WAL mode under one directory, so every worker sees the same jobs,
+cached results and request budgets. Readers never block the writer in WAL
+mode, and writes from different processes are serialized by SQLite's lock.
+"""
+import os
+import sqlite3
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+
+
+def server_workers():
+    """Worker processes the API server runs (PLANARIA_WORKERS, default 1)"""
+    return max(1, int(os.getenv('PLANARIA_WORKERS', '1')))
+
+
+def state_dir():
+    """
+    Directory of the shared SQLite files: PLANARIA_STATE_DIR, or a directory
+    under the system temp dir when several workers run. None for a single
+    process that keeps its state in memory.
+    """
+    path = os.getenv('PLANARIA_STATE_DIR')
+    if not path and server_workers() > 1:
+        path = Path(tempfile.gettempdir()) / 'planaria-state'
+    return Path(path) if path else None
+
+
+def state_path(name):
+    """Path of a shared SQLite file, or None without a state directory"""
+    directory = state_dir()
+    return directory / name if directory else None
+
+
+class SharedDatabase:
+    """
+    A SQLite file in WAL mode used from several threads and processes.
+
+    Connections are opened lazily, once per process: a connection must not be
+    used on both sides of a fork. Callers serialize their own threads.
+
+    Args:
+        path: Database file, created with its directory if missing
+        schema: Statements run when a process first connects
+    """
+
+    def __init__(self, path, schema=()):
+        self.path = str(path)
+        self.schema = tuple(schema)
+        self._connection = None
+        self._pid = None
+
+    @property
+    def connection(self):
+        if self._pid != os.getpid():
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+            db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=30)
+            db.execute("PRAGMA journal_mode=WAL")
+            # Durable across process crashes; only a power loss can drop the last commits
+            db.execute("PRAGMA synchronous=NORMAL")
+            for statement in self.schema:
+                db.execute(statement)
+            self._connection = db
+            self._pid = os.getpid()
+        return self._connection
+
+    def execute(self, sql, params=()):
+        return self.connection.execute(sql, params)
+
+    @contextmanager
+    def transaction(self):
+        """Read-modify-write block that holds the write lock from the start"""
+        db = self.connection
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            yield db
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        db.execute("COMMIT")
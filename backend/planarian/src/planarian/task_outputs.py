@@ -0,0 +1,218 @@
+"""
+Typed outputs of the crew tasks.
+
+Each task in tasks.yaml names the pydantic schema of its answer with
+`output_schema:`. The agent is asked for a JSON object with the schema's
+fields (format_instructions(), appended to the task's expected output), and
+the task's guardrail parses and validates the answer once into
+TaskOutput.pydantic, normalizing TaskOutput.raw to compact JSON. Downstream
+tasks then receive just the fields they need (context_budget.py), and
+consumers such as the fast path, the router and the API read fields instead
+of searching prose with regexes.
+
+A malformed answer is sent back to its agent up to PLANARIA_OUTPUT_RETRIES
+times (default 1) with the validation error and the previous answer, a much
+smaller prompt than the original with its upstream context. If it is still
+malformed, the raw text is kept untyped and consumers fall back to reading
+it as prose.
+"""
+import json
+import logging
+import os
+import re
+import typing
+from typing import Dict, List, Literal
+
+from pydantic import BaseModel, Field, ValidationError, field_validator
+
+logger = logging.getLogger('planaria.outputs')
+
+JSON_FENCE = re.compile(r"^(`{3,}|~{3,})[ \t]*(?:json)?[ \t]*\n(.*)\n[ \t]*\1[ \t]*$", re.DOTALL | re.IGNORECASE)
+
+
+class AgentSettings(BaseModel):
+    name: str = Field(description="Agent name")
+    type: str = Field(description="Agent type")
+    model: str = Field(description="Model the agent runs on")
+    personality: str = Field(description="Personality traits")
+    temperature: float = Field(0.7, ge=0, le=2, description="Sampling temperature")
+    max_tokens: int = Field(1024, gt=0, description="Maximum output tokens")
+
+
+class RequirementsAnalysis(BaseModel):
+    recommended_model: str = Field(description="Gemini model to use")
+    model_rationale: str = Field(description="Why that model fits the use case")
+    config: AgentSettings = Field(description="Agent configuration")
+    technical_requirements: List[str] = Field(default_factory=list, description="Technical requirements")
+    considerations: List[str] = Field(default_factory=list, description="Special considerations")
+
+
+class SystemPrompt(BaseModel):
+    system_prompt: str = Field(min_length=1, description="The complete system prompt, ready to use")
+    techniques: List[str] = Field(default_factory=list, description="Prompting techniques used")
+
+
+class CodePackage(BaseModel):
+    files: Dict[str, str] = Field(min_length=1, description="File path -> complete file content")
+    setup: List[str] = Field(default_factory=list, description="Setup steps, in order")
+
+
+class ValidationReport(BaseModel):
+    status: Literal['pass', 'warning', 'fail'] = Field(description="Overall status")
+    issues: List[str] = Field(default_factory=list, description="Issues found")
+    security: List[str] = Field(default_factory=list, description="Security findings")
+    recommendations: List[str] = Field(default_factory=list, description="Recommended improvements")
+
+    @field_validator('status', mode='before')
+    @classmethod
+    def _lowercase(cls, value):
+        return value.strip().lower() if isinstance(value, str) else value
+
+
+class Documentation(BaseModel):
+    readme: str = Field(min_length=1, description="README in markdown: setup, API key, configuration, "
+                                                  "usage examples, troubleshooting and deployment")
+    setup_steps: List[str] = Field(default_factory=list, description="Setup steps, in order")
+    troubleshooting: List[str] = Field(default_factory=list, description="Common problems and their fixes")
+
+
+# Schema name in tasks.yaml -> schema
+SCHEMAS = {schema.__name__: schema for schema in (
+    RequirementsAnalysis, SystemPrompt, CodePackage, ValidationReport, Documentation
+)}
+
+
+def output_retries():
+    """Times a malformed answer is sent back to its agent (PLANARIA_OUTPUT_RETRIES, default 1)"""
+    return max(0, int(os.getenv('PLANARIA_OUTPUT_RETRIES', '1')))
+
+
+def _type_name(annotation):
+    origin = typing.get_origin(annotation)
+    args = typing.get_args(annotation)
+    if origin is Literal:
+        return 'one of ' + ', '.join(json.dumps(arg) for arg in args)
+    if origin is list:
+        return f"list of {_type_name(args[0])}s"
+    if origin is dict:
+        return f"object of {_type_name(args[0])} to {_type_name(args[1])}"
+    return {str: 'string', int: 'integer', float: 'number', bool: 'boolean'}.get(annotation, 'object')
+
+
+def _field_lines(schema, indent=''):
+    lines = []
+    for name, field in schema.model_fields.items():
+        lines.append(f'{indent}- "{name}" ({_type_name(field.annotation)}): {field.description}')
+        if isinstance(field.annotation, type) and issubclass(field.annotation, BaseModel):
+            lines.extend(_field_lines(field.annotation, indent + '  '))
+    return lines
+
+
+def format_instructions(schema):
+    """What to tell an agent about the shape of its answer"""
+    return "\n".join([
+        "Your final answer must be a single JSON object, without code fences or any "
+        "text around it, with these fields:"
+    ] + _field_lines(schema))
+
+
+def parse(schema, text):
+    """
+    Validate an agent's answer against `schema`.
+
+    The answer may be wrapped in a code fence or have text around the object.
+
+    Raises:
+        ValueError: If it holds no JSON object matching the schema
+            (pydantic's ValidationError is a ValueError)
+    """
+    text = text.strip()
+    fenced = JSON_FENCE.match(text)
+    if fenced:
+        text = fenced.group(2).strip()
+    if not text.startswith('{'):
+        start, end = text.find('{'), text.rfind('}')
+        if start == -1 or end < start:
+            raise ValueError("the answer is not a JSON object")
+        text = text[start:end + 1]
+    return schema.model_validate_json(text)
+
+
+def describe_error(error):
+    """Short, agent-readable description of a parse() error"""
+    if isinstance(error, ValidationError):
+        return '; '.join(
+            f"{'.'.join(str(part) for part in detail['loc']) or 'answer'}: {detail['msg']}"
+            for detail in error.errors()
+        )
+    return str(error)
+
+
+def schema_of(task):
+    """Output schema of a crew task, or None"""
+    guardrail = getattr(getattr(task, 'guardrail', None), '__self__', None)
+    return getattr(guardrail, 'schema', None)
+
+
+def typed(task, raw):
+    """Validated output of `task` from its raw text (e.g. a memoized answer), or None"""
+    schema = schema_of(task)
+    if schema is None:
+        return None
+    try:
+        return parse(schema, raw)
+    except ValueError:
+        return None
+
+
+def example(schema, text='example'):
+    """Instance of `schema` with placeholder values, for stand-in LLMs"""
+    def value(annotation):
+        origin = typing.get_origin(annotation)
+        if origin is Literal:
+            return typing.get_args(annotation)[0]
+        if origin is list:
+            return [value(typing.get_args(annotation)[0])]
+        if origin is dict:
+            return {f"{text}.txt": value(typing.get_args(annotation)[1])}
+        if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+            return example(annotation, text)
+        return {int: 1, float: 0.5, bool: True}.get(annotation, text)
+    return schema(**{name: value(field.annotation) for name, field in schema.model_fields.items()})
+
+
+class OutputGuardrail:
+    """
+    Validates a task's answer against its schema; `check` is the task's
+    crewAI guardrail (crewAI's guardrail events need it to be a method).
+
+    Args:
+        schema: Pydantic model of the answer
+        retries: Malformed answers sent back to the agent before the raw text
+            is accepted untyped; the task's guardrail_max_retries
+    """
+
+    def __init__(self, schema, retries=None):
+        self.schema = schema
+        self.retries = output_retries() if retries is None else retries
+        # The Task this guards, set once it is built; its retry_count says how often the agent retried
+        self.task = None
+
+    def check(self, output):
+        attempt = getattr(self.task, 'retry_count', self.retries)
+        try:
+            result = parse(self.schema, output.raw)
+        except ValueError as e:
+            if attempt < self.retries:
+                return False, f"The answer must be a JSON object with the requested fields: {describe_error(e)}"
+            logger.warning("%s: answer does not match %s, keeping it as text (%s)",
+                           output.name, self.schema.__name__, describe_error(e))
+            result = None
+        if self.task is not None:
+            # Pooled crews run the same Task again in later builds
+            self.task.retry_count = 0
+        if result is not None:
+            output.pydantic = result
+            output.json_dict = result.model_dump()
+            output.raw = result.model_dump_json()
+        return True, output
@@ -0,0 +1,74 @@
+"""
+Request validation of the API server.
+
+Run from this directory with `python -m pytest test_api.py`. No builds are
+run, so no API key is needed: the server only checks for one when it starts.
+"""
+from types import SimpleNamespace
+
+import pytest
+from fastapi.testclient import TestClient
+
+import api
+
+REQUEST = {
+    'agent_type': 'chatbot',
+    'use_case': 'Customer support assistant for a SaaS product',
+    'personality': 'helpful and professional',
+    'target_framework': 'react'
+}
+
+
+@pytest.fixture
+def client(monkeypatch):
+    submitted = []
+
+    def submit(user_input, on_event=None):
+        submitted.append(user_input)
+        return SimpleNamespace(id=f"job-{len(submitted)}")
+    monkeypatch.setattr(api.build_jobs, 'submit', submit)
+    # Without the lifespan, so the crew machinery is never loaded
+    client = TestClient(api.app)
+    client.submitted = submitted
+    return client
+
+
+@pytest.mark.parametrize('field, value, message', [
+    ('execution_mode', 'nope', 'execution_mode must be one of'),
+    ('similar', 'x', 'similar must be one of'),
+    ('use_case', '', 'use_case is required'),
+    ('target_framework', 'cobol', 'fast mode supports target_framework')
+])
+def test_build_agent_rejects_invalid_requests(client, field, value, message):
+    request = dict(REQUEST, **{field: value})
+    if field == 'target_framework':
+        request['fast'] = True
+
+    response = client.post('/build-agent', json=request)
+
+    assert response.status_code == 400
+    assert message in response.json()['detail']
+    assert client.submitted == []
+
+
+def test_stream_and_batch_reject_the_same_requests(client):
+    request = dict(REQUEST, execution_mode='nope')
+
+    assert client.post('/build-agent/stream', json=request).status_code == 400
+    assert client.post('/build-agents/batch', json={'requests': [request]}).status_code == 400
+    assert client.submitted == []
+
+
+def test_build_agent_queues_valid_requests(client):
+    response = client.post('/build-agent', json=dict(REQUEST, use_cache=False))
+
+    assert response.status_code == 202
+    assert response.json()['job_id'] == 'job-1'
+    assert client.submitted[0]['use_case'] == REQUEST['use_case']
+
+
+def test_server_needs_an_api_key(monkeypatch):
+    monkeypatch.delenv('GOOGLE_API_KEY', raising=False)
+
+    with pytest.raises(SystemExit):
+        api.require_api_key()
@@ -0,0 +1,68 @@
+"""
+Streamed project downloads (archives.py, GET /jobs/{job_id}/bundle).
+
+Run from this directory with `python -m pytest test_archives.py`.
+"""
+import io
+import tarfile
+import zipfile
+from types import SimpleNamespace
+
+import pytest
+from fastapi.testclient import TestClient
+
+import api
+from archives import iter_archive
+
+FILES = [('agent/main.py', 'print("hi")\n'), ('agent/README.md', '# Agent\n' * 100)]
+
+
+def read_back(archive_format, data):
+    if archive_format == 'zip':
+        with zipfile.ZipFile(io.BytesIO(data)) as archive:
+            return [(name, archive.read(name).decode()) for name in archive.namelist()]
+    with tarfile.open(fileobj=io.BytesIO(data), mode='r:gz') as archive:
+        return [(member.name, archive.extractfile(member).read().decode()) for member in archive.getmembers()]
+
+
+@pytest.mark.parametrize('archive_format', ['zip', 'tar'])
+def test_archives_hold_every_file(archive_format):
+    data = b''.join(iter_archive(archive_format, iter(FILES)))
+
+    assert read_back(archive_format, data) == FILES
+
+
+@pytest.mark.parametrize('archive_format', ['zip', 'tar'])
+def test_files_are_rendered_as_the_archive_streams(archive_format):
+    rendered = []
+
+    def files():
+        for filename, content in FILES:
+            rendered.append(filename)
+            yield filename, content
+    chunks = iter_archive(archive_format, files())
+
+    next(chunks)
+    assert rendered == ['agent/main.py']
+
+
+def test_unknown_formats_are_rejected():
+    with pytest.raises(ValueError):
+        iter_archive('rar', FILES)
+
+
+def test_bundle_download(monkeypatch):
+    spec = {'framework': 'python', 'system_prompt': 'Be helpful.',
+            'config': {'name': 'Support Bot', 'model': 'gemini-1.5-flash'}}
+    job = SimpleNamespace(done=True, status='succeeded', result={'bundle': spec})
+    monkeypatch.setattr(api.build_jobs, 'get', lambda job_id: job if job_id == 'job-1' else None)
+    client = TestClient(api.app)
+
+    response = client.get('/jobs/job-1/bundle', params={'format': 'tar'})
+
+    assert response.status_code == 200
+    assert response.headers['content-disposition'] == 'attachment; filename="support-bot.tar.gz"'
+    names = [name for name, _ in read_back('tar', response.content)]
+    assert 'support-bot/main.py' in names
+    assert client.get('/jobs/job-1/bundle', params={'format': 'rar'}).status_code == 400
+    assert client.get('/jobs/job-2/bundle').status_code == 404
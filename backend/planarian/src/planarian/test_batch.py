@@ -0,0 +1,116 @@
+"""
+Task sharing across the items of a batch.
+
+Run from this directory with `python -m pytest test_batch.py`. The crews run
+on benchmark.StubLLM, so no API key is needed.
+"""
+import itertools
+import os
+
+import pytest
+
+os.environ.setdefault('GOOGLE_API_KEY', 'unused')
+
+import main
+from batch import run_batch
+from benchmark import StubLLM
+from factory import CrewFactory
+from jobs import JobQueue, QueueFullError
+
+
+@pytest.fixture
+def jobs(monkeypatch):
+    monkeypatch.setattr(main, '_crew_factory', CrewFactory(pool_size=4, llm=StubLLM(latency=0.01, completion_tokens=5)))
+    queue = JobQueue(lambda user_input, on_event=None: main.build_payload(user_input), max_workers=4)
+    yield queue
+    queue.shutdown(wait=True)
+
+
+def test_variants_of_one_use_case_share_the_requirements_analysis(jobs):
+    requests = [
+        {
+            'agent_type': 'chatbot',
+            'use_case': 'Order tracking assistant for an online bike shop',
+            'desired_model': 'gemini-1.5-flash',
+            'personality': personality,
+            'target_framework': framework,
+            'additional_requirements': 'Look up orders by number',
+            'similar': 'off'
+        }
+        for personality, framework in itertools.product(('friendly', 'formal'), ('react', 'python', 'node'))
+    ]
+
+    items = list(run_batch(requests, jobs, max_parallel=4))
+
+    assert sorted(item['index'] for item in items) == list(range(len(requests)))
+    assert all(item['success'] for item in items)
+    timings = [item['result']['timings'] for item in items]
+    analyzed = [t for t in timings if 'analyze_requirements' not in t['memoized'] + t['overridden']]
+    assert len(analyzed) == 1
+    # The variants given the shared analysis keep their own personality
+    for item in items:
+        if 'analyze_requirements' in item['result']['timings']['overridden']:
+            config = item['result']['outputs']['analyze_requirements']['config']
+            assert config['personality'] == requests[item['index']]['personality']
+            assert item['result']['analysis_shared_from']
+    # The tasks that read personality or framework still ran for each item
+    prompts = {}
+    for item in items:
+        prompt = item['result']['outputs']['create_system_prompt']['system_prompt']
+        prompts.setdefault(requests[item['index']]['personality'], set()).add(prompt)
+    assert not prompts['friendly'] & prompts['formal']
+
+
+def test_batch_items_run_on_the_build_queue(jobs):
+    requests = [{'agent_type': 'chatbot', 'use_case': f'Assistant number {i}', 'desired_model': 'gemini-1.5-flash',
+                 'personality': 'calm', 'target_framework': 'react', 'additional_requirements': '',
+                 'similar': 'off'} for i in range(3)]
+
+    items = list(run_batch(requests, jobs, max_parallel=2))
+
+    assert all(item['success'] for item in items)
+    assert all(jobs.get(item['job_id']).done for item in items)
+    assert jobs.stats()['succeeded'] == 3
+
+
+def test_variants_run_in_full_when_the_first_fails():
+    seen = []
+
+    def build(user_input, on_event=None):
+        seen.append(user_input)
+        if len(seen) == 1:
+            raise RuntimeError("CrewAI execution failed")
+        return {'outputs': {}}
+    jobs = JobQueue(build, max_workers=1)
+    requests = [{'agent_type': 'chatbot', 'use_case': 'Shop assistant', 'desired_model': 'gemini-1.5-flash',
+                 'personality': personality, 'target_framework': 'react', 'additional_requirements': ''}
+                for personality in ('calm', 'cheerful')]
+
+    items = sorted(run_batch(requests, jobs), key=lambda item: item['index'])
+
+    assert [item['success'] for item in items] == [False, True]
+    assert 'shared_analysis' not in seen[1]
+    jobs.shutdown(wait=True)
+
+
+def test_full_queue_delays_items_instead_of_failing_them(jobs, monkeypatch):
+    submit = jobs.submit
+    refusals = []
+
+    def flaky_submit(user_input, on_event=None):
+        # The queue is full of other builds for the first two attempts
+        if len(refusals) < 2:
+            refusals.append(user_input['use_case'])
+            raise QueueFullError("Build queue is full")
+        return submit(user_input, on_event)
+    monkeypatch.setattr(jobs, 'submit', flaky_submit)
+    monkeypatch.setattr('batch.QUEUE_RETRY_DELAY', 0.01)
+    requests = [{'agent_type': 'chatbot', 'use_case': f'Assistant number {i}', 'desired_model': 'gemini-1.5-flash',
+                 'personality': 'calm', 'target_framework': 'react', 'additional_requirements': '',
+                 'similar': 'off'} for i in range(2)]
+
+    items = list(run_batch(requests, jobs, max_parallel=2))
+
+    assert len(refusals) == 2
+    assert sorted(item['index'] for item in items) == [0, 1]
+    assert all(item['success'] for item in items)
@@ -0,0 +1,57 @@
+"""
+Offline benchmark harness (benchmark.py).
+
+Run from this directory with `python -m pytest test_benchmark.py`. The
+crews run on benchmark.StubLLM, so no API key is needed.
+"""
+import json
+import os
+
+os.environ.setdefault('GOOGLE_API_KEY', 'unused')
+
+import benchmark
+import main
+from benchmark import StubLLM, percentile, summarize
+from crew import PlanarianCrew
+from task_outputs import RequirementsAnalysis
+
+
+def test_percentiles_interpolate():
+    values = [4.0, 1.0, 3.0, 2.0]
+
+    assert percentile(values, 50) == 2.5
+    assert percentile(values, 100) == 4.0
+    assert summarize(values)['p95'] == 3.85
+    assert summarize([])['p50'] is None
+
+
+def test_stub_answers_are_deterministic_and_typed():
+    llm = StubLLM(latency=0, completion_tokens=3)
+
+    assert llm.call('same prompt') == llm.call('same prompt')
+    assert llm.call('same prompt') != llm.call('another prompt')
+    assert llm.stats()['calls'] == 4
+    assert len(llm.call('x').split('Final Answer: ')[1].strip('`\n').split()) == 3
+
+
+def test_stub_answers_match_the_task_schema():
+    llm = StubLLM(latency=0, completion_tokens=2)
+    task = PlanarianCrew(llm=llm).crew().tasks[0]
+    answer = llm.call('prompt', from_task=task)
+
+    RequirementsAnalysis.model_validate_json(answer.split('Final Answer: ', 1)[1])
+
+
+def test_report_covers_every_timed_build(tmp_path, monkeypatch):
+    monkeypatch.setattr(main, '_crew_factory', None)
+    output = tmp_path / 'bench.json'
+
+    report = benchmark.main(['--target', 'build_agent', '--requests', '3', '--concurrency', '2',
+                             '--warmup', '0', '--latency', '0', '--completion-tokens', '5',
+                             '--output', str(output)])
+
+    result = report['results']['build_agent']
+    assert result['errors'] == 0
+    assert result['latency']['count'] == 3
+    assert result['llm']['calls'] >= 3 * 5
+    assert json.loads(output.read_text())['results']['build_agent']['latency']['count'] == 3
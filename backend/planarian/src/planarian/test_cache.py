@@ -0,0 +1,107 @@
+"""
+Build result cache and config fingerprint (cache.py).
+
+Run from this directory with `python -m pytest test_cache.py`.
+"""
+import os
+
+import pytest
+
+import cache
+from cache import LRUCache, ResultCache, SQLiteCache, request_key
+
+REQUEST = {
+    'agent_type': 'chatbot',
+    'use_case': 'Customer support assistant for a SaaS product',
+    'desired_model': 'gemini-1.5-flash',
+    'personality': 'helpful and professional',
+    'target_framework': 'react'
+}
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache.time, 'time', clock)
+    return clock
+
+
+def test_sqlite_entries_expire(tmp_path, clock):
+    store = SQLiteCache(tmp_path / 'cache.sqlite', ttl=60)
+    store.set('old', {'n': 1})
+    clock.now += 30
+    store.set('new', {'n': 2})
+
+    clock.now += 45
+    assert store.get('old') is None
+    assert store.get('new') == {'n': 2}
+    assert len(store) == 1
+
+
+def test_sqlite_evicts_least_recently_used_past_its_size_budget(tmp_path, clock):
+    value = {'text': 'x' * 100}
+    store = SQLiteCache(tmp_path / 'cache.sqlite', max_bytes=250)
+    for key in ('a', 'b'):
+        store.set(key, value)
+        clock.now += 1
+    store.get('a')
+    clock.now += 1
+
+    store.set('c', value)
+
+    assert store.get('b') is None
+    assert store.get('a') == value and store.get('c') == value
+
+
+def test_memory_tier_evicts_least_recently_used():
+    memory = LRUCache(max_entries=2)
+    memory.set('a', 1)
+    memory.set('b', 2)
+    memory.get('a')
+    memory.set('c', 3)
+
+    assert memory.get('b') is None
+    assert (memory.get('a'), memory.get('c')) == (1, 3)
+
+
+def test_disk_hits_are_promoted_to_memory(tmp_path):
+    disk = SQLiteCache(tmp_path / 'cache.sqlite')
+    disk.set('key', {'output': 'built'})
+    results = ResultCache(LRUCache(), disk)
+
+    assert results.get('key') == {'output': 'built'}
+    assert results.memory.get('key') == {'output': 'built'}
+    assert results.get('missing') is None
+    assert results.stats()['hits'] == 1 and results.stats()['misses'] == 1
+
+
+def test_equivalent_requests_share_a_key():
+    reworded = dict(REQUEST, agent_type='Chatbot', use_case='Customer support  assistant for a SaaS product')
+
+    assert request_key(reworded) == request_key(REQUEST)
+    assert request_key(dict(REQUEST, personality='terse')) != request_key(REQUEST)
+
+
+def test_key_changes_when_the_config_is_edited(tmp_path, monkeypatch):
+    package = tmp_path / 'src' / 'planarian'
+    (package / 'config').mkdir(parents=True)
+    (package / 'tools').mkdir()
+    tasks = package / 'config' / 'tasks.yaml'
+    tasks.write_text('analyze_requirements: {}\n')
+    monkeypatch.setattr(cache, 'PACKAGE_DIR', package)
+    monkeypatch.setattr(cache, 'FINGERPRINT_CHECK_INTERVAL', 0)
+    monkeypatch.setattr(cache, '_fingerprint', None)
+    before = request_key(REQUEST)
+
+    tasks.write_text('analyze_requirements: {description: edited}\n')
+    os.utime(tasks, ns=(tasks.stat().st_atime_ns, tasks.stat().st_mtime_ns + 10 ** 9))
+
+    assert request_key(REQUEST) != before
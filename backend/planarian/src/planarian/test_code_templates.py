@@ -0,0 +1,83 @@
+"""
+Generated project bundles (tools/code_templates.py) and fast builds.
+
+Run from this directory with `python -m pytest test_code_templates.py`. The
+crews run on benchmark.StubLLM, so no API key is needed.
+"""
+import os
+
+import pytest
+
+os.environ.setdefault('GOOGLE_API_KEY', 'unused')
+
+import main
+from benchmark import SAMPLE_REQUEST, StubLLM
+from factory import CrewFactory
+from tools import code_templates
+from tools.code_templates import BUNDLES, render_bundle
+
+CONFIG = {'name': 'Support Bot', 'model': 'gemini-1.5-flash', 'temperature': 0.3, 'max_tokens': 512}
+PROMPT = 'You are a helpful support assistant.'
+
+
+@pytest.mark.parametrize('framework', sorted(BUNDLES))
+def test_bundles_carry_the_config_and_prompt(framework):
+    bundle = render_bundle(framework, CONFIG, PROMPT)
+
+    assert set(bundle) == set(BUNDLES[framework]) | {'framework'}
+    assert PROMPT in bundle['main_file']
+    assert 'gemini-1.5-flash' in bundle['main_file']
+
+
+def test_unsupported_frameworks_are_rejected():
+    with pytest.raises(ValueError):
+        render_bundle('cobol', CONFIG, PROMPT)
+
+
+def test_fast_builds_render_code_without_the_llm(monkeypatch):
+    monkeypatch.setattr(main, '_crew_factory', CrewFactory(pool_size=1, llm=StubLLM(latency=0, completion_tokens=5)))
+
+    payload = main.build_payload(dict(SAMPLE_REQUEST, fast=True, use_cache=False))
+
+    assert 'generate_code' in payload['timings']['overridden']
+    files = payload['outputs']['generate_code']['files']
+    assert set(files) == {filename for _, filename in BUNDLES['react'].values()}
+    assert payload['bundle']['system_prompt'] in files['Agent.jsx']
+
+
+@pytest.fixture
+def template_dir(tmp_path, monkeypatch):
+    environment = code_templates._environment.overlay(loader=code_templates.jinja2.FileSystemLoader(str(tmp_path)))
+    monkeypatch.setattr(code_templates, '_environment', environment)
+    monkeypatch.setattr(code_templates, '_compiled', {})
+    monkeypatch.setattr(code_templates, 'TEMPLATE_DIR', tmp_path)
+    monkeypatch.setattr(code_templates, 'RELOAD_INTERVAL', 0)
+    return tmp_path
+
+
+def edit(path, text):
+    """Rewrite a template with a newer mtime, even on coarse-grained filesystems"""
+    mtime = path.stat().st_mtime_ns if path.exists() else 0
+    path.write_text(text)
+    os.utime(path, ns=(mtime + 10 ** 9, mtime + 10 ** 9))
+
+
+def test_templates_are_compiled_once_and_reloaded_when_edited(template_dir):
+    path = template_dir / 'greeting.txt'
+    edit(path, 'Hello {{ name }}')
+    template = code_templates.get_template('greeting.txt')
+
+    assert code_templates.get_template('greeting.txt') is template
+    edit(path, 'Goodbye {{ name }}')
+    assert code_templates.get_template('greeting.txt').render(name='Ada') == 'Goodbye Ada'
+
+
+def test_template_info_reports_the_version_header(template_dir):
+    edit(template_dir / 'greeting.txt', '{# version: 2.1 #}\nHello')
+
+    info = code_templates.template_info('greeting.txt')
+
+    assert info['version'] == '2.1'
+    assert not info['compiled']
+    code_templates.get_template('greeting.txt')
+    assert code_templates.template_info('greeting.txt')['compiled']
@@ -0,0 +1,78 @@
+"""
+Context budgets between crew tasks (context_budget.py).
+
+Run from this directory with `python -m pytest test_context_budget.py`.
+"""
+from types import SimpleNamespace
+
+from context_budget import ContextBudget, extract_sections, outline, truncate
+from task_outputs import AgentSettings, RequirementsAnalysis
+from tokens import count_tokens
+
+ANALYSIS = """Intro.
+## Model
+Use gemini-1.5-flash.
+## Security
+Never log keys.
+"""
+CODE = "Files:\n```python\nprint('a')\nprint('b')\n```\nDone."
+
+
+def output(name, raw, pydantic=None):
+    return SimpleNamespace(name=name, raw=raw, pydantic=pydantic)
+
+
+def test_sections_are_picked_by_heading():
+    assert extract_sections(ANALYSIS, ['model']) == "## Model\nUse gemini-1.5-flash."
+    # No match keeps everything
+    assert extract_sections(ANALYSIS, ['pricing']) == ANALYSIS
+
+
+def test_outline_drops_code():
+    assert outline(CODE) == "Files:\n[2 lines of code omitted]\nDone."
+
+
+def test_truncation_fits_the_budget_and_closes_code_blocks():
+    text = "```\n" + "line of code\n" * 200 + "```"
+
+    cut = truncate(text, 50)
+
+    assert count_tokens(cut.rsplit('\n', 1)[0]) <= 51
+    assert cut.count('```') == 2
+    assert 'tokens truncated' in cut
+
+
+def test_typed_outputs_pass_only_the_chosen_fields():
+    analysis = RequirementsAnalysis(
+        recommended_model='gemini-1.5-flash', model_rationale='fast',
+        config=AgentSettings(name='Bot', type='chatbot', model='gemini-1.5-flash', personality='calm'),
+        technical_requirements=['x' * 500]
+    )
+    budget = ContextBudget({}, {'create_documentation': {'analyze_requirements': ['config']}})
+
+    context, report = budget.apply('create_documentation', [output('analyze_requirements',
+                                                                   analysis.model_dump_json(), analysis)])
+
+    assert context.startswith('{"config":')
+    assert 'x' * 500 not in context
+    assert report['tokens_saved'] > 0
+
+
+def test_small_outputs_stay_whole_within_the_budget():
+    small = output('analyze_requirements', 'short analysis')
+    large = output('generate_code', 'code line\n' * 500)
+    budget = ContextBudget({'validate_configuration': 100}, {})
+
+    context, report = budget.apply('validate_configuration', [small, large])
+
+    assert context.startswith('short analysis')
+    assert report['tokens_after'] <= 100 + 20
+    assert report['budget'] == 100
+
+
+def test_budgets_are_opt_in(monkeypatch):
+    monkeypatch.delenv('PLANARIA_CONTEXT_BUDGETS', raising=False)
+    assert ContextBudget.from_env() is None
+
+    monkeypatch.setenv('PLANARIA_CONTEXT_BUDGETS', 'true')
+    assert ContextBudget.from_env().sections['create_documentation']['generate_code'] == 'outline'
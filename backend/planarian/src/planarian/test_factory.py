@@ -0,0 +1,53 @@
+"""
+Pooled crews (factory.py).
+
+Run from this directory with `python -m pytest test_factory.py`. The crews
+run on benchmark.StubLLM, so no API key is needed.
+"""
+import os
+import threading
+
+os.environ.setdefault('GOOGLE_API_KEY', 'unused')
+
+from benchmark import SAMPLE_REQUEST, StubLLM
+from factory import CrewFactory
+from scheduler import run_dag
+
+
+def test_consecutive_builds_do_not_share_outputs():
+    factory = CrewFactory(pool_size=1, llm=StubLLM(latency=0, completion_tokens=5))
+    with factory.lease() as crew:
+        first = run_dag(crew, SAMPLE_REQUEST)
+        crew._cache_handler.add('Prompt Optimizer', 'input', 'cached answer')
+
+    with factory.lease() as again:
+        assert again is crew
+        assert all(task.output is None for task in again.tasks)
+        assert all(agent.tools_results == [] for agent in again.agents)
+        assert again._cache_handler.read('Prompt Optimizer', 'input') is None
+        second = run_dag(again, dict(SAMPLE_REQUEST, use_case='Recipe recommendation bot for home cooks'))
+
+    first_outputs = {output.name: output.raw for output in first.tasks_output}
+    second_outputs = {output.name: output.raw for output in second.tasks_output}
+    assert all(first_outputs[name] != second_outputs[name] for name in first_outputs)
+    assert factory.stats()['crews_built'] == 1
+
+
+def test_concurrent_leases_get_different_crews():
+    factory = CrewFactory(pool_size=2, llm=StubLLM(latency=0, completion_tokens=5))
+    leased = []
+    both_leased = threading.Barrier(2, timeout=5)
+
+    def build():
+        with factory.lease() as crew:
+            leased.append(crew)
+            both_leased.wait()
+
+    threads = [threading.Thread(target=build) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+
+    assert leased[0] is not leased[1]
+    assert factory.stats()['crews_idle'] == 2
@@ -0,0 +1,55 @@
+"""
+System prompts of fast builds (fast_path.py, tools/prompt_library.py).
+
+Run from this directory with `python -m pytest test_fast_path.py`. No LLM is
+called, so no API key is needed.
+"""
+import pytest
+
+import fast_path
+from tools.prompt_library import PromptLibrary
+
+REQUEST = {
+    'agent_type': 'chatbot',
+    'use_case': 'Customer support assistant for a SaaS product',
+    'desired_model': 'gemini-1.5-flash',
+    'personality': 'helpful and professional',
+    'target_framework': 'react',
+    'additional_requirements': 'Handle billing, features, and troubleshooting questions'
+}
+
+
+@pytest.fixture(autouse=True)
+def library(monkeypatch):
+    library = PromptLibrary.from_file()
+    monkeypatch.setattr(fast_path, 'LIBRARY', library)
+    return library
+
+
+def test_skeleton_prompt_lists_the_additional_requirements():
+    answer = fast_path.create_system_prompt(REQUEST, {})
+
+    assert answer is not None
+    prompt, artifacts = answer
+    assert REQUEST['additional_requirements'] in prompt.system_prompt
+    assert artifacts['system_prompt_source'].startswith('skeleton:')
+
+
+def test_remembered_prompts_are_keyed_on_the_additional_requirements(library):
+    written = ("You are a helpful and professional support assistant for a SaaS product. "
+               "Handle customer billing, features and troubleshooting questions.")
+    library.remember(*fast_path.prompt_request(REQUEST), written)
+
+    prompt, artifacts = fast_path.create_system_prompt(REQUEST, {})
+    other = fast_path.create_system_prompt(dict(REQUEST, additional_requirements='Answer in Spanish'), {})
+
+    assert prompt.system_prompt == written
+    assert artifacts['system_prompt_source'] == 'cache'
+    assert 'Spanish' in other[0].system_prompt
+
+
+def test_prompts_that_leave_out_the_request_are_declined(library):
+    library.remember(*fast_path.prompt_request(REQUEST), "You are a helpful and professional assistant.")
+
+    assert fast_path.uncovered_words(REQUEST, "You are a helpful and professional assistant.")
+    assert fast_path.create_system_prompt(REQUEST, {}) is None
@@ -0,0 +1,63 @@
+"""
+Background job queue (jobs.py).
+
+Run from this directory with `python -m pytest test_jobs.py`.
+"""
+import threading
+
+import pytest
+
+from jobs import FAILED, QUEUED, SUCCEEDED, JobQueue, QueueFullError, SQLiteJobStore
+
+
+def blocking_worker(release):
+    def worker(payload, on_event=None):
+        release.wait(5)
+        return {'echo': payload}
+    return worker
+
+
+def test_jobs_run_and_report_results():
+    queue = JobQueue(lambda payload, on_event=None: {'echo': payload}, max_workers=2)
+    job = queue.submit('hello')
+    job.future.result(5)
+
+    assert queue.get(job.id).status == SUCCEEDED
+    assert queue.get(job.id).result == {'echo': 'hello'}
+    queue.shutdown(wait=True)
+
+
+def test_full_queue_rejects_jobs():
+    release = threading.Event()
+    queue = JobQueue(blocking_worker(release), max_workers=1, max_queued=1)
+    queue.submit(1)
+    queue.submit(2)
+
+    with pytest.raises(QueueFullError):
+        queue.submit(3)
+    release.set()
+    queue.shutdown(wait=True)
+
+
+def test_shutdown_fails_jobs_that_never_started(tmp_path):
+    release = threading.Event()
+    store = SQLiteJobStore(tmp_path / 'jobs.sqlite')
+    queue = JobQueue(blocking_worker(release), max_workers=1, max_queued=2, store=store)
+    running = queue.submit('running')
+    waiting = [queue.submit('waiting'), queue.submit('waiting')]
+    events = []
+    waiting[0].on_event = events.append
+    assert store.load(waiting[0].id).status == QUEUED
+
+    queue.shutdown()
+    release.set()
+    running.future.result(5)
+
+    for job in waiting:
+        assert job.status == FAILED
+        assert store.load(job.id).status == FAILED
+    assert events == [{'event': 'build_failed', 'error': waiting[0].error}]
+    assert store.load(running.id).status == SUCCEEDED
+    # Every slot is free again
+    for _ in range(3):
+        assert queue._slots.acquire(blocking=False)
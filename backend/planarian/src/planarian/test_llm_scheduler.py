@@ -0,0 +1,117 @@
+"""
+Retries and coalescing of LLM calls (llm_scheduler.py).
+
+Run from this directory with `python -m pytest test_llm_scheduler.py`.
+"""
+import threading
+
+import pytest
+
+from llm_scheduler import LLMScheduler, is_retryable
+
+
+class RateLimitError(Exception):
+    """Named like LiteLLM's and OpenAI's rate limit errors"""
+
+
+class APIError(Exception):
+    def __init__(self, message, status_code):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def flaky(error, failures):
+    calls = []
+
+    def call():
+        calls.append(1)
+        if len(calls) <= failures:
+            raise error
+        return 'answer'
+    call.calls = calls
+    return call
+
+
+@pytest.mark.parametrize('error, retryable', [
+    (RateLimitError('slow down'), True),
+    (APIError('overloaded', 503), True),
+    (APIError('bad request', 400), False),
+    # Status-like numbers in the message are not a status
+    (ValueError('prompt has 429 words'), False),
+    (KeyError('503'), False)
+])
+def test_retryable_errors(error, retryable):
+    assert is_retryable(error) == retryable
+
+
+def test_retryable_cause_is_retried():
+    try:
+        try:
+            raise APIError('too many requests', 429)
+        except APIError as e:
+            raise RuntimeError('LLM call failed') from e
+    except RuntimeError as e:
+        assert is_retryable(e)
+
+
+def test_transient_failures_are_retried():
+    scheduler = LLMScheduler(backoff=0.001)
+    call = flaky(APIError('rate limited', 429), failures=2)
+
+    assert scheduler.call('stub', call) == 'answer'
+    assert len(call.calls) == 3
+    assert scheduler.stats()['retries'] == 2
+
+
+def test_permanent_failures_are_not_retried():
+    scheduler = LLMScheduler(backoff=0.001)
+    call = flaky(ValueError('429 is not a valid temperature'), failures=1)
+
+    with pytest.raises(ValueError):
+        scheduler.call('stub', call)
+    assert len(call.calls) == 1
+    assert scheduler.stats()['failures'] == 1
+
+
+def test_identical_inflight_calls_share_one_upstream_call():
+    scheduler = LLMScheduler()
+    started = threading.Event()
+    release = threading.Event()
+    upstream = []
+
+    def call():
+        upstream.append(1)
+        started.set()
+        release.wait(5)
+        return 'answer'
+    results = []
+    first = threading.Thread(target=lambda: results.append(scheduler.call('stub', call, key='prompt')))
+    first.start()
+    started.wait(5)
+    followers = [threading.Thread(target=lambda: results.append(scheduler.call('stub', call, key='prompt')))
+                 for _ in range(3)]
+    for thread in followers:
+        thread.start()
+    while scheduler.stats()['coalesced'] < 3:
+        release.wait(0.01)
+    release.set()
+    for thread in [first] + followers:
+        thread.join(5)
+
+    assert results == ['answer'] * 4
+    assert len(upstream) == 1
+    assert scheduler.stats()['calls'] == 4
+
+
+def test_counters_are_exact_under_concurrency():
+    scheduler = LLMScheduler(backoff=0)
+    threads = [threading.Thread(target=lambda: scheduler.call('stub', flaky(RateLimitError('slow down'), 1)))
+               for _ in range(16)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+
+    stats = scheduler.stats()
+    assert stats['calls'] == 16
+    assert stats['retries'] == 16
@@ -0,0 +1,55 @@
+"""
+Queued logging (logs.py).
+
+Run from this directory with `python -m pytest test_logs.py`.
+"""
+import logging
+import subprocess
+import sys
+
+import logs
+
+
+def test_level_specs_are_parsed():
+    assert logs.parse_levels("planaria.trace=debug, LiteLLM=WARNING,,bad") == {
+        'planaria.trace': 'DEBUG', 'LiteLLM': 'WARNING'
+    }
+
+
+def test_records_reach_the_log_file_through_the_queue(tmp_path):
+    path = tmp_path / 'planaria.log'
+    script = ("import logging, logs; logs.configure(); logs.configure();"
+              "logging.getLogger('planaria.jobs').debug('hidden');"
+              "logging.getLogger('planaria.build').info('built'); logs.flush()")
+    env = {'PLANARIA_LOG_FILE': str(path), 'PLANARIA_LOG_LEVELS': 'planaria.jobs=WARNING',
+           'PLANARIA_LOG_LEVEL': 'DEBUG', 'PYTHONPATH': '.'}
+
+    subprocess.run([sys.executable, '-c', script], env=env, check=True)
+
+    lines = path.read_text().splitlines()
+    assert len(lines) == 1
+    assert 'INFO planaria.build' in lines[0] and lines[0].endswith('built')
+
+
+def test_sampled_builds_trace_their_events(monkeypatch):
+    records = []
+    handler = logging.Handler()
+    handler.emit = records.append
+    trace = logging.getLogger('planaria.trace')
+    monkeypatch.setattr(trace, 'handlers', [handler])
+    monkeypatch.setattr(trace, 'level', logging.INFO)
+    forwarded = []
+    listener = logs.trace_listener('b1', forwarded.append)
+
+    listener({'event': 'task_started', 'task': 'generate_code'})
+    listener({'event': 'token', 'task': 'generate_code', 'text': 'x'})
+
+    assert len(forwarded) == 2
+    assert [record.getMessage() for record in records] == ['b1 task_started generate_code {}']
+
+
+def test_trace_sampling_rate(monkeypatch):
+    monkeypatch.setenv('PLANARIA_VERBOSE_SAMPLE_RATE', '0')
+    assert not logs.sample_trace()
+    monkeypatch.setenv('PLANARIA_VERBOSE_SAMPLE_RATE', '1')
+    assert logs.sample_trace()
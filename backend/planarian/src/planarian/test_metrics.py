@@ -0,0 +1,55 @@
+"""
+Build metrics (metrics.py).
+
+Run from this directory with `python -m pytest test_metrics.py`. The crews
+run on benchmark.StubLLM, so no API key is needed.
+"""
+import os
+
+os.environ.setdefault('GOOGLE_API_KEY', 'unused')
+
+import metrics
+from benchmark import SAMPLE_REQUEST, StubLLM
+from crew import PlanarianCrew
+from metrics import Counter, Histogram
+
+
+def lines_of(metric):
+    return [f'{name}{metrics._labels_text(labels)} {metrics._number(value)}'
+            for name, labels, value in metric.samples()]
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram('h_seconds', 'Test', ['task'], buckets=(0.1, 1))
+    for value in (0.05, 0.5, 5):
+        histogram.observe(value, task='a')
+
+    assert lines_of(histogram) == [
+        'h_seconds_bucket{task="a",le="0.1"} 1',
+        'h_seconds_bucket{task="a",le="1"} 2',
+        'h_seconds_bucket{task="a",le="+Inf"} 3',
+        'h_seconds_sum{task="a"} 5.55',
+        'h_seconds_count{task="a"} 3'
+    ]
+
+
+def test_label_values_are_escaped():
+    counter = Counter('c_total', 'Test', ['tool'])
+    counter.inc(tool='say "hi"\n')
+    counter.inc(2, tool='say "hi"\n')
+
+    assert lines_of(counter) == ['c_total{tool="say \\"hi\\"\\n"} 3']
+
+
+def test_builds_get_a_per_task_breakdown():
+    metrics.subscribe()
+    crew = PlanarianCrew(llm=StubLLM(latency=0, completion_tokens=5)).crew()
+
+    with metrics.record(crew) as breakdown:
+        crew.kickoff(inputs=SAMPLE_REQUEST)
+    report = breakdown.report()
+
+    assert set(report['tasks']) == {task.name for task in crew.tasks}
+    assert report['totals']['llm_calls'] >= len(crew.tasks)
+    assert all(task['prompt_tokens'] > 0 for task in report['tasks'].values())
+    assert 'planaria_task_seconds_count{task="analyze_requirements"}' in metrics.render()
@@ -0,0 +1,87 @@
+"""
+Pre-forking server (prefork.py).
+
+Run from this directory with `python -m pytest test_prefork.py`. Linux only:
+worker processes are found through /proc.
+"""
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+from pathlib import Path
+
+import pytest
+
+SERVER = '''
+import os, sys
+import prefork
+
+async def app(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+    await send({'type': 'http.response.start', 'status': 200, 'headers': []})
+    await send({'type': 'http.response.body', 'body': str(os.getpid()).encode()})
+
+prefork.serve(app, host='127.0.0.1', port=int(sys.argv[1]), workers=2)
+'''
+
+pytestmark = pytest.mark.skipif(not Path(f'/proc/{os.getpid()}/task/{os.getpid()}/children').exists(),
+                                reason="needs /proc/<pid>/task/<pid>/children")
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def workers_of(pid):
+    return set(map(int, Path(f'/proc/{pid}/task/{pid}/children').read_text().split()))
+
+
+def wait_for(condition, timeout=20):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        result = condition()
+        if result:
+            return result
+        time.sleep(0.1)
+    raise AssertionError("timed out")
+
+
+def test_workers_that_exit_are_replaced(tmp_path):
+    port = free_port()
+    script = tmp_path / 'server.py'
+    script.write_text(SERVER)
+    server = subprocess.Popen([sys.executable, str(script), str(port)],
+                              env=dict(os.environ, PYTHONPATH=os.getcwd()))
+    try:
+        workers = wait_for(lambda: len(workers_of(server.pid)) == 2 and workers_of(server.pid))
+        served = int(wait_for(lambda: _get(port)))
+        assert served in workers
+
+        os.kill(served, signal.SIGKILL)
+
+        replaced = wait_for(lambda: len(workers_of(server.pid) - {served}) == 2 and workers_of(server.pid))
+        assert served not in replaced and len(replaced & workers) == 1
+        assert int(wait_for(lambda: _get(port))) in replaced
+    finally:
+        server.send_signal(signal.SIGTERM)
+        assert server.wait(20) == 0
+
+
+def _get(port):
+    try:
+        with urllib.request.urlopen(f'http://127.0.0.1:{port}/', timeout=2) as response:
+            return response.read().decode()
+    except OSError:
+        return None
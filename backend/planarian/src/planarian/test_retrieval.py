@@ -0,0 +1,78 @@
+"""
+Knowledge retrieval (retrieval.py).
+
+Run from this directory with `python -m pytest test_retrieval.py`. No LLM is
+called, so no API key is needed.
+"""
+from types import SimpleNamespace
+
+import pytest
+
+from retrieval import KnowledgeIndex, TaskKnowledge
+
+
+@pytest.fixture
+def knowledge(tmp_path):
+    root = tmp_path / 'knowledge'
+    root.mkdir()
+    (root / 'billing.md').write_text("Refunds are issued within five days.\n\nInvoices go out monthly.\n")
+    (root / 'react.md').write_text("Use hooks for component state in React.\n")
+    return root
+
+
+@pytest.fixture
+def index(knowledge, tmp_path):
+    return KnowledgeIndex(root=knowledge, index_dir=tmp_path / 'index', chunk_tokens=10, reload_interval=0)
+
+
+def test_search_ranks_matching_chunks_first(index):
+    results = index.search('when are refunds issued', k=2)
+
+    assert [(result['source'], result['line']) for result in results] == [('billing.md', 1)]
+    assert results[0]['text'] == "Refunds are issued within five days."
+    assert index.search('react component hooks', k=1)[0]['source'] == 'react.md'
+    assert index.search('kubernetes', k=3) == []
+
+
+def test_edited_files_are_reindexed_alone(index, knowledge, monkeypatch):
+    index.search('refunds')
+    assert (index.stats()['files'], index.stats()['chunks'], index.stats()['rebuilds']) == (2, 3, 1)
+
+    index.search('refunds')
+    assert index.stats()['rebuilds'] == 1
+
+    read = []
+    original = type(knowledge).read_text
+    monkeypatch.setattr(type(knowledge), 'read_text',
+                        lambda path, *args, **kwargs: read.append(path.name) or original(path, *args, **kwargs))
+    (knowledge / 'react.md').write_text("Use hooks for component state in React.\n\nMemoize with useMemo.\n")
+
+    assert index.search('usememo')[0]['line'] == 3
+    assert [name for name in read if name.endswith('.md')] == ['react.md']
+    assert index.stats()['rebuilds'] == 2
+    assert index.search('refunds')[0]['source'] == 'billing.md'
+
+
+def test_saved_index_is_reused_by_other_processes(index, knowledge, tmp_path):
+    index.search('refunds')
+
+    other = KnowledgeIndex(root=knowledge, index_dir=tmp_path / 'index', chunk_tokens=10, reload_interval=0)
+
+    assert other.search('invoices')[0]['line'] == 3
+    assert other.stats()['rebuilds'] == 0
+
+
+def test_tasks_get_the_chunks_of_their_agent(index):
+    knowledge = TaskKnowledge(index, {'generate_code': 1})
+
+    chunks = knowledge.retrieve(SimpleNamespace(name='generate_code', description='React hooks'))
+
+    assert [chunk['source'] for chunk in chunks] == ['react.md']
+    assert knowledge.retrieve(SimpleNamespace(name='analyze_requirements', description='React')) == []
+    assert TaskKnowledge.format(chunks).endswith("[react.md:1]\nUse hooks for component state in React.")
+
+
+def test_retrieval_is_opt_in(monkeypatch):
+    monkeypatch.delenv('PLANARIA_KNOWLEDGE', raising=False)
+
+    assert TaskKnowledge.from_env() is None
@@ -0,0 +1,52 @@
+"""
+Per-agent model routing (router.py).
+
+Run from this directory with `python -m pytest test_router.py`. The crews
+run on benchmark.StubLLM, so no API key is needed.
+"""
+import os
+
+import pytest
+
+os.environ.setdefault('GOOGLE_API_KEY', 'unused')
+
+from benchmark import StubLLM
+from crew import DEFAULT_MODEL, PlanarianCrew
+from router import REQUESTED, STANDARD, ModelRouter
+
+
+class NamedStubLLM(StubLLM):
+    def __init__(self, model):
+        super().__init__(latency=0, completion_tokens=5)
+        self.model = model
+
+
+@pytest.fixture
+def crew():
+    return PlanarianCrew(llm=StubLLM(latency=0, completion_tokens=5)).crew()
+
+
+def models_of(crew):
+    return {task.name: task.agent.llm.model for task in crew.tasks}
+
+
+def test_desired_model_does_not_pick_the_crew_models_by_default(crew):
+    router = ModelRouter.from_config(NamedStubLLM, DEFAULT_MODEL)
+
+    routing = router.route(crew, {'desired_model': 'gemini-1.5-pro'})
+
+    assert routing['tier'] == STANDARD
+    assert routing['models'] == {name: route[STANDARD] for name, route in router.routes.items()}
+    assert models_of(crew) == routing['models']
+
+
+def test_desired_model_overrides_the_routes_when_honoured(crew, monkeypatch):
+    monkeypatch.setenv('PLANARIA_HONOUR_DESIRED_MODEL', 'true')
+    router = ModelRouter.from_env(NamedStubLLM, DEFAULT_MODEL)
+
+    routing = router.route(crew, {'desired_model': 'gemini-1.5-pro'})
+
+    assert routing['tier'] == REQUESTED
+    assert set(models_of(crew).values()) == {'gemini-1.5-pro'}
+    # Without one, the routes still apply
+    assert router.route(crew, {})['tier'] == STANDARD
@@ -0,0 +1,86 @@
+"""
+Dependency-graph execution of the crew (scheduler.py).
+
+Run from this directory with `python -m pytest test_scheduler.py`. The crews
+run on benchmark.StubLLM, so no API key is needed.
+"""
+import os
+from types import SimpleNamespace
+
+import pytest
+
+os.environ.setdefault('GOOGLE_API_KEY', 'unused')
+
+import scheduler
+from benchmark import SAMPLE_REQUEST, StubLLM
+from cache import LRUCache, ResultCache
+from crew import PlanarianCrew
+from scheduler import TaskGraph, overlap_contexts, run_dag, task_memo_key
+
+
+@pytest.fixture
+def crew():
+    return PlanarianCrew(llm=StubLLM(latency=0, completion_tokens=5)).crew()
+
+
+def test_documentation_follows_validation_by_default(crew, monkeypatch):
+    monkeypatch.delenv('PLANARIA_DAG_OVERLAP', raising=False)
+    graph = TaskGraph.from_crew(crew, overlap_contexts())
+
+    assert 'validate_configuration' in graph.dependencies['create_documentation']
+    result = run_dag(crew, SAMPLE_REQUEST)
+    spans = result.timings['tasks']
+    assert spans['create_documentation']['start'] >= spans['validate_configuration']['end']
+
+
+def test_overlap_is_opt_in(crew, monkeypatch):
+    monkeypatch.setenv('PLANARIA_DAG_OVERLAP', 'true')
+    graph = TaskGraph.from_crew(crew, overlap_contexts())
+
+    assert 'validate_configuration' not in graph.dependencies['create_documentation']
+    done = {'analyze_requirements', 'create_system_prompt', 'generate_code'}
+    assert sorted(graph.ready(done, done)) == ['create_documentation', 'validate_configuration']
+
+
+def test_critical_path_follows_the_slowest_chain():
+    graph = TaskGraph({'a': None, 'b': None, 'c': None, 'd': None},
+                      {'a': [], 'b': ['a'], 'c': ['a'], 'd': ['b', 'c']})
+
+    latency, path = graph.critical_path({'a': 1.0, 'b': 5.0, 'c': 2.0, 'd': 1.0})
+
+    assert latency == 7.0
+    assert path == ['a', 'b', 'd']
+
+
+def memo_key(inputs, upstream=(), model='gemini-2.5-flash'):
+    task = SimpleNamespace(name='generate_code', agent=SimpleNamespace(llm=SimpleNamespace(model=model)))
+    upstream = [SimpleNamespace(raw=raw) for raw in upstream]
+    return task_memo_key(task, "Generate code for a {agent_type} in {target_framework}", inputs, upstream)
+
+
+def test_memo_key_covers_only_what_the_task_reads(monkeypatch):
+    inputs = {'agent_type': 'chatbot', 'target_framework': 'react', 'personality': 'calm'}
+    key = memo_key(inputs, ['analysis'])
+
+    assert memo_key(dict(inputs, personality='cheerful'), ['analysis']) == key
+    assert memo_key(dict(inputs, target_framework='python'), ['analysis']) != key
+    assert memo_key(inputs, ['another analysis']) != key
+    assert memo_key(inputs, ['analysis'], model='gemini-2.5-flash-lite') != key
+    monkeypatch.setattr(scheduler, 'config_fingerprint', lambda: 'edited')
+    assert memo_key(inputs, ['analysis']) != key
+
+
+def test_unchanged_tasks_are_memoized(crew):
+    memo = ResultCache(LRUCache())
+    first = run_dag(crew, SAMPLE_REQUEST, memo=memo)
+    assert first.timings['memoized'] == []
+
+    again = run_dag(crew, SAMPLE_REQUEST, memo=memo)
+    edited = run_dag(crew, dict(SAMPLE_REQUEST, target_framework='python'), memo=memo)
+    refreshed = run_dag(crew, SAMPLE_REQUEST, memo=memo, refresh=True)
+
+    assert sorted(again.timings['memoized']) == sorted(task.name for task in crew.tasks)
+    # The analysis reads the framework, so every task downstream of it runs again
+    assert edited.timings['memoized'] == []
+    assert refreshed.timings['memoized'] == []
+    assert again.raw == first.raw
@@ -0,0 +1,103 @@
+"""
+Near-duplicate matching of build requests (similar.py).
+
+Run from this directory with `python -m pytest test_similar.py`. The crews
+run on benchmark.StubLLM, so no API key is needed.
+"""
+import os
+
+import pytest
+
+os.environ.setdefault('GOOGLE_API_KEY', 'unused')
+
+import main
+from benchmark import StubLLM
+from factory import CrewFactory
+from similar import OFF, SEEDED_TASKS, SimilarBuilds, reuse_mode
+
+BASE = {
+    'agent_type': 'chatbot',
+    'desired_model': 'gemini-1.5-flash',
+    'personality': 'helpful and professional',
+    'target_framework': 'react'
+}
+SUPPORT = dict(BASE, use_case='Customer support assistant for a SaaS product',
+               additional_requirements='Handle billing, features, and troubleshooting questions')
+
+# Earlier builds, so inverse document frequencies are not computed from one or two requests
+PAST_BUILDS = [
+    SUPPORT,
+    dict(BASE, use_case='Python coding helper for data science tasks',
+         additional_requirements='Expert in pandas, numpy, and matplotlib'),
+    dict(BASE, use_case='Recipe recommendation bot for home cooks',
+         additional_requirements='Suggest recipes from ingredients on hand'),
+    dict(BASE, use_case='Travel itinerary planner for business trips',
+         additional_requirements='Book flights and hotels within policy'),
+    dict(BASE, use_case='HR onboarding assistant for new employees',
+         additional_requirements='Explain benefits, payroll and first-week tasks'),
+    dict(BASE, use_case='Customer support assistant for an e-commerce store',
+         additional_requirements='Handle returns, shipping, and refunds'),
+    dict(BASE, use_case='Technical support assistant for a SaaS product',
+         additional_requirements='Troubleshoot integrations and API errors')
+]
+
+
+@pytest.fixture
+def index():
+    index = SimilarBuilds()
+    for request in PAST_BUILDS:
+        index.add(request, {task: {'use_case': request['use_case']} for task in SEEDED_TASKS})
+    return index
+
+
+@pytest.mark.parametrize('use_case, additional_requirements', [
+    ('SaaS customer support bot', 'Handle billing, features, and troubleshooting questions'),
+    ('Customer support chatbot for our SaaS product', 'Handles billing, feature and troubleshooting questions'),
+    ('Support assistant for customers of a SaaS product', 'Handle billing, features and troubleshooting questions')
+])
+def test_rewordings_match(index, use_case, additional_requirements):
+    request = dict(BASE, use_case=use_case, additional_requirements=additional_requirements)
+
+    matches = index.search(request)
+
+    assert [match['request']['use_case'] for match in matches] == [SUPPORT['use_case']]
+
+
+@pytest.mark.parametrize('change', [
+    {'use_case': 'Sales assistant for a SaaS product',
+     'additional_requirements': 'Answer pricing questions and book demos'},
+    {'use_case': 'Sales assistant for a SaaS product'},
+    {'use_case': 'Customer support assistant for a bank',
+     'additional_requirements': 'Handle card and loan questions'},
+    {'personality': 'sarcastic'},
+    {'personality': 'sarcastic', 'use_case': 'SaaS customer support bot'},
+    {'use_case': 'SaaS customer support bot', 'additional_requirements': 'Handle billing questions in Spanish'},
+])
+def test_distinct_requests_do_not_seed(index, change):
+    assert index.seed(dict(SUPPORT, **change)) is None
+
+
+def test_rewording_of_use_case_seeds(index):
+    match = index.seed(dict(SUPPORT, use_case='SaaS customer support bot'))
+
+    assert match['request']['use_case'] == SUPPORT['use_case']
+
+
+def test_reuse_is_off_by_default(monkeypatch):
+    monkeypatch.delenv('PLANARIA_SIMILAR_REUSE', raising=False)
+
+    assert reuse_mode(SUPPORT) == OFF
+
+
+def test_builds_only_seed_from_matching_personality(monkeypatch):
+    monkeypatch.setattr(main, '_crew_factory', CrewFactory(pool_size=1, llm=StubLLM(latency=0, completion_tokens=5)))
+    monkeypatch.setattr(main, 'similar_builds', SimilarBuilds())
+    assert main.build_agent(dict(SUPPORT, similar='off'))
+
+    sarcastic = main.build_agent(dict(SUPPORT, use_case='SaaS customer support bot',
+                                      personality='sarcastic', similar='seed'))
+    reworded = main.build_agent(dict(SUPPORT, use_case='SaaS customer support bot', similar='seed'))
+
+    assert 'seeded_from' not in getattr(sarcastic, 'artifacts', {})
+    assert reworded.artifacts['seeded_from']['use_case'] == SUPPORT['use_case']
+    assert reworded.timings['overridden'] == list(SEEDED_TASKS)
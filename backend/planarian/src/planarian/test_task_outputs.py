@@ -0,0 +1,95 @@
+"""
+Typed task outputs (task_outputs.py).
+
+Run from this directory with `python -m pytest test_task_outputs.py`. The
+crews run on benchmark.StubLLM, so no API key is needed.
+"""
+import os
+from types import SimpleNamespace
+
+import pytest
+
+os.environ.setdefault('GOOGLE_API_KEY', 'unused')
+
+from benchmark import SAMPLE_REQUEST, StubLLM
+from crew import PlanarianCrew
+from main import result_payload
+from scheduler import run_dag
+from task_outputs import (OutputGuardrail, RequirementsAnalysis, SystemPrompt, ValidationReport,
+                          describe_error, example, format_instructions, parse, schema_of, typed)
+
+PROMPT = '{"system_prompt": "Be helpful.", "techniques": ["role"]}'
+
+
+@pytest.mark.parametrize('text', [
+    PROMPT,
+    f"```json\n{PROMPT}\n```",
+    f"Here is the prompt:\n{PROMPT}\nHope that helps."
+])
+def test_answers_are_parsed_around_fences_and_prose(text):
+    assert parse(SystemPrompt, text) == SystemPrompt(system_prompt='Be helpful.', techniques=['role'])
+
+
+def test_malformed_answers_are_described_for_the_agent():
+    with pytest.raises(ValueError) as error:
+        parse(SystemPrompt, '{"techniques": []}')
+
+    assert describe_error(error.value).startswith('system_prompt: Field required')
+    with pytest.raises(ValueError, match='not a JSON object'):
+        parse(SystemPrompt, 'Be helpful.')
+
+
+def test_validation_status_is_case_insensitive():
+    assert parse(ValidationReport, '{"status": " PASS "}').status == 'pass'
+
+
+def test_instructions_list_nested_fields():
+    instructions = format_instructions(RequirementsAnalysis)
+
+    assert '- "config" (object): Agent configuration' in instructions
+    assert '  - "personality" (string): Personality traits' in instructions
+
+
+def output(raw):
+    return SimpleNamespace(name='create_system_prompt', raw=raw, pydantic=None, json_dict=None)
+
+
+def test_guardrail_retries_then_keeps_untyped_text():
+    guardrail = OutputGuardrail(SystemPrompt, retries=1)
+    guardrail.task = SimpleNamespace(retry_count=0)
+
+    ok, feedback = guardrail.check(output('Be helpful.'))
+    assert not ok and 'JSON object' in feedback
+
+    guardrail.task.retry_count = 1
+    ok, kept = guardrail.check(output('Be helpful.'))
+    assert ok and kept.pydantic is None and kept.raw == 'Be helpful.'
+    assert guardrail.task.retry_count == 0
+
+
+def test_guardrail_types_valid_answers():
+    guardrail = OutputGuardrail(SystemPrompt, retries=1)
+
+    ok, typed = guardrail.check(output(f"```json\n{PROMPT}\n```"))
+
+    assert ok and typed.pydantic.system_prompt == 'Be helpful.'
+    assert typed.raw == typed.pydantic.model_dump_json()
+    assert typed.json_dict == {'system_prompt': 'Be helpful.', 'techniques': ['role']}
+
+
+def test_examples_validate():
+    analysis = example(RequirementsAnalysis, 'stub')
+
+    assert parse(RequirementsAnalysis, analysis.model_dump_json()) == analysis
+
+
+def test_builds_return_typed_outputs():
+    crew = PlanarianCrew(llm=StubLLM(latency=0, completion_tokens=5)).crew()
+
+    payload = result_payload(run_dag(crew, SAMPLE_REQUEST))
+
+    schema_tasks = [task for task in crew.tasks if schema_of(task) is not None]
+    assert schema_tasks
+    assert sorted(payload['outputs']) == sorted(task.name for task in schema_tasks)
+    for task in schema_tasks:
+        assert typed(task, task.output.raw).model_dump() == payload['outputs'][task.name]
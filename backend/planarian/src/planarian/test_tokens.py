@@ -0,0 +1,31 @@
+"""
+Cached token counts (tokens.py).
+
+Run from this directory with `python -m pytest test_tokens.py`.
+"""
+from tokens import CACHE_MIN_CHARS, TokenCounter, text_key
+
+
+def test_counts_of_long_strings_are_cached():
+    counter = TokenCounter()
+    text = 'word ' * CACHE_MIN_CHARS
+
+    first = counter.count(text)
+
+    assert counter.count(text) == first
+    assert counter.count_batch([text, 'short']) == [first, counter.count('short')]
+    assert counter.stats()['hits'] == 2
+    assert counter.stats()['misses'] == 1
+
+
+def test_strings_of_the_same_length_keep_their_own_counts():
+    counter = TokenCounter()
+    plain = 'a' * CACHE_MIN_CHARS
+    spaced = 'a ' * (CACHE_MIN_CHARS // 2)
+    assert len(plain) == len(spaced)
+
+    counts = counter.count_batch([plain, spaced])
+
+    assert counts[0] != counts[1]
+    assert [counter.count(plain), counter.count(spaced)] == counts
+    assert text_key(plain) != text_key(spaced)
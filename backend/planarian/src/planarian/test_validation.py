@@ -0,0 +1,102 @@
+"""
+Bulk config validation (validation.py, tools/config_rules.py).
+
+Run from this directory with `python -m pytest test_validation.py`.
+"""
+import copy
+
+import pytest
+
+import validation
+from cache import LRUCache
+from tools.config_rules import DEFAULT_RULES, RuleSet
+
+VALID = {
+    'name': 'Support Bot',
+    'model': 'gemini-1.5-flash',
+    'system_prompt': 'You are a helpful support assistant for a SaaS product.',
+    'temperature': 0.7
+}
+CONFIGS = [VALID, dict(VALID, model='gpt-2'), {'name': 'No prompt'}, 'not a config'] * 3
+
+
+@pytest.fixture(autouse=True)
+def stop_pool():
+    yield
+    validation.shutdown()
+
+
+def test_results_come_back_in_input_order():
+    results = list(validation.validate_configs(CONFIGS, parallel=False))
+
+    assert [result['index'] for result in results] == list(range(len(CONFIGS)))
+    assert results[0]['valid'] and results[0]['status'] == 'pass'
+    assert results[1]['warnings'] and results[1]['valid']
+    assert not results[2]['valid']
+    assert results[3] == dict(validation.INVALID_CONFIG, index=3)
+
+
+def test_worker_pool_gives_the_same_results(monkeypatch):
+    monkeypatch.setenv('PLANARIA_VALIDATION_WORKERS', '2')
+    serial = list(validation.validate_configs(CONFIGS, parallel=False))
+    fresh = dict(VALID, name='Fresh Bot')
+
+    parallel = list(validation.validate_configs(CONFIGS + [fresh], chunk_size=3))
+
+    assert parallel[:len(CONFIGS)] == serial
+    assert parallel[-1]['valid'] and parallel[-1]['index'] == len(CONFIGS)
+
+
+def test_results_only_carry_the_verdict():
+    result = DEFAULT_RULES.check(VALID)
+
+    assert set(result) == {'status', 'score', 'issues', 'warnings', 'recommendations', 'valid'}
+
+
+RULES = {
+    'rules': [
+        {'id': 'required', 'type': 'required', 'fields': ['name', 'system_prompt']},
+        {'id': 'models', 'type': 'allowed_values', 'field': 'model', 'values': ['gemini-1.5-flash'],
+         'severity': 'warning'},
+        {'id': 'banned', 'type': 'forbidden_terms', 'field': 'system_prompt', 'terms': ['password']},
+        {'id': 'long_prompt', 'type': 'length', 'field': 'system_prompt', 'max': 10,
+         'max_severity': 'recommendation', 'when': {'model': 'gemini-1.5-flash'}}
+    ]
+}
+
+
+def missing_rules(rules, config, cache):
+    """Rules the RuleSet would run again for `config`"""
+    return sorted(rules.lookup(rules.fingerprints(config), cache)[1])
+
+
+def test_only_rules_reading_an_edited_field_run_again():
+    rules = RuleSet.from_dict(RULES)
+    cache = LRUCache()
+    rules.check(VALID, cache)
+
+    assert missing_rules(rules, VALID, cache) == []
+    assert missing_rules(rules, dict(VALID, system_prompt='Say password'), cache) == [
+        'banned', 'long_prompt', 'required'
+    ]
+    # `when:` fields are inputs too
+    assert missing_rules(rules, dict(VALID, model='gemini-pro'), cache) == ['long_prompt', 'models']
+    assert missing_rules(rules, dict(VALID, temperature=0.1), cache) == []
+
+
+def test_only_an_edited_rule_runs_again():
+    cache = LRUCache()
+    RuleSet.from_dict(RULES).check(VALID, cache)
+    edited = copy.deepcopy(RULES)
+    edited['rules'][2]['terms'].append('secret')
+
+    rules = RuleSet.from_dict(edited)
+
+    assert missing_rules(rules, VALID, cache) == ['banned']
+    result = rules.check(dict(VALID, system_prompt='Keep the secret'), cache)
+    assert result['issues'] == ["Forbidden term: 'secret'"]
+
+
+def test_unknown_rule_types_are_rejected():
+    with pytest.raises(ValueError):
+        RuleSet.from_dict({'rules': [{'id': 'x', 'type': 'regex'}]})
@@ -0,0 +1,59 @@
+"""
+Background warm-up of the API server (warmup.py, GET /ready).
+
+Run from this directory with `python -m pytest test_warmup.py`.
+"""
+import subprocess
+import sys
+import threading
+
+from fastapi.testclient import TestClient
+
+import api
+from warmup import FAILED, READY, WarmUp
+
+
+def test_phases_run_in_order_and_are_timed():
+    ran = []
+    warmup = WarmUp([('pipeline', lambda: ran.append('pipeline')), ('crews', lambda: ran.append('crews'))])
+
+    warmup.start()
+    warmup.start()
+
+    assert warmup.wait(5)
+    assert ran == ['pipeline', 'crews']
+    report = warmup.report()
+    assert report['state'] == READY
+    assert set(report['seconds']) == {'pipeline', 'crews', 'ready'}
+
+
+def test_a_failed_phase_is_reported():
+    def fail():
+        raise SystemExit(1)
+    warmup = WarmUp([('pipeline', fail), ('crews', lambda: None)])
+
+    warmup.start()
+    warmup._thread.join(5)
+
+    assert not warmup.wait(0)
+    assert warmup.report()['state'] == FAILED
+    assert warmup.report()['error'].startswith('pipeline: SystemExit')
+
+
+def test_ready_answers_503_until_warm(monkeypatch):
+    release = threading.Event()
+    warmup = WarmUp([('pipeline', lambda: release.wait(5))])
+    monkeypatch.setattr(api, 'WARMUP', warmup)
+    client = TestClient(api.app)
+    warmup.start()
+
+    assert client.get('/ready').status_code == 503
+    release.set()
+    warmup.wait(5)
+    assert client.get('/ready').status_code == 200
+
+
+def test_api_imports_without_the_crew_machinery():
+    script = "import sys, api; sys.exit(any(m in sys.modules for m in ('crewai', 'litellm', 'main')))"
+
+    assert subprocess.run([sys.executable, '-c', script], env={'PYTHONPATH': '.'}).returncode == 0
@@ -0,0 +1,220 @@
+"""
+Token counting for prompts, configs and task context.
+
+Counts come from a local BPE tokenizer (tiktoken, PLANARIA_TOKENIZER,
+default o200k_base). Gemini's own tokenizer is not available offline, but a
+modern BPE vocabulary tracks it far more closely than word or character
+counts. The encoding files LiteLLM ships are used, so no download is
+needed. Without tiktoken, counts fall back to ~4 characters per token.
+
+Counts of long strings are kept in an LRU keyed by the string's blake2b
+digest, so counting the same prompt or upstream output again is a dictionary
+lookup, and two different strings never share a count.
+"""
+import hashlib
+import importlib.util
+import logging
+import os
+import threading
+from pathlib import Path
+
+from cache import LRUCache
+
+logger = logging.getLogger('planaria.tokens')
+
+DEFAULT_ENCODING = 'o200k_base'
+CHARS_PER_TOKEN = 4
+# Shorter strings are cheaper to encode than to look up
+CACHE_MIN_CHARS = 256
+
+
+def _bundled_encodings():
+    """Directory of the tiktoken files LiteLLM ships, if installed"""
+    spec = importlib.util.find_spec('litellm')
+    for location in (spec.submodule_search_locations or []) if spec else []:
+        path = Path(location) / 'litellm_core_utils' / 'tokenizers'
+        if path.is_dir():
+            return path
+    return None
+
+
+def load_encoding(name):
+    """tiktoken encoding `name`, or None when it cannot be loaded offline"""
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+    if not os.getenv('TIKTOKEN_CACHE_DIR'):
+        bundled = _bundled_encodings()
+        if bundled:
+            os.environ['TIKTOKEN_CACHE_DIR'] = str(bundled)
+    try:
+        return tiktoken.get_encoding(name)
+    except Exception as e:
+        logger.warning("Tokenizer %s unavailable (%s); estimating tokens from length", name, e)
+        return None
+
+
+def text_key(text):
+    """Cache key of a string: its 128-bit blake2b digest"""
+    return hashlib.blake2b(text.encode('utf-8', 'surrogatepass'), digest_size=16).digest()
+
+
+def message_text(content):
+    """Text of a prompt: a string or a list of chat messages"""
+    if isinstance(content, list):
+        return ''.join(str(message.get('content') or '') if isinstance(message, dict) else str(message)
+                       for message in content)
+    return str(content)
+
+
+class TokenCounter:
+    """
+    Cached token counts of strings.
+
+    Args:
+        encoding: tiktoken encoding name
+        max_entries: Counts of long strings kept in the LRU
+    """
+
+    def __init__(self, encoding=DEFAULT_ENCODING, max_entries=4096):
+        self.encoding_name = encoding
+        self._counts = LRUCache(max_entries=max_entries)
+        self._encoding = None
+        self._loaded = False
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def from_env(cls):
+        """
+        Counter configured from environment variables:
+            PLANARIA_TOKENIZER: tiktoken encoding (default o200k_base)
+            PLANARIA_TOKEN_CACHE_ENTRIES: counts kept in the LRU (default 4096)
+        """
+        return cls(
+            encoding=os.getenv('PLANARIA_TOKENIZER', DEFAULT_ENCODING),
+            max_entries=int(os.getenv('PLANARIA_TOKEN_CACHE_ENTRIES', '4096'))
+        )
+
+    @property
+    def encoding(self):
+        """The tiktoken encoding, loaded on first use (None: length estimate)"""
+        if not self._loaded:
+            with self._lock:
+                if not self._loaded:
+                    self._encoding = load_encoding(self.encoding_name)
+                    self._loaded = True
+        return self._encoding
+
+    @property
+    def name(self):
+        """Tokenizer identity, e.g. for cache keys that depend on counts"""
+        return self.encoding_name if self.encoding else f'chars/{CHARS_PER_TOKEN}'
+
+    def _encode_count(self, text):
+        if self.encoding is None:
+            return max(1, len(text) // CHARS_PER_TOKEN)
+        return len(self.encoding.encode_ordinary(text))
+
+    def count(self, content):
+        """
+        Tokens in `content`.
+
+        Args:
+            content: A string or a list of chat messages
+        """
+        if not content:
+            return 0
+        text = message_text(content)
+        if len(text) < CACHE_MIN_CHARS:
+            return self._encode_count(text) if text else 0
+
+        key = text_key(text)
+        count = self._counts.get(key)
+        if count is not None:
+            self.hits += 1
+            return count
+        self.misses += 1
+        count = self._encode_count(text)
+        self._counts.set(key, count)
+        return count
+
+    def count_batch(self, contents):
+        """
+        Tokens in each of `contents`, encoding the uncached ones in parallel.
+
+        Returns:
+            List of counts in input order
+        """
+        texts = [message_text(content) if content else '' for content in contents]
+        counts = [None] * len(texts)
+        missing = []
+        for index, text in enumerate(texts):
+            if not text:
+                counts[index] = 0
+            elif len(text) >= CACHE_MIN_CHARS:
+                counts[index] = self._counts.get(text_key(text))
+                if counts[index] is not None:
+                    self.hits += 1
+                    continue
+            if counts[index] is None:
+                missing.append(index)
+
+        if missing:
+            if self.encoding is None:
+                encoded = [max(1, len(texts[index]) // CHARS_PER_TOKEN) for index in missing]
+            else:
+                # tiktoken releases the GIL, so a batch encodes on several cores
+                encoded = [len(tokens) for tokens in
+                           self.encoding.encode_ordinary_batch([texts[index] for index in missing])]
+            for index, count in zip(missing, encoded):
+                counts[index] = count
+                if len(texts[index]) >= CACHE_MIN_CHARS:
+                    self.misses += 1
+                    self._counts.set(text_key(texts[index]), count)
+        return counts
+
+    def head(self, text, max_tokens):
+        """Longest prefix of `text` with at most `max_tokens` tokens"""
+        if max_tokens <= 0:
+            return ''
+        if self.encoding is None:
+            return text[:max_tokens * CHARS_PER_TOKEN]
+        tokens = self.encoding.encode_ordinary(text)
+        if len(tokens) <= max_tokens:
+            return text
+        return self.encoding.decode(tokens[:max_tokens], errors='ignore')
+
+    def stats(self):
+        return {
+            'tokenizer': self.name,
+            'cached': len(self._counts),
+            'hits': self.hits,
+            'misses': self.misses
+        }
+
+
+_counter = None
+_counter_lock = threading.Lock()
+
+
+def get_counter():
+    """Process-wide TokenCounter, created from the environment on first use"""
+    global _counter
+    if _counter is None:
+        with _counter_lock:
+            if _counter is None:
+                _counter = TokenCounter.from_env()
+    return _counter
+
+
+def count_tokens(content):
+    """Tokens in a string or a list of chat messages"""
+    return get_counter().count(content)
+
+
+def count_tokens_batch(contents):
+    """Tokens in each of `contents`, in order"""
+    return get_counter().count_batch(contents)
@@ -0,0 +1,200 @@
+"""
+Jinja templates for generated agent projects.
+
+All rendering goes through one shared Environment, and each template is
+compiled the first time it is used and reused afterwards, so rendering a full
+bundle costs microseconds. Compiled bytecode is also persisted on disk, so
+other worker processes and restarts load templates without recompiling them.
+
+Templates are hot reloaded: at most once per PLANARIA_TEMPLATE_RELOAD_INTERVAL
+seconds each template's mtime is checked, and only templates whose file
+changed are recompiled.
+"""
+import hashlib
+import os
+import re
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import jinja2
+
+TEMPLATE_DIR = Path(__file__).resolve().parents[3] / 'knowledge' / 'code_templates'
+BYTECODE_DIR = Path(
+    os.getenv('PLANARIA_TEMPLATE_CACHE_DIR')
+    or Path(tempfile.gettempdir()) / 'planaria-jinja-cache'
+)
+RELOAD_INTERVAL = float(os.getenv('PLANARIA_TEMPLATE_RELOAD_INTERVAL', '1.0'))
+
+# Optional `{# version: x #}` header of a template file
+VERSION_HEADER = re.compile(r"\{#\s*version:\s*([^\s#]+)\s*#\}")
+
+# Output key -> (template, filename) for each supported framework
+BUNDLES = {
+    'react': {
+        'main_file': ('react_template.txt', 'Agent.jsx'),
+        'package_json': ('package_json_template.txt', 'package.json'),
+        'env_example': ('env_example_template.txt', '.env.example'),
+        'readme': ('readme_template.txt', 'README.md')
+    },
+    'python': {
+        'main_file': ('python_template.txt', 'main.py'),
+        'requirements': ('requirements_template.txt', 'requirements.txt'),
+        'env_example': ('env_example_template.txt', '.env.example'),
+        'readme': ('readme_template.txt', 'README.md')
+    },
+    'node': {
+        'main_file': ('node_template.txt', 'main.js'),
+        'package_json': ('package_json_template.txt', 'package.json'),
+        'env_example': ('env_example_template.txt', '.env.example'),
+        'readme': ('readme_template.txt', 'README.md')
+    }
+}
+
+PROVIDER_NAMES = {
+    'google': 'Gemini',
+    'openai': 'OpenAI',
+    'anthropic': 'Anthropic'
+}
+
+def _bytecode_cache():
+    try:
+        BYTECODE_DIR.mkdir(parents=True, exist_ok=True)
+        return jinja2.FileSystemBytecodeCache(str(BYTECODE_DIR), 'planaria-%s.cache')
+    except OSError:
+        # Read-only filesystem: compile in memory only
+        return None
+
+
+# Templates are cached in _compiled below, so the Environment keeps none itself
+_environment = jinja2.Environment(
+    loader=jinja2.FileSystemLoader(str(TEMPLATE_DIR)),
+    trim_blocks=True,
+    lstrip_blocks=True,
+    keep_trailing_newline=True,
+    cache_size=0,
+    bytecode_cache=_bytecode_cache()
+)
+# Template name -> (compiled template, monotonic time of last freshness check)
+_compiled = {}
+_compiled_lock = threading.Lock()
+
+
+def get_template(name):
+    """Compiled template, recompiled only when its file has changed"""
+    entry = _compiled.get(name)
+    now = time.monotonic()
+    if entry is not None:
+        template, checked_at = entry
+        if now - checked_at < RELOAD_INTERVAL:
+            return template
+        if template.is_up_to_date:
+            _compiled[name] = (template, now)
+            return template
+
+    with _compiled_lock:
+        entry = _compiled.get(name)
+        if entry is not None and entry[0].is_up_to_date:
+            _compiled[name] = (entry[0], now)
+            return entry[0]
+        template = _environment.get_template(name)
+        _compiled[name] = (template, now)
+        return template
+
+
+def template_info(name):
+    """Version, checksum and modification time of one template file"""
+    path = TEMPLATE_DIR / name
+    source = path.read_bytes()
+    version = VERSION_HEADER.search(source.decode('utf-8', errors='replace'))
+    return {
+        'name': name,
+        'version': version.group(1) if version else None,
+        'checksum': hashlib.sha256(source).hexdigest(),
+        'modified_at': path.stat().st_mtime,
+        'compiled': name in _compiled
+    }
+
+
+def template_index():
+    """
+    Every supported framework with the templates its bundle is rendered from.
+
+    Returns:
+        Dictionary of framework -> list of template descriptions, each with the
+        output key and filename it renders plus template_info() fields
+    """
+    index = {}
+    for framework, files in BUNDLES.items():
+        index[framework] = [
+            dict(template_info(template_name), key=key, filename=filename)
+            for key, (template_name, filename) in files.items()
+        ]
+    return index
+
+
+def warm_templates():
+    """Compile every template up front (from the bytecode cache when possible)"""
+    for files in BUNDLES.values():
+        for template_name, _ in files.values():
+            get_template(template_name)
+
+
+def provider_for(model):
+    """Guess the SDK provider from a model name"""
+    model = (model or '').lower()
+    if 'gemini' in model:
+        return 'google'
+    if 'claude' in model:
+        return 'anthropic'
+    if model.startswith('gpt') or model.startswith('o1') or model.startswith('o3'):
+        return 'openai'
+    return 'google'
+
+
+def template_context(framework, config, system_prompt):
+    """Variables shared by every template in a bundle"""
+    model = config.get('model', 'gemini-pro')
+    provider = config.get('provider') or provider_for(model)
+    return {
+        'framework': framework,
+        'agent_name': config.get('name', 'AI Agent'),
+        'model': model,
+        'provider': provider,
+        'provider_name': PROVIDER_NAMES.get(provider, provider.title()),
+        'temperature': config.get('temperature', 0.7),
+        'max_tokens': config.get('max_tokens', 1024),
+        'system_prompt': system_prompt
+    }
+
+
+def iter_bundle(framework, config, system_prompt):
+    """
+    Render a project bundle one file at a time.
+
+    Yields:
+        Tuples of (output key, filename, content)
+
+    Raises:
+        ValueError: If the framework is not supported
+    """
+    if framework not in BUNDLES:
+        raise ValueError(f"Unsupported framework: {framework}")
+
+    context = template_context(framework, config, system_prompt)
+    for key, (template_name, filename) in BUNDLES[framework].items():
+        yield key, filename, get_template(template_name).render(context)
+
+
+def render_bundle(framework, config, system_prompt):
+    """
+    Render a complete project bundle.
+
+    Returns:
+        Dictionary of output key -> file content, plus the framework
+    """
+    bundle = {key: content for key, _, content in iter_bundle(framework, config, system_prompt)}
+    bundle['framework'] = framework
+    return bundle
+
@@ -0,0 +1,298 @@
+"""
+Data-driven rule set behind the Config Validator tool.
+
+The checks live in config/validation_rules.yaml and are compiled once into a
+RuleSet: every rule is an instance of a registered rule type (RULE_TYPES)
+with its options prepared for repeated use, e.g. the model whitelist as a
+frozenset.
+
+Every rule declares the config fields it reads. A config's fingerprint for
+a rule hashes the rule's own options and those fields, and verdicts are
+cached by fingerprint, so re-validating a config after an edit only runs the
+rules that read the changed fields, and editing a rule only re-runs that rule.
+"""
+import hashlib
+import json
+import os
+
+import yaml
+
+from cache import LRUCache, PACKAGE_DIR
+from tokens import count_tokens, get_counter
+
+RULES_PATH = PACKAGE_DIR / 'config' / 'validation_rules.yaml'
+
+SEVERITIES = ('issue', 'warning', 'recommendation')
+
+# Rule type name -> Rule subclass
+RULE_TYPES = {}
+
+
+def rule_type(name):
+    """Class decorator registering a Rule subclass under `name` for rule files"""
+    def register(cls):
+        RULE_TYPES[name] = cls
+        return cls
+    return register
+
+
+def _digest(data):
+    return hashlib.blake2b(data, digest_size=16).digest()
+
+
+_MISSING = _digest(b'\0missing')
+
+
+def _field_digest(value):
+    if value is None:
+        return _MISSING
+    if isinstance(value, str):
+        return _digest(value.encode())
+    return _digest(json.dumps(value, sort_keys=True, default=str).encode())
+
+
+class Rule:
+    """
+    One check of a config, configured by its entry in the rule file.
+
+    Subclasses set `fields` and implement evaluate(config), returning a list
+    of (severity, message) findings.
+    """
+
+    severity = 'issue'
+    message = ''
+
+    def __init__(self, spec):
+        self.id = spec['id']
+        self.when = spec.get('when') or {}
+        self.severity = spec.get('severity', self.severity)
+        self.message = spec.get('message', self.message)
+        self.fields = ()
+        if self.severity not in SEVERITIES:
+            raise ValueError(f"Rule {self.id}: unknown severity {self.severity!r}")
+        self.fingerprint = _digest(json.dumps(spec, sort_keys=True, default=str).encode())
+
+    @property
+    def inputs(self):
+        """Config fields whose values decide the outcome of this rule"""
+        return tuple(dict.fromkeys(self.fields + tuple(self.when)))
+
+    def run(self, config):
+        if any(config.get(field) != value for field, value in self.when.items()):
+            return []
+        return self.evaluate(config)
+
+    def evaluate(self, config):
+        raise NotImplementedError
+
+
+@rule_type('required')
+class RequiredRule(Rule):
+    """`fields` must be present and non-empty"""
+
+    message = "Missing required field: {field}"
+
+    def __init__(self, spec):
+        super().__init__(spec)
+        self.fields = tuple(spec['fields'])
+
+    def evaluate(self, config):
+        return [(self.severity, self.message.format(field=field))
+                for field in self.fields if not config.get(field)]
+
+
+@rule_type('allowed_values')
+class AllowedValuesRule(Rule):
+    """A set `field` must be one of `values`"""
+
+    message = "{value} is not one of: {allowed}"
+
+    def __init__(self, spec):
+        super().__init__(spec)
+        self.fields = (spec['field'],)
+        self.values = frozenset(spec['values'])
+        self.allowed = ', '.join(spec['values'])
+
+    def evaluate(self, config):
+        value = config.get(self.fields[0], '')
+        if value and value not in self.values:
+            return [(self.severity, self.message.format(value=value, allowed=self.allowed))]
+        return []
+
+
+@rule_type('length')
+class LengthRule(Rule):
+    """Length of `field` within `min` and/or `max` characters, or tokens with `unit: tokens`"""
+
+    def __init__(self, spec):
+        super().__init__(spec)
+        self.fields = (spec['field'],)
+        self.unit = spec.get('unit', 'characters')
+        if self.unit == 'tokens':
+            # Verdicts depend on the tokenizer as well as the rule
+            self.fingerprint = _digest(self.fingerprint + get_counter().encoding_name.encode())
+        elif self.unit != 'characters':
+            raise ValueError(f"Rule {self.id}: unknown unit {self.unit!r}")
+        self.min = spec.get('min')
+        self.max = spec.get('max')
+        self.min_severity = spec.get('min_severity', 'issue')
+        self.max_severity = spec.get('max_severity', 'warning')
+        self.min_message = spec.get('min_message', "{field} is too short (< {min} characters)")
+        self.max_message = spec.get('max_message', "{field} is too long (> {max} characters)")
+
+    def evaluate(self, config):
+        value = config.get(self.fields[0]) or ''
+        length = count_tokens(value) if self.unit == 'tokens' else len(value)
+        if self.min is not None and length < self.min:
+            return [(self.min_severity, self.min_message.format(field=self.fields[0], min=self.min))]
+        if self.max is not None and length > self.max:
+            return [(self.max_severity, self.max_message.format(field=self.fields[0], max=self.max))]
+        return []
+
+
+@rule_type('forbidden_terms')
+class ForbiddenTermsRule(Rule):
+    """`field` must not contain any of `terms` (case-insensitive)"""
+
+    message = "Forbidden term: '{term}'"
+
+    def __init__(self, spec):
+        super().__init__(spec)
+        self.fields = (spec['field'],)
+        self.terms = tuple(spec['terms'])
+        self.lowered_terms = tuple(term.lower() for term in self.terms)
+
+    def evaluate(self, config):
+        text = config.get(self.fields[0]) or ''
+        if not text:
+            return []
+        # Lower-case once; C substring search beats a combined regex in CPython
+        lowered = text.lower()
+        return [(self.severity, self.message.format(term=term))
+                for term, lowered_term in zip(self.terms, self.lowered_terms)
+                if lowered_term in lowered]
+
+
+class RuleSet:
+    """
+    Compiled validation rules and scoring.
+
+    Args:
+        rules: Rule instances, applied in order
+        issue_penalty: Score lost per issue
+        warning_penalty: Score lost per warning
+        pass_score: Lowest score with status 'pass'
+        warning_score: Lowest score with status 'warning'
+    """
+
+    def __init__(self, rules, issue_penalty=20, warning_penalty=5, pass_score=80, warning_score=60):
+        self.rules = list(rules)
+        self.issue_penalty = issue_penalty
+        self.warning_penalty = warning_penalty
+        self.pass_score = pass_score
+        self.warning_score = warning_score
+        self.by_id = {rule.id: rule for rule in self.rules}
+        if len(self.by_id) != len(self.rules):
+            raise ValueError("Rule ids must be unique")
+        self.inputs = tuple(dict.fromkeys(field for rule in self.rules for field in rule.inputs))
+        # (rule id, rule fingerprint, fields read) of every rule, for fingerprints()
+        self._plan = [(rule.id, rule.fingerprint, rule.inputs) for rule in self.rules]
+
+    @classmethod
+    def from_dict(cls, data):
+        rules = []
+        for spec in data.get('rules') or []:
+            if spec.get('type') not in RULE_TYPES:
+                raise ValueError(f"Rule {spec.get('id')}: unknown type {spec.get('type')!r}")
+            rules.append(RULE_TYPES[spec['type']](spec))
+        return cls(rules, **(data.get('scoring') or {}))
+
+    @classmethod
+    def from_file(cls, path=None):
+        """
+        Rules from a YAML rule file: PLANARIA_VALIDATION_RULES or
+        config/validation_rules.yaml by default
+        """
+        path = path or os.getenv('PLANARIA_VALIDATION_RULES') or RULES_PATH
+        with open(path) as f:
+            return cls.from_dict(yaml.safe_load(f) or {})
+
+    def fingerprints(self, config):
+        """Fingerprint of `config` for each rule, from only the fields that rule reads"""
+        fields = {field: _field_digest(config.get(field)) for field in self.inputs}
+        return {
+            rule_id: _digest(fingerprint + b''.join([fields[field] for field in inputs])).hex()
+            for rule_id, fingerprint, inputs in self._plan
+        }
+
+    def evaluate(self, config, rule_ids=None):
+        """Findings of each rule (or only `rule_ids`) for `config`"""
+        rules = self.rules if rule_ids is None else [self.by_id[rule_id] for rule_id in rule_ids]
+        return {rule.id: rule.run(config) for rule in rules}
+
+    def result(self, findings):
+        """Scored validation result from the findings of every rule"""
+        grouped = {severity: [] for severity in SEVERITIES}
+        for rule in self.rules:
+            for severity, message in findings[rule.id]:
+                grouped[severity].append(message)
+        issues = grouped['issue']
+        warnings = grouped['warning']
+
+        score = max(0, 100 - len(issues) * self.issue_penalty - len(warnings) * self.warning_penalty)
+        status = 'pass' if score >= self.pass_score else 'warning' if score >= self.warning_score else 'fail'
+
+        return {
+            'status': status,
+            'score': score,
+            'issues': issues,
+            'warnings': warnings,
+            'recommendations': grouped['recommendation'],
+            'valid': len(issues) == 0
+        }
+
+    def lookup(self, fingerprints, cache=None):
+        """
+        Cached findings of each rule.
+
+        Returns:
+            Tuple of ({rule id: findings} found, [rule ids to evaluate])
+        """
+        cache = VERDICTS if cache is None else cache
+        found = {}
+        missing = []
+        for rule_id, fingerprint in fingerprints.items():
+            findings = cache.get(fingerprint)
+            if findings is None:
+                missing.append(rule_id)
+            else:
+                found[rule_id] = findings
+        return found, missing
+
+    def store(self, fingerprints, findings, cache=None):
+        cache = VERDICTS if cache is None else cache
+        for rule_id, rule_findings in findings.items():
+            cache.set(fingerprints[rule_id], rule_findings)
+
+    def check(self, config, cache=None):
+        """
+        Validate one agent configuration, reusing cached verdicts of rules
+        whose inputs did not change.
+
+        Returns:
+            Dictionary with status, score, issues, warnings, recommendations
+            and valid
+        """
+        fingerprints = self.fingerprints(config)
+        findings, missing = self.lookup(fingerprints, cache)
+        if missing:
+            evaluated = self.evaluate(config, missing)
+            self.store(fingerprints, evaluated, cache)
+            findings.update(evaluated)
+        return self.result(findings)
+
+
+# Findings by rule fingerprint, shared by every RuleSet in the process
+VERDICTS = LRUCache(max_entries=int(os.getenv('PLANARIA_VALIDATION_CACHE_ENTRIES', '100000')))
+
+DEFAULT_RULES = RuleSet.from_file()
@@ -0,0 +1,147 @@
+"""
+Library of system prompt skeletons behind the Prompt Optimizer tool.
+
+Skeletons live in config/prompt_skeletons.yaml, keyed by agent type and
+model family, and are loaded once per process. Assembled prompts are
+memoized on (agent type, use case, personality, model, requirements), and
+prompts written by the prompt engineer in earlier builds are remembered under
+the same key, so fast builds can reuse either instead of calling the LLM
+(fast_path.py).
+"""
+import os
+import re
+
+import yaml
+
+from cache import LRUCache, PACKAGE_DIR
+from tokens import count_tokens
+
+SKELETONS_PATH = PACKAGE_DIR / 'config' / 'prompt_skeletons.yaml'
+ANY = '*'
+# Section appended to a prompt that has requirements, unless its skeleton sets `requirements:`
+REQUIREMENTS_SECTION = "Requirements:\n{requirements}"
+
+
+def normalize_agent_type(agent_type):
+    """'Customer Support' -> 'customer_support'"""
+    return re.sub(r"[\s-]+", '_', (agent_type or '').strip().lower()) or ANY
+
+
+class Skeleton:
+    """
+    A prompt shape with placeholders for {personality}, {use_case} and
+    {agent_type}, followed by a requirements section (with a {requirements}
+    placeholder) when the request has any.
+    """
+
+    def __init__(self, id, template, style='', features=(), requirements=REQUIREMENTS_SECTION):
+        self.id = id
+        self.template = template.strip()
+        self.style = style
+        self.features = tuple(features)
+        self.requirements = requirements.strip()
+
+    def render(self, use_case, personality, agent_type, requirements=()):
+        prompt = self.template.format(use_case=use_case, personality=personality, agent_type=agent_type)
+        if requirements:
+            bullets = '\n'.join(f"- {requirement}" for requirement in requirements)
+            prompt += '\n\n' + self.requirements.format(requirements=bullets)
+        return prompt
+
+
+class PromptLibrary:
+    """
+    Skeleton lookup and memoized prompt assembly.
+
+    Args:
+        skeletons: Mapping of (agent type, family) to Skeleton; '*' matches any
+        families: Mapping of family name to model name prefixes
+        max_entries: Assembled and remembered prompts kept in memory
+    """
+
+    def __init__(self, skeletons, families, max_entries=1024):
+        self.skeletons = skeletons
+        self.families = families
+        self._assembled = LRUCache(max_entries=max_entries)
+        self._remembered = LRUCache(max_entries=max_entries)
+
+    @classmethod
+    def from_file(cls, path=None, **kwargs):
+        """Skeletons from PLANARIA_PROMPT_SKELETONS or config/prompt_skeletons.yaml"""
+        path = path or os.getenv('PLANARIA_PROMPT_SKELETONS') or SKELETONS_PATH
+        with open(path) as f:
+            data = yaml.safe_load(f) or {}
+
+        skeletons = {}
+        for spec in data.get('skeletons') or []:
+            skeleton = Skeleton(spec['id'], spec['template'], spec.get('style', ''), spec.get('features', ()),
+                                spec.get('requirements') or REQUIREMENTS_SECTION)
+            for agent_type in spec.get('agent_types') or [ANY]:
+                for family in spec.get('families') or [ANY]:
+                    skeletons[(normalize_agent_type(agent_type), family)] = skeleton
+        if (ANY, ANY) not in skeletons:
+            raise ValueError(f"{path}: no skeleton for agent type '*' and family '*'")
+        return cls(skeletons, data.get('families') or {}, **kwargs)
+
+    def model_family(self, model):
+        """Family of a model name such as 'gemini/gemini-1.5-flash', or '*'"""
+        name = (model or '').lower().rsplit('/', 1)[-1]
+        for family, prefixes in self.families.items():
+            if name.startswith(tuple(prefixes)):
+                return family
+        return ANY
+
+    def skeleton(self, agent_type, model):
+        """Most specific skeleton for an agent type and model"""
+        agent_type = normalize_agent_type(agent_type)
+        family = self.model_family(model)
+        for key in ((agent_type, family), (agent_type, ANY), (ANY, family), (ANY, ANY)):
+            if key in self.skeletons:
+                return self.skeletons[key]
+
+    @staticmethod
+    def _key(use_case, personality, model, agent_type, requirements):
+        return (normalize_agent_type(agent_type), ' '.join(use_case.split()),
+                ' '.join(personality.split()), (model or '').lower(),
+                tuple(' '.join(requirement.split()) for requirement in requirements))
+
+    def assemble(self, use_case, personality, model, agent_type=ANY, requirements=()):
+        """
+        System prompt from the matching skeleton, memoized.
+
+        Args:
+            requirements: Lines for the prompt's requirements section, such as
+                the request's additional requirements
+
+        Returns:
+            Dictionary with the optimized prompt, the skeleton used, its
+            style and model features, and the prompt's token count
+        """
+        requirements = [requirement for requirement in requirements if requirement.strip()]
+        key = self._key(use_case, personality, model, agent_type, requirements)
+        assembled = self._assembled.get(key)
+        if assembled is None:
+            skeleton = self.skeleton(agent_type, model)
+            prompt = skeleton.render(use_case, personality, normalize_agent_type(agent_type).replace('_', ' '),
+                                     requirements)
+            assembled = {
+                'optimized_prompt': prompt,
+                'skeleton': skeleton.id,
+                'model_features': list(skeleton.features),
+                'style_guide': skeleton.style,
+                'token_estimate': count_tokens(prompt)
+            }
+            self._assembled.set(key, assembled)
+        return dict(assembled)
+
+    def remember(self, use_case, personality, model, agent_type, requirements, prompt):
+        """Keep a prompt written by the prompt engineer for reuse by the same request"""
+        if prompt:
+            self._remembered.set(self._key(use_case, personality, model, agent_type, requirements), prompt)
+
+    def recall(self, use_case, personality, model, agent_type, requirements=()):
+        """A prompt remembered for the same request, or None"""
+        return self._remembered.get(self._key(use_case, personality, model, agent_type, requirements))
+
+
+LIBRARY = PromptLibrary.from_file()
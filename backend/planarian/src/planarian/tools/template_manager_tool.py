@@ -1,7 +1,8 @@
 from crewai_tools import BaseTool
 from typing import Type
 from pydantic import BaseModel, Field
-import os
+
+from tools.code_templates import BUNDLES, TEMPLATE_DIR, template_index
 
 class TemplateManagerInput(BaseModel):
     """Input for Template Manager Tool"""
@@ -11,42 +12,33 @@ class TemplateManagerTool(BaseTool):
     name: str = "Template Manager"
     description: str = (
         "Manages code templates for different frameworks. "
-        "Retrieves and validates templates."
+        "Lists the templates behind each framework with their versions and checksums."
     )
     args_schema: Type[BaseModel] = TemplateManagerInput
 
     def _run(self, framework: str) -> dict:
         """Get template information"""
         
-        template_dir = os.path.join(
-            os.path.dirname(__file__), 
-            '..', '..', 
-            'knowledge', 
-            'code_templates'
-        )
-        
-        template_files = {
-            'react': 'react_template.txt',
-            'python': 'python_template.txt',
-            'node': 'node_template.txt'
-        }
-        
-        if framework not in template_files:
+        if framework not in BUNDLES:
             return {
                 'success': False,
-                'error': f'Unsupported framework: {framework}'
+                'error': f'Unsupported framework: {framework}',
+                'available_frameworks': list(BUNDLES)
             }
         
-        template_path = os.path.join(
-            template_dir, 
-            template_files[framework]
-        )
-        
-        exists = os.path.exists(template_path)
+        try:
+            templates = template_index()[framework]
+        except OSError as e:
+            return {
+                'success': False,
+                'framework': framework,
+                'error': f'Template missing: {e}'
+            }
         
         return {
-            'success': exists,
+            'success': True,
             'framework': framework,
-            'template_path': template_path if exists else None,
-            'available_frameworks': list(template_files.keys())
-        }
\ No newline at end of file
+            'template_dir': str(TEMPLATE_DIR),
+            'templates': templates,
+            'available_frameworks': list(BUNDLES)
+        }
@@ -0,0 +1,194 @@
+#!/usr/bin/env python
+"""
+Bulk validation of stored agent configs.
+
+validate_configs() checks any number of configs against a compiled RuleSet
+(tools/config_rules.py) and yields one result per config, in input order, as
+soon as it is ready. Small inputs are checked inline; larger ones are split
+into chunks and spread over a shared process pool, so a nightly lint of
+thousands of configs uses every core while memory stays bounded by the
+chunks in flight. Verdicts are looked up by fingerprint in this process
+first, and only the rules whose inputs changed are sent to the workers.
+
+Usage: python validation.py configs.jsonl > results.jsonl
+"""
+import argparse
+import itertools
+import json
+import multiprocessing
+import os
+import sys
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from state import server_workers
+from tools.config_rules import DEFAULT_RULES
+
+# Configs per task sent to a worker process
+CHUNK_SIZE = 256
+
+INVALID_CONFIG = {'status': 'fail', 'valid': False, 'error': 'Config must be a JSON object'}
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def worker_count():
+    """
+    Worker processes for bulk validation (PLANARIA_VALIDATION_WORKERS, default:
+    the CPU count split between the API server's workers)
+    """
+    if os.getenv('PLANARIA_VALIDATION_WORKERS'):
+        return int(os.getenv('PLANARIA_VALIDATION_WORKERS'))
+    return max(1, (os.cpu_count() or 1) // server_workers())
+
+
+def get_pool():
+    """Process pool shared by all bulk validations, started on first use"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn: forking a process that runs threads (uvicorn, job workers) can deadlock
+            _pool = ProcessPoolExecutor(max_workers=worker_count(),
+                                        mp_context=multiprocessing.get_context('spawn'))
+        return _pool
+
+
+def shutdown():
+    """Stop the worker processes, if any were started"""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(cancel_futures=True)
+            _pool = None
+
+
+def evaluate_chunk(rules, items):
+    """Worker entry point: findings of the given rules for each (config, rule ids)"""
+    return [rules.evaluate(config, rule_ids) for config, rule_ids in items]
+
+
+def check_one(rules, config):
+    if not isinstance(config, dict):
+        return INVALID_CONFIG
+    return rules.check(config)
+
+
+def _submit(pool, rules, chunk):
+    """
+    Look up cached verdicts of a chunk and send only the rules whose inputs
+    changed to a worker.
+
+    Returns:
+        Tuple of (per-config entries, Future of the worker's findings or None)
+    """
+    entries = []
+    items = []
+    for config in chunk:
+        if not isinstance(config, dict):
+            entries.append(None)
+            continue
+        fingerprints = rules.fingerprints(config)
+        found, missing = rules.lookup(fingerprints)
+        entries.append((fingerprints, found, missing))
+        if missing:
+            items.append((config, missing))
+    return entries, pool.submit(evaluate_chunk, rules, items) if items else None
+
+
+def _collect(rules, entries, future):
+    evaluated = iter(future.result() if future else ())
+    for entry in entries:
+        if entry is None:
+            yield INVALID_CONFIG
+            continue
+        fingerprints, found, missing = entry
+        if missing:
+            findings = next(evaluated)
+            rules.store(fingerprints, findings)
+            found.update(findings)
+        yield rules.result(found)
+
+
+def _chunks(configs, size):
+    iterator = iter(configs)
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def validate_configs(configs, rules=None, chunk_size=CHUNK_SIZE, parallel=True):
+    """
+    Validate many configs.
+
+    Args:
+        configs: Iterable of config dicts; read lazily
+        rules: RuleSet to apply (default: DEFAULT_RULES)
+        chunk_size: Configs per worker task
+        parallel: Use the process pool when there is more than one chunk
+
+    Yields:
+        The RuleSet.check() result of each config with its `index`, in input order
+    """
+    rules = rules or DEFAULT_RULES
+    chunks = _chunks(configs, chunk_size)
+    first = next(chunks, None)
+    if first is None:
+        return
+    second = next(chunks, None)
+
+    if second is None or not parallel or worker_count() == 1:
+        # One chunk costs less to check than to ship to another process
+        index = 0
+        for chunk in itertools.chain([first], [second] if second else [], chunks):
+            for config in chunk:
+                yield dict(check_one(rules, config), index=index)
+                index += 1
+        return
+
+    pool = get_pool()
+    # Keep the workers busy, but don't read the whole input ahead of the consumer
+    in_flight = deque()
+    max_in_flight = 2 * worker_count()
+    index = 0
+    for chunk in itertools.chain([first, second], chunks):
+        in_flight.append(_submit(pool, rules, chunk))
+        if len(in_flight) >= max_in_flight:
+            for result in _collect(rules, *in_flight.popleft()):
+                yield dict(result, index=index)
+                index += 1
+    while in_flight:
+        for result in _collect(rules, *in_flight.popleft()):
+            yield dict(result, index=index)
+            index += 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('paths', nargs='*', help='JSON lines files of configs (default: stdin)')
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+    args = parser.parse_args()
+
+    def read_configs():
+        files = [open(path) for path in args.paths] if args.paths else [sys.stdin]
+        for f in files:
+            with f:
+                for line in f:
+                    if line.strip():
+                        yield json.loads(line)
+
+    failed = 0
+    try:
+        for result in validate_configs(read_configs(), chunk_size=args.chunk_size):
+            failed += not result['valid']
+            sys.stdout.write(json.dumps(result) + '\n')
+    finally:
+        shutdown()
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
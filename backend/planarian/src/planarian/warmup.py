@@ -0,0 +1,154 @@
+"""
+Cold start of the API server.
+
+api.py only imports what answering requests needs (FastAPI, the job queue,
+caches, metrics). The crew machinery - crewAI, LiteLLM, the tools, the crew
+config and LLM client - is loaded by a warm-up that the server's lifespan
+runs in a background thread, so uvicorn binds right away and /ready tells
+load balancers when builds can start.
+
+Import and warm-up time of each phase is logged to planaria.startup, kept in
+report() for /ready and /health, and exported as planaria_startup_seconds.
+"""
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger('planaria.startup')
+
+# Set when this module is first imported, which api.py does before anything else
+STARTED = time.perf_counter()
+
+PENDING = 'pending'
+WARMING = 'warming'
+READY = 'ready'
+FAILED = 'failed'
+
+
+def load_pipeline():
+    """crewAI, LiteLLM, the tools and the build pipeline (main.py)"""
+    import main
+    return main
+
+
+def warm_crews():
+    """Build PLANARIA_WARM_CREWS crews (default 1) with the shared LLM client"""
+    count = int(os.getenv('PLANARIA_WARM_CREWS', '1'))
+    factory = load_pipeline().get_crew_factory()
+    if count > 0:
+        factory.warm(count)
+
+
+def warm_templates():
+    """Compile the code templates of every framework"""
+    from tools.code_templates import warm_templates
+    warm_templates()
+
+
+def load_knowledge():
+    """Index the knowledge base, or map the saved index, if retrieval is enabled"""
+    knowledge = load_pipeline().knowledge
+    if knowledge is not None:
+        knowledge.index.snapshot()
+
+
+def load_tokenizer():
+    """Load the BPE encoding used for token counts"""
+    import tokens
+    tokens.get_counter().encoding
+
+
+# Phases in the order they run; the pipeline is needed before crews can be built
+STEPS = (
+    ('pipeline', load_pipeline),
+    ('crews', warm_crews),
+    ('templates', warm_templates),
+    ('tokenizer', load_tokenizer),
+    ('knowledge', load_knowledge)
+)
+# Phases a pre-forking parent runs once for all its workers (prefork.py). Crews
+# hold LLM clients with open connections, so each worker builds its own.
+PRELOADED = ('pipeline', 'templates', 'tokenizer', 'knowledge')
+
+
+class WarmUp:
+    """
+    Runs the warm-up phases once, in a background thread, and times them.
+
+    Args:
+        steps: Sequence of (phase, callable) pairs run in order
+    """
+
+    def __init__(self, steps=STEPS):
+        self.steps = steps
+        self.state = PENDING
+        self.error = None
+        self.seconds = {}
+        self._ready = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def record(self, phase, seconds):
+        """Time taken by a startup phase, e.g. importing api.py"""
+        with self._lock:
+            self.seconds[phase] = seconds
+        logger.info("Startup phase %s took %.3fs", phase, seconds)
+
+    def start(self):
+        """Start warming up in the background; later calls do nothing"""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self.state = WARMING
+            self._thread = threading.Thread(target=self._run, name='planaria-warmup', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        phase = None
+        try:
+            for phase, step in self.steps:
+                start = time.perf_counter()
+                step()
+                self.record(phase, time.perf_counter() - start)
+        except BaseException as e:
+            # main.py exits the process on a missing key; report that instead of dying silently
+            with self._lock:
+                self.state = FAILED
+                self.error = f"{phase}: {e!r}"
+            logger.exception("Warm-up failed in phase %s", phase)
+            return
+        self.record('ready', time.perf_counter() - STARTED)
+        with self._lock:
+            self.state = READY
+        self._ready.set()
+
+    @property
+    def ready(self):
+        return self._ready.is_set()
+
+    def wait(self, timeout=None):
+        """Block until warm-up has finished; False on timeout or failure"""
+        self._ready.wait(timeout)
+        return self.ready
+
+    def report(self):
+        with self._lock:
+            return {
+                'state': self.state,
+                'error': self.error,
+                'seconds': {phase: round(seconds, 4) for phase, seconds in self.seconds.items()}
+            }
+
+
+# Process-wide warm-up used by the API server
+WARMUP = WarmUp()
+
+
+def preload():
+    """Run the PRELOADED phases before forking workers, so they are instant in each worker"""
+    start = time.perf_counter()
+    for phase, step in STEPS:
+        if phase in PRELOADED:
+            step()
+    WARMUP.record('preload', time.perf_counter() - start)